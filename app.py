@@ -19,8 +19,7 @@ import time
 from flask import template_rendered
 from flask import has_request_context
 from threading import local
-import pandas as pd
-from log_dash import create_log_dash
+from log_dash_mount import LazyDashMount
 from dotenv import load_dotenv
 
 
@@ -36,8 +35,14 @@ app.register_blueprint(userclone_bp, url_prefix='/userclone')
 from ssis_routes import ssis_bp
 app.register_blueprint(ssis_bp, url_prefix='/ssis')
 
+# --- Usage Analytics drill-down API (admin-only, see protect_loganalytics) ---
+from log_api_routes import log_api_bp
+app.register_blueprint(log_api_bp, url_prefix='/loganalytics-api')
+
+# --- page_access_logs retention (hot table + history + rollup), run from init_db ---
+from log_retention import archive_page_access_logs, ensure_retention_schema
+
 app.secret_key = 'your_secret_key'  # Replace with a secure key
-dash_app = create_log_dash(app)
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
@@ -393,6 +398,32 @@ def protect_loganalytics():
             return redirect(url_for("login"))
 
 
+# --------------------------------------------------
+# Usage Analytics Dash app: built on first /loganalytics/ request
+# (keeps dash/pandas/plotly out of portal start-up, see log_dash_mount)
+# --------------------------------------------------
+def _build_log_dash_server():
+    from log_dash import create_log_dash
+
+    server = Flask(__name__, static_folder=None)
+    server.secret_key = app.secret_key
+
+    @server.before_request
+    def _require_admin():
+        # Same rule as protect_loganalytics; url_for("login") lives on the portal app
+        if not session.get("is_admin"):
+            return redirect("/login")
+
+    # Same server-side page-visit logging as the portal
+    server.before_request(auto_page_access_logger)
+
+    create_log_dash(server)
+    return server
+
+
+app.wsgi_app = LazyDashMount(app.wsgi_app, "/loganalytics/", _build_log_dash_server)
+
+
 
  
 # LDAP validation function
@@ -732,6 +763,27 @@ def init_db():
     END
     """)
 
+    # Keyset index for the drill-down API (/loganalytics-api/logs seeks on enter_time, id)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_page_access_logs_enter_id'
+                   AND object_id = OBJECT_ID(N'page_access_logs'))
+    BEGIN
+        CREATE INDEX idx_page_access_logs_enter_id
+        ON page_access_logs (enter_time DESC, id DESC)
+        INCLUDE (login_name, page, ip_address, exit_time, duration_seconds);
+    END
+    """)
+
+    # Seek index for the IP filter (login filter uses idx_page_access_logs_user_page_time)
+    cursor.execute("""
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_page_access_logs_ip_time'
+                   AND object_id = OBJECT_ID(N'page_access_logs'))
+    BEGIN
+        CREATE INDEX idx_page_access_logs_ip_time
+        ON page_access_logs (ip_address, enter_time DESC);
+    END
+    """)
+
     # Create sessions table if not exists
     cursor.execute("""
     IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'sessions') AND type = 'U')
@@ -803,6 +855,17 @@ def init_db():
     """)
 
     conn.commit()
+
+    # Retention: history/rollup tables, then move closed months out of the hot table
+    ensure_retention_schema(cursor)
+    conn.commit()
+    try:
+        archived = archive_page_access_logs(conn)
+        if archived:
+            print(f"[LOG_RETENTION] archived months: {[m.strftime('%Y-%m') for m in archived]}")
+    except Exception as e:
+        print(f"[LOG_RETENTION] archive failed: {e}")
+
     conn.close()
 
 
@@ -4151,6 +4214,8 @@ def dashboard():
     if 'login_name' not in session:
         return redirect(url_for('login'))
  
+    import pandas as pd  # only these replication views need it
+
     sql_query = "SELECT * FROM Get_Replication_details"
  
     # Get replication data
@@ -4182,6 +4247,8 @@ def dashboard_summary():
     if 'login_name' not in session:
         return redirect(url_for('login'))
  
+    import pandas as pd  # only these replication views need it
+
     sql_query = "SELECT * FROM Get_Replication_details"
  
     with get_replication_connection() as conn:
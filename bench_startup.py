@@ -0,0 +1,63 @@
+"""
+Start-up benchmark for the DataSolveX portal.
+
+Runs each measurement in a fresh interpreter (cold imports) and reports:
+  - portal import time (`import app`) and whether dash/pandas/plotly got loaded
+  - the deferred cost: importing log_dash + create_log_dash() on a bare Flask app,
+    i.e. what the portal used to pay at start-up and now pays on the first
+    /loganalytics/ request
+
+Usage:
+    python bench_startup.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+
+
+PORTAL = r"""
+import sys, time
+t0 = time.perf_counter()
+import app
+dt = time.perf_counter() - t0
+heavy = [m for m in ("dash", "pandas", "plotly") if m in sys.modules]
+print(f"{dt:.4f} {','.join(heavy) or '-'}")
+"""
+
+DASH = r"""
+import time
+from flask import Flask
+t0 = time.perf_counter()
+from log_dash import create_log_dash
+create_log_dash(Flask("bench"))
+print(f"{time.perf_counter() - t0:.4f} -")
+"""
+
+
+def _run(code, runs):
+    times = []
+    heavy = "-"
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        secs, heavy = out.split(" ", 1)
+        times.append(float(secs))
+    return times, heavy
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    portal, heavy = _run(PORTAL, runs)
+    dash, _ = _run(DASH, runs)
+
+    print(f"runs: {runs}")
+    print(f"portal import (import app)   median {statistics.median(portal):.3f}s  min {min(portal):.3f}s")
+    print(f"  heavy modules loaded       {heavy}")
+    print(f"log dash build (deferred)    median {statistics.median(dash):.3f}s  min {min(dash):.3f}s")
+    print(f"eager start-up would be      ~{statistics.median(portal) + statistics.median(dash):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
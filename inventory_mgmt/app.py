@@ -2,6 +2,7 @@
 import os
 import io
 import csv 
+import json
 from datetime import datetime, timedelta, timezone
 
 import pyodbc
@@ -16,23 +17,64 @@ from flask import (
     make_response,
     send_file,
     jsonify,
+    get_template_attribute,
+    stream_with_context,
 )
 from dotenv import load_dotenv
 
-from .objects_detail import get_object_metadata
+from .objects_detail import get_object_metadata, get_objects_metadata
 from .db_detail import (
     ensure_db_metadata_table,
     snapshot_db_metadata,
     get_db_metadata,
     get_db_object_summary,
     get_query_store_info,
+    get_last_backup_sizes,
+    get_ag_info,
 )
 from .server_detail import (
-    get_server_by_id,
     get_server_metrics,
     get_databases_for_server,
 )
+from .server_cache import get_all_servers, get_server_by_id, invalidate_server_cache
 from .db_objects import get_db_user_count
+from .fleet_scanner import (
+    collect_drives_live,
+    get_inventory_connection,
+    scan_fleet,
+)
+from .env_summary import get_environment_summary, get_filter_options
+from .catalog_cache import get_object_catalog
+from .dependency_graph import get_dependency_graph
+from .index_cache import get_index_lookup, request_fragmentation_scan
+from .plan_store import get_object_plan, make_plan_resolver, stored_plan_objects
+from .page_probes import collect_pending, run_probes, wait_probe
+from .metrics_collector import METRIC_RANGES, METRICS_INTERVAL, get_server_metric_series
+from .metrics_collector import collector as metrics_collector
+from .volume_collector import VOLUME_INTERVAL
+from .volume_collector import collector as volume_collector
+from .server_onboarding import ONBOARD_MAX_SERVERS, iter_onboarding, parse_server_csv, parse_server_list
+from .capacity_forecast import FORECAST_INTERVAL, get_database_forecast, get_drive_forecasts
+from .capacity_forecast import forecaster as capacity_forecaster
+from .fleet_reports import (
+    DB_METADATA_SWEEP_INTERVAL,
+    REPORT_CSV_LIMIT,
+    REPORTS,
+    iter_report,
+    list_reports,
+    resolve_params,
+)
+from .fleet_reports import sweeper as db_metadata_sweeper
+from .perf_harvester import (
+    METRICS,
+    PERF_HARVEST_INTERVAL,
+    harvester,
+    procedure_trend,
+    top_procedures,
+    top_queries,
+)
+from .refresh_scheduler import format_age, snapshot_age_seconds
+from .refresh_scheduler import scheduler as refresh_scheduler
 
 
 # ---------- ENV CONFIG ----------
@@ -45,6 +87,10 @@ INV_DB_USER = os.getenv("INV_DB_USER")
 INV_DB_PASSWORD = os.getenv("INV_DB_PASSWORD")
 INV_DB_TRUSTED = (os.getenv("INV_DB_TRUSTED", "YES").upper() == "YES")
 
+# download_objects_multi: objects per metadata batch while streaming the CSV
+MULTI_CSV_FIRST_BATCH = int(os.getenv("INV_MULTI_CSV_FIRST_BATCH", "8"))
+MULTI_CSV_MAX_BATCH = int(os.getenv("INV_MULTI_CSV_MAX_BATCH", "64"))
+
 app = Flask(__name__)
 
 
@@ -85,62 +131,10 @@ def _client_ip() -> str:
 
 # ---------- PLAN AVAILABILITY (for disabling Download Plan button) ----------
 
-def has_cached_proc_plan(conn, db_name: str, proc_full_name: str) -> bool:
-    """True when a cached procedure plan is available for download.
-
-    This checks sys.dm_exec_procedure_stats, which only has rows after the
-    procedure has executed and while its plan is still in cache.
-    """
-
-    if not proc_full_name:
-        return False
-
-    try:
-        cur = conn.cursor()
-        # Ensure OBJECT_ID resolves in the right DB
-        cur.execute(f"USE [{db_name.replace(']', ']]')}]")
-        row = cur.execute(
-            """
-            SELECT TOP (1) 1
-            FROM sys.dm_exec_procedure_stats AS ps
-            WHERE ps.object_id = OBJECT_ID(?);
-            """,
-            proc_full_name,
-        ).fetchone()
-        return row is not None
-    except Exception:
-        # Be conservative: if check fails, disable the button
-        return False
-
-
 # ---------- DB CONNECTION (INVENTORY DB) ----------
 
-def get_inventory_connection():
-    """
-    Connect to the inventory database (where ServerList / ServerInfo live).
-    """
-    if not INV_DB_SERVER or not INV_DB_NAME:
-        raise RuntimeError("INV_DB_SERVER or INV_DB_NAME is not set in .env")
-
-    if INV_DB_TRUSTED:
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            "Trusted_Connection=yes;"
-        )
-    else:
-        if not INV_DB_USER or not INV_DB_PASSWORD:
-            raise RuntimeError("Using SQL auth but INV_DB_USER / INV_DB_PASSWORD not set")
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            f"UID={INV_DB_USER};"
-            f"PWD={INV_DB_PASSWORD};"
-        )
-
-    return pyodbc.connect(conn_str)
+# get_inventory_connection: shared helper in fleet_scanner; server id -> name /
+# ServerInfo lookups go through server_cache.
 
 ##change
 def get_sql_connection(server_name: str, database: str = "master"):
@@ -265,229 +259,42 @@ def refresh_all_server_info():
 
     Previously the app refreshed only the inventory host (central server), so every
     server card (and downstream clicks) effectively showed central-server data.
-    """
-    inv_conn = get_inventory_connection()
-    inv_cur = inv_conn.cursor()
-
-    servers = inv_cur.execute(
-        "SELECT ID, ServerName FROM dbo.ServerList ORDER BY ServerName;"
-    ).fetchall()
-
-    for s in servers:
-        server_id = int(s.ID)
-        server_name = str(s.ServerName)
-
-        status = "ONLINE"
-        sql_version = None
-        sql_edition = None
-        os_version = None
-        last_restart = None
-        total_databases = 0
-        total_size_gb = 0.0
-
-        try:
-            tconn = get_sql_connection(server_name, "master")
-            tcur = tconn.cursor()
-
-            row = tcur.execute(
-                "SELECT CAST(LEFT(@@VERSION, CHARINDEX(CHAR(10), @@VERSION + CHAR(10)) - 1) AS NVARCHAR(256));"
-            ).fetchone()
-            sql_version = row[0] if row else None
 
-            row = tcur.execute("SELECT CAST(SERVERPROPERTY('Edition') AS NVARCHAR(128));").fetchone()
-            sql_edition = row[0] if row else None
-
-            try:
-                row = tcur.execute("SELECT TOP (1) windows_release FROM sys.dm_os_windows_info;").fetchone()
-                os_version = row[0] if row else None
-            except Exception:
-                os_version = None
-
-            try:
-                row = tcur.execute("SELECT CAST(SERVERPROPERTY('ResourceLastUpdateDateTime') AS DATETIME2);").fetchone()
-                last_cu_updated = row[0] if row else None
-            except Exception:
-                last_cu_updated = None
-
-            row = tcur.execute("SELECT CONVERT(DATETIME2, sqlserver_start_time) FROM sys.dm_os_sys_info;").fetchone()
-            last_restart = row[0] if row else None
-
-            row = tcur.execute("SELECT COUNT(*) FROM sys.databases WHERE database_id > 4;").fetchone()
-            total_databases = int(row[0] or 0) if row else 0
-
-            row = tcur.execute(
-                "SELECT CAST(SUM(CAST(size AS BIGINT)) * 8.0 / 1024 / 1024 AS DECIMAL(38,2)) AS total_size_gb FROM sys.master_files WHERE database_id > 4;"
-            ).fetchone()
-            total_size_gb = float(row[0] or 0) if row else 0.0
-
-            tconn.close()
-        except Exception:
-            status = "OFFLINE"
-
-        inv_cur.execute(
-            """
-            MERGE dbo.ServerInfo AS tgt
-            USING (SELECT ? AS ServerID) AS src
-              ON tgt.ServerID = src.ServerID
-            WHEN MATCHED THEN
-                UPDATE SET
-                    Status         = ?,
-                    SQLVersion     = ?,
-                    SQLEdition     = ?,
-                    OSVersion      = ?,
-                    LastRestart    = ?,
-                    TotalDatabases = ?,
-                    TotalSizeGB    = ?,
-                    LastScan       = SYSDATETIME(),
-                    LastUpdated    = SYSDATETIME(),
-                    LastCUUpdated  = ?
-            WHEN NOT MATCHED THEN
-                INSERT (ServerID, Status, SQLVersion, SQLEdition, OSVersion, LastRestart, TotalDatabases, TotalSizeGB, LastScan, LastUpdated, LastCUUpdated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, SYSDATETIME(), SYSDATETIME(), ?);
-            """,
-            (
-                server_id,
-                status, sql_version, sql_edition, os_version, last_restart, total_databases, total_size_gb, last_cu_updated,
-                server_id, status, sql_version, sql_edition, os_version, last_restart, total_databases, total_size_gb, last_cu_updated,
-            ),
-        )
-
-    inv_conn.commit()
-    inv_conn.close()    
+    Servers are probed concurrently (one batched query each, with login/query
+    timeouts) and written back with one set-based MERGE; see fleet_scanner.
+    """
+    return scan_fleet()
 
 
-def get_servers(sql_version=None, windows_version=None):
+def get_servers(sql_version=None, windows_version=None, live_drives=False):
     """
-    Get all servers for the home page cards from ServerList + ServerInfo,
-    with optional filters on SQLVersion and OSVersion (Windows version).
-    """
-    conn = get_inventory_connection()
-    cur = conn.cursor()
+    Get all servers for the home page cards from the shared server cache
+    (ServerList + ServerInfo + stored drives), with optional substring filters
+    on SQLVersion and OSVersion (Windows version).
 
-    query = """
-        SELECT
-            sl.ID              AS id,
-            sl.ServerName      AS name,
-            sl.Environment      AS environment,
-            si.Status          AS status,
-            si.SQLVersion      AS sql_version,
-            si.SQLEdition      AS sql_edition,
-            si.OSVersion       AS os_version,
-            si.TotalDatabases  AS total_databases,
-            si.TotalSizeGB     AS total_size_gb,
-            si.LastScan        AS last_scan,
-            si.LastRestart     AS last_restart
-        FROM dbo.ServerList AS sl
-        LEFT JOIN dbo.ServerInfo AS si
-             ON si.ServerID = sl.ID
-        WHERE 1 = 1
+    live_drives=True reads drive space from the servers now (bounded by
+    INV_LIVE_DRIVES_BUDGET) instead of the last fleet scan.
     """
-
-    params = []
-
-    if sql_version:
-        query += " AND si.SQLVersion LIKE ?"
-        params.append(f"%{sql_version}%")
-
-    if windows_version:
-        # OSVersion holds the Windows release string (what we treat as 'Windows version')
-        query += " AND si.OSVersion LIKE ?"
-        params.append(f"%{windows_version}%")
-
-    query += " ORDER BY sl.ServerName;"
+    sql_filter = (sql_version or "").lower()
+    # OSVersion holds the Windows release string (what we treat as 'Windows version')
+    windows_filter = (windows_version or "").lower()
 
     servers = []
-    try:
-        cur.execute(query, params)
-        for row in cur.fetchall():
-            servers.append(
-                {
-                    "id": row.id,
-                    "name": row.name,
-                    "status": row.status or "UNKNOWN",
-                    "sql_version": row.sql_version,
-                    "sql_edition": row.sql_edition,
-                    "os_version": row.os_version,
-                    "total_databases": row.total_databases or 0,
-                    "total_size_gb": float(row.total_size_gb or 0),
-                    "environment": getattr(row, 'environment', None),
-                    "last_scan": row.last_scan,
-                    "last_restart": row.last_restart,
-                }
-            )
-        conn.close()
-    except Exception:
-        # Fallback if Environment column doesn't exist — run without it and classify by name
-        query2 = query.replace("sl.Environment      AS environment,\n", "")
-        cur.execute(query2, params)
-        for row in cur.fetchall():
-            env = classify_environment(row.name)
-            servers.append(
-                {
-                    "id": row.id,
-                    "name": row.name,
-                    "status": row.status or "UNKNOWN",
-                    "sql_version": row.sql_version,
-                    "sql_edition": row.sql_edition,
-                    "os_version": row.os_version,
-                    "total_databases": row.total_databases or 0,
-                    "total_size_gb": float(row.total_size_gb or 0),
-                    "environment": env,
-                    "last_scan": row.last_scan,
-                    "last_restart": row.last_restart,
-                }
-            )
-        conn.close()
-    # Enrich each server with drive info (multiple drives) by querying the instance.
-    for s in servers:
-        s["drives"] = []
-        try:
-            # Query the target instance for volumes where SQL has files
-            tconn = get_sql_connection(s["name"], "master")
-            tcur = tconn.cursor()
-            try:
-                tcur.execute(
-                    """
-                    ;WITH drives AS (
-                        SELECT DISTINCT
-                            vs.volume_mount_point,
-                            vs.logical_volume_name,
-                            vs.total_bytes,
-                            vs.available_bytes
-                        FROM sys.master_files AS mf
-                        CROSS APPLY sys.dm_os_volume_stats(mf.database_id, mf.file_id) AS vs
-                    )
-                    SELECT
-                        volume_mount_point,
-                        logical_volume_name,
-                        total_bytes,
-                        available_bytes
-                    FROM drives;
-                    """
-                )
-                for d in tcur.fetchall():
-                    total_gb = (d.total_bytes or 0) / 1024.0 / 1024.0 / 1024.0
-                    free_gb = (d.available_bytes or 0) / 1024.0 / 1024.0 / 1024.0
-                    free_pct = None
-                    if total_gb > 0:
-                        free_pct = round((free_gb / total_gb) * 100, 1)
-                    s["drives"].append({
-                        "mount_point": d.volume_mount_point,
-                        "name": d.logical_volume_name,
-                        "total_gb": total_gb,
-                        "free_gb": free_gb,
-                        "free_pct": free_pct,
-                    })
-            except Exception:
-                s["drives"] = []
-            finally:
-                try:
-                    tconn.close()
-                except Exception:
-                    pass
-        except Exception:
-            # unreachable / offline
-            s["drives"] = []
+    for s in get_all_servers():
+        if sql_filter and sql_filter not in (s["sql_version"] or "").lower():
+            continue
+        if windows_filter and windows_filter not in (s["os_version"] or "").lower():
+            continue
+        # No Environment column (or value): classify by name
+        s["environment"] = s["environment"] or classify_environment(s["name"])
+        servers.append(s)
+
+    # Drive info: collected by the fleet scanner into dbo.ServerDrives (cached
+    # with the servers), or read live from every server concurrently within one page budget.
+    if live_drives:
+        live = collect_drives_live([(s["id"], s["name"]) for s in servers])
+        for s in servers:
+            s["drives"] = live.get(s["id"], s["drives"])
 
     return servers
 
@@ -510,110 +317,6 @@ def classify_environment(server_name: str) -> str:
     return "test"
 
 
-def fetch_cu_details(server_name: str) -> dict:
-    """Fetch CU / update details live from a target SQL Server.
-
-    Returns keys:
-      - product_version
-      - cu_level
-      - cu_reference
-      - error
-
-    Notes:
-    - SQL Server does not reliably expose the *install date* of a CU via a simple DMV.
-      We surface a "checked_at" timestamp elsewhere (from ServerInfo.LastUpdated/LastScan).
-    """
-    details = {
-        "product_version": None,
-        "cu_level": None,
-        "cu_reference": None,
-        "error": None,
-    }
-
-    try:
-        conn = get_sql_connection(server_name, "master")
-        cur = conn.cursor()
-        row = cur.execute(
-            """
-            SELECT
-                CAST(SERVERPROPERTY('ProductVersion') AS NVARCHAR(50)) AS product_version,
-                CAST(SERVERPROPERTY('ProductLevel') AS NVARCHAR(50)) AS product_level,
-                CAST(SERVERPROPERTY('ProductUpdateLevel') AS NVARCHAR(50)) AS product_update_level,
-                CAST(SERVERPROPERTY('ProductUpdateReference') AS NVARCHAR(255)) AS product_update_reference;
-            """
-        ).fetchone()
-        if row:
-            details["product_version"] = row.product_version
-            # Prefer ProductUpdateLevel when available (often CUxx), else ProductLevel.
-            details["cu_level"] = row.product_update_level or row.product_level
-            details["cu_reference"] = row.product_update_reference
-        conn.close()
-    except Exception as e:
-        details["error"] = str(e)
-
-    return details
-
-
-def get_environment_summary_rows() -> dict:
-    """Return servers grouped by env with columns required for the summary page.
-
-    Source of truth: dbo.ServerList.Environment (prod/test/dev).
-    """
-    conn = get_inventory_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT
-            sl.ID AS id,
-            sl.ServerName AS name,
-            sl.Environment AS environment,
-            si.Status AS status,
-            si.OSVersion AS os_version,
-            si.LastCUUpdated AS last_cu_updated,
-            si.SQLVersion AS sql_version,
-            si.LastUpdated AS last_updated,
-            si.LastScan AS last_scan
-        FROM dbo.ServerList AS sl
-        LEFT JOIN dbo.ServerInfo AS si
-            ON si.ServerID = sl.ID
-        ORDER BY sl.ServerName;
-        """
-    )
-
-    rows = {"test": [], "prod": [], "dev": []}
-
-    for r in cur.fetchall():
-        # ✅ Use table column as truth
-        env = (getattr(r, "environment", None) or "").strip().lower()
-
-        # Safety: handle NULL/garbage values
-        if env not in ("test", "prod", "dev"):
-            env = "test"   # choose your default bucket
-
-        cu = fetch_cu_details(r.name)
-
-        checked_at = getattr(r, "last_cu_updated", None) or r.last_scan or r.last_updated
-
-        rows[env].append(
-            {
-                "id": r.id,
-                "name": r.name,
-                "status": (r.status or "UNKNOWN"),
-                "os_version": r.os_version,
-                "sql_version": r.sql_version,
-                "cu_level": cu.get("cu_level"),
-                "cu_reference": cu.get("cu_reference"),
-                "cu_checked_at": checked_at,
-                "cu_error": cu.get("error"),
-            }
-        )
-
-    conn.close()
-    return rows
-
-
-
 # ---------- DB OBJECT INVENTORY HELPERS ----------
 
 def get_db_objects_summary_and_lists(server_name: str, db_name: str):
@@ -624,127 +327,20 @@ def get_db_objects_summary_and_lists(server_name: str, db_name: str):
         "views": int,
         "procedures": int,
         "functions": int,
+        "table_triggers": int,
       }
 
       objects_by_type = {
-        "TABLE":     [ { "full_name": "schema.table" }, ... ],
+        "TABLE":     [ { "object_id": int, "full_name": "schema.table", ... }, ... ],
         "VIEW":      [ { "full_name": "schema.view" }, ... ],
         "PROCEDURE": [ { "full_name": "schema.proc" }, ... ],
         "FUNCTION":  [ { "full_name": "schema.func" }, ... ],
       }
 
-    Uses the same SQL instance as the inventory DB and switches to [db_name].
+    Served from catalog_cache: one signature query per view, the full
+    catalog (single UNION ALL) only when sys.objects changed.
     """
-    conn = get_sql_connection(server_name, db_name)
-    cur = conn.cursor()
-
-    # ---- Summary counts ----
-    cur.execute(
-        """
-        SELECT 
-            SUM(CASE WHEN type = 'U'                          THEN 1 ELSE 0 END) AS tables,
-            SUM(CASE WHEN type = 'V'                          THEN 1 ELSE 0 END) AS views,
-            SUM(CASE WHEN type IN ('P','X')                   THEN 1 ELSE 0 END) AS procedures,
-            SUM(CASE WHEN type IN ('FN','IF','TF','FS','FT')  THEN 1 ELSE 0 END) AS functions
-        FROM sys.objects
-        WHERE is_ms_shipped = 0
-          AND type IN ('U','V','P','X','FN','IF','TF','FS','FT');
-        """
-    )
-    r = cur.fetchone()
-    objects_summary = {
-        "tables": int(r.tables or 0),
-        "views": int(r.views or 0),
-        "procedures": int(r.procedures or 0),
-        "functions": int(r.functions or 0),
-    }
-
-    cur.execute(
-        """
-        SELECT COUNT(*) AS table_triggers
-        FROM sys.triggers
-        WHERE is_ms_shipped = 0
-          AND parent_class_desc = 'OBJECT_OR_COLUMN';
-        """
-    )
-    r_trig = cur.fetchone()
-    objects_summary["table_triggers"] = int(r_trig.table_triggers or 0)
-
-    # ---- Lists per type ----
-    objects_by_type = {
-        "TABLE": [],
-        "VIEW": [],
-        "PROCEDURE": [],
-        "FUNCTION": [],
-    }
-
-    # Tables
-    cur.execute(
-        """
-        SELECT s.name AS schema_name, t.name AS object_name
-        FROM sys.tables AS t
-        INNER JOIN sys.schemas AS s
-            ON t.schema_id = s.schema_id
-        WHERE t.is_ms_shipped = 0
-        ORDER BY s.name, t.name;
-        """
-    )
-    for row in cur.fetchall():
-        objects_by_type["TABLE"].append(
-            {"full_name": f"{row.schema_name}.{row.object_name}"}
-        )
-
-    # Views
-    cur.execute(
-        """
-        SELECT s.name AS schema_name, v.name AS object_name
-        FROM sys.views AS v
-        INNER JOIN sys.schemas AS s
-            ON v.schema_id = s.schema_id
-        WHERE v.is_ms_shipped = 0
-        ORDER BY s.name, v.name;
-        """
-    )
-    for row in cur.fetchall():
-        objects_by_type["VIEW"].append(
-            {"full_name": f"{row.schema_name}.{row.object_name}"}
-        )
-
-    # Stored procedures (P, X)
-    cur.execute(
-        """
-        SELECT s.name AS schema_name, p.name AS object_name
-        FROM sys.procedures AS p
-        INNER JOIN sys.schemas AS s
-            ON p.schema_id = s.schema_id
-        WHERE p.is_ms_shipped = 0
-        ORDER BY s.name, p.name;
-        """
-    )
-    for row in cur.fetchall():
-        objects_by_type["PROCEDURE"].append(
-            {"full_name": f"{row.schema_name}.{row.object_name}"}
-        )
-
-    # Functions
-    cur.execute(
-        """
-        SELECT s.name AS schema_name, o.name AS object_name
-        FROM sys.objects AS o
-        INNER JOIN sys.schemas AS s
-            ON o.schema_id = s.schema_id
-        WHERE o.is_ms_shipped = 0
-          AND o.type IN ('FN','IF','TF','FS','FT')
-        ORDER BY s.name, o.name;
-        """
-    )
-    for row in cur.fetchall():
-        objects_by_type["FUNCTION"].append(
-            {"full_name": f"{row.schema_name}.{row.object_name}"}
-        )
-
-    conn.close()
-    return objects_summary, objects_by_type
+    return get_object_catalog(server_name, db_name)
 
 # ---------- TEMPLATE FILTERS ----------
 
@@ -761,23 +357,29 @@ def format_datetime(value):
 
 @app.route("/")
 def index():
-    # Refresh local server snapshot each time (for now).
-    refresh_all_server_info()
-
-    # Read filters from query string
+    # Render from the last ServerInfo snapshot; the fleet scan runs in the
+    # background (refresh_scheduler), never on this request.
     sql_version = (request.args.get("sql_version") or "").strip()
     windows_version = (request.args.get("windows_version") or "").strip()
 
     servers = get_servers(
         sql_version=sql_version or None,
         windows_version=windows_version or None,
+        live_drives=request.args.get("live") == "1",
     )
 
+    age = snapshot_age_seconds(servers)
+    if age is None:
+        # Nothing scanned yet: kick off a scan, page shows "refreshing"
+        refresh_scheduler.trigger()
+
     return render_template(
         "index.html",
         servers=servers,
         sql_version=sql_version,
         windows_version=windows_version,
+        snapshot_age=format_age(age),
+        refresh_status=refresh_scheduler.status(),
     )
 
 
@@ -799,108 +401,25 @@ def environments_summary():
     env_filter = (request.args.get("env") or "").strip().lower()
     sql_version_filter = (request.args.get("sql_version") or "").strip()
 
-    env_rows = get_environment_summary_rows()
-
-    # Collect available Windows versions, statuses and SQL versions from ServerInfo for filter options
-    conn = get_inventory_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT OSVersion FROM dbo.ServerInfo WHERE OSVersion IS NOT NULL ORDER BY OSVersion;")
-    windows_versions = [r.OSVersion for r in cur.fetchall() if getattr(r, 'OSVersion', None)]
-    cur.execute("SELECT DISTINCT ISNULL(Status,'UNKNOWN') AS Status FROM dbo.ServerInfo ORDER BY Status;")
-    statuses = [r.Status for r in cur.fetchall() if getattr(r, 'Status', None)]
-    cur.execute("SELECT DISTINCT SQLVersion FROM dbo.ServerInfo WHERE SQLVersion IS NOT NULL ORDER BY SQLVersion;")
-    sql_versions = [r.SQLVersion for r in cur.fetchall() if getattr(r, 'SQLVersion', None)]
-    conn.close()
-
-    # Collect CU level options from the live CU fetch results in env_rows
-    cu_levels_set = set()
-    for bucket in env_rows.values():
-        for s in bucket:
-            lvl = s.get("cu_level")
-            if lvl:
-                cu_levels_set.add(lvl)
-    cu_levels = sorted(cu_levels_set)
-
-    # Apply filters/search (case-insensitive search for server name)
-    def _match(s):
-        if search:
-            if search.lower() not in (s.get("name") or "").lower():
-                return False
-        if windows_filter:
-            if (s.get("os_version") or "") != windows_filter:
-                return False
-        if status_filter:
-            if (s.get("status") or "").upper() != status_filter.upper():
-                return False
-        if cu_filter:
-            if (s.get("cu_level") or "") != cu_filter:
-                return False
-        if sql_version_filter:
-            if sql_version_filter.lower() not in ((s.get("sql_version") or "").lower()):
-                return False
-        return True
-
-    filtered = {"test": [], "prod": [], "dev": []}
-    for k, bucket in env_rows.items():
-        for s in bucket:
-            if _match(s):
-                filtered[k].append(s)
-
-    # If an environment filter was provided, only show that bucket
-    visible_envs = ["test", "prod", "dev"]
-    if env_filter in visible_envs:
-        filtered = {env_filter: filtered.get(env_filter, [])}
-        visible_envs = [env_filter]
-
-    # Build per-environment summaries (counts by windows version + SQL version)
-    env_summaries = {}
-    # For consistent ordering, use windows_versions and sql_versions collected earlier
-    for env_key in ["test", "prod", "dev"]:
-        raw_bucket = env_rows.get(env_key, [])  # overall (unfiltered) bucket
-        bucket = filtered.get(env_key, [])      # filtered bucket
-
-        # overall total (unfiltered)
-        overall_total = len(raw_bucket)
-
-        # filtered totals
-        total_filtered = len(bucket)
-
-        # counts by windows in filtered bucket
-        w_counts = {}
-        for s in bucket:
-            w = s.get("os_version") or "N/A"
-            w_counts[w] = w_counts.get(w, 0) + 1
-        ordered_w = []
-        for w in windows_versions:
-            if w in w_counts:
-                ordered_w.append((w, w_counts[w]))
-        for w, c in w_counts.items():
-            if w not in windows_versions:
-                ordered_w.append((w, c))
-
-        # counts by SQL version in filtered bucket
-        s_counts = {}
-        for s in bucket:
-            sv = s.get("sql_version") or "N/A"
-            s_counts[sv] = s_counts.get(sv, 0) + 1
-        ordered_s = []
-        for sv in sql_versions:
-            if sv in s_counts:
-                ordered_s.append((sv, s_counts[sv]))
-        for sv, c in s_counts.items():
-            if sv not in sql_versions:
-                ordered_s.append((sv, c))
-
-        env_summaries[env_key] = {
-            "counts_by_windows": ordered_w,
-            "counts_by_sql": ordered_s,
-            "total_filtered": total_filtered,
-            "overall_total": overall_total,
-        }
+    # Filters, grouping and counts run in SQL (env_summary); filter options
+    # are cached until the next fleet scan.
+    env_rows, env_summaries = get_environment_summary(
+        search=search or None,
+        windows_version=windows_filter or None,
+        status=status_filter or None,
+        cu_level=cu_filter or None,
+        sql_version=sql_version_filter or None,
+        env=env_filter or None,
+    )
+    options = get_filter_options()
+    windows_versions = options["windows_versions"]
+    statuses = options["statuses"]
+    sql_versions = options["sql_versions"]
+    cu_levels = options["cu_levels"]
 
     return render_template(
         "environments.html",
-        env_rows=filtered,
+        env_rows=env_rows,
         windows_versions=windows_versions,
         statuses=statuses,
         cu_levels=cu_levels,
@@ -917,10 +436,127 @@ def environments_summary():
 
 @app.route("/refresh")
 def refresh():
-    refresh_all_server_info()
+    """On-demand scan. Joins a scan already in flight; ?wait=0 returns immediately."""
+    if request.args.get("wait") == "0":
+        refresh_scheduler.trigger()
+    else:
+        refresh_scheduler.run_once(wait=True, timeout=60)
     return redirect(url_for("index"))
 
 
+@app.route("/refresh/status")
+def refresh_status():
+    status = refresh_scheduler.status()
+    for k in ("last_started", "last_finished"):
+        status[k] = status[k].isoformat() if status[k] else None
+    return jsonify(status)
+
+
+def _perf_ranking_args():
+    metric = (request.args.get("metric") or "cpu").lower()
+    if metric not in METRICS:
+        abort(400)
+    hours = max(1, min(request.args.get("hours", 24, type=int), 24 * 90))
+    limit = max(1, min(request.args.get("limit", 25, type=int), 500))
+    server_id = request.args.get("server_id", type=int)
+    return metric, hours, limit, server_id
+
+
+@app.route("/performance/procedures")
+def performance_procedures():
+    """Fleet-wide top-N procedures from the harvested history.
+
+    ?metric=cpu|duration|reads|writes|physical_reads|executions&hours=24&limit=25&server_id=
+    """
+    metric, hours, limit, server_id = _perf_ranking_args()
+    return jsonify({
+        "status": "ok",
+        "metric": metric,
+        "hours": hours,
+        "procedures": top_procedures(metric, hours, limit, server_id),
+    })
+
+
+@app.route("/performance/queries")
+def performance_queries():
+    """Fleet-wide top-N statements (by query_hash); same arguments as /performance/procedures."""
+    metric, hours, limit, server_id = _perf_ranking_args()
+    return jsonify({
+        "status": "ok",
+        "metric": metric,
+        "hours": hours,
+        "queries": top_queries(metric, hours, limit, server_id),
+    })
+
+
+@app.route("/performance/harvest", methods=["POST"])
+def performance_harvest():
+    """Start a harvest now (joins one already running)."""
+    harvester.trigger()
+    return jsonify({"status": "queued"}), 202
+
+
+@app.route("/performance/harvest/status")
+def performance_harvest_status():
+    status = harvester.status()
+    for k in ("last_started", "last_finished"):
+        status[k] = status[k].isoformat() if status[k] else None
+    return jsonify(status)
+
+
+@app.route("/reports")
+def fleet_reports():
+    """Fleet questions over dbo.db_metadata / dbo.ServerInfo (?report=key&server=substring&<params>)."""
+    report_key = request.args.get("report") or "server_compare"
+    if report_key not in REPORTS:
+        abort(404)
+    server_filter = (request.args.get("server") or "").strip() or None
+    params = resolve_params(report_key, request.args)
+
+    rows = list(iter_report(report_key, params, server_filter))
+    return render_template(
+        "reports.html",
+        reports=list_reports(),
+        report_key=report_key,
+        report=REPORTS[report_key],
+        params=params,
+        server_filter=server_filter or "",
+        rows=rows,
+    )
+
+
+@app.route("/reports/<report_key>.csv")
+def fleet_report_csv(report_key: str):
+    """Same report as /reports, streamed as CSV straight from the inventory cursor."""
+    if report_key not in REPORTS:
+        abort(404)
+    server_filter = (request.args.get("server") or "").strip() or None
+    params = resolve_params(report_key, request.args)
+    columns = REPORTS[report_key]["columns"]
+
+    def generate():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow([label for _, label in columns])
+        for i, row in enumerate(iter_report(report_key, params, server_filter, limit=REPORT_CSV_LIMIT)):
+            w.writerow([row.get(key) for key, _ in columns])
+            if i % 200 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        yield buf.getvalue()
+
+    filename = f"fleet_{report_key}_{datetime.now():%Y%m%d_%H%M}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
 @app.route("/server/<int:server_id>")
 def server_detail(server_id: int):
     server = get_server_by_id(server_id)
@@ -930,11 +566,27 @@ def server_detail(server_id: int):
     metrics = get_server_metrics(server_id)
     databases = get_databases_for_server(server_id)
 
+    # CPU / memory / waits / IO history from the collector's rollups (one
+    # inventory query; no DMV reads against the target for these).
+    perf_range = request.args.get("range") or "24h"
+    perf = get_server_metric_series(server_id, perf_range)
+    sql_memory_mb = perf["latest"].get("memory_sql_mb")
+    if metrics and sql_memory_mb is not None:
+        metrics["hardware"]["sql_memory_used_gb"] = sql_memory_mb / 1024.0
+
+    # Days-until-full per drive from the stored capacity forecast.
+    if metrics:
+        forecasts = get_drive_forecasts(server_id)
+        for d in metrics["hardware"]["drives"]:
+            d["forecast"] = forecasts.get(d["mount_point"])
+
     return render_template(
         "server.html",
         server=server,
         metrics=metrics,
         databases=databases,
+        perf=perf,
+        perf_ranges=list(METRIC_RANGES),
     )
 
 
@@ -945,43 +597,71 @@ def db_detail(server_id: int, db_name: str):
     if not server:
         abort(404)
 
-    # 2) Take a fresh snapshot for this DB into db_metadata
-    snapshot_db_metadata(server_id, db_name)
-
-    # 3) Load the latest metadata row
+    # 2) Live probes run side by side under one page deadline; the snapshot
+    #    refreshes db_metadata, the rest feed their own sections.
+    server_name = server['name']
+    results, pending, token = run_probes({
+        "snapshot": lambda: snapshot_db_metadata(server_id, db_name),
+        "obj_summary": lambda: get_db_object_summary(db_name, server_name=server_name),
+        "query_store": lambda: get_query_store_info(server_name, db_name),
+        "backup_sizes": lambda: get_last_backup_sizes(server_name, db_name),
+        "ag_info": lambda: get_ag_info(server_name, db_name),
+    })
+
+    # 3) Load the latest metadata row (the page cannot render without one)
     db_meta = get_db_metadata(server_id, db_name)
+    if not db_meta and "snapshot" in pending:
+        wait_probe(token, "snapshot")
+        db_meta = get_db_metadata(server_id, db_name)
     if not db_meta:
         abort(404)
 
-    obj_summary = get_db_object_summary(db_name, server_name=server['name'])
-    # Query Store info (live)
-    query_store = get_query_store_info(server['name'], db_name)
-    # Backup sizes (full/diff/log)
-    backup_sizes = None
-    try:
-        from .db_detail import get_last_backup_sizes
-        backup_sizes = get_last_backup_sizes(server['name'], db_name)
-    except Exception:
-        backup_sizes = None
-    # AG info (commit mode / sync state)
-    ag_info = None
-    try:
-        from .db_detail import get_ag_info
-        ag_info = get_ag_info(server['name'], db_name)
-    except Exception:
-        ag_info = None
-
     return render_template(
         "db.html",
         server=server,
         db=db_meta,
-        obj_summary=obj_summary,
-        query_store=query_store,
-        backup_sizes=backup_sizes,
-        ag_info=ag_info,
+        obj_summary=results.get("obj_summary"),
+        query_store=results.get("query_store"),
+        backup_sizes=results.get("backup_sizes"),
+        ag_info=results.get("ag_info"),
+        growth=get_database_forecast(server_id, db_name),
+        pending_probes=pending,
+        probe_token=token,
     )
 
 
+def _render_probe_slots(name: str, value) -> dict:
+    """HTML for the db.html slots fed by one probe (see _db_probes.html)."""
+    macro = lambda m: get_template_attribute("_db_probes.html", m)
+    if name == "obj_summary":
+        return {"obj_summary": str(macro("obj_summary_block")(value))}
+    if name == "query_store":
+        return {"query_store": str(macro("query_store_value")(value))}
+    if name == "backup_sizes":
+        backup_size = macro("backup_size")
+        return {
+            "backup_sizes:full": str(backup_size(value, "full")),
+            "backup_sizes:diff": str(backup_size(value, "diff")),
+            "backup_sizes:log": str(backup_size(value, "log", "Size : ")),
+        }
+    if name == "ag_info":
+        return {"ag_info": str(macro("ag_mode_value")(value))}
+    return {}
+
+
+@app.route("/server/<int:server_id>/db/<path:db_name>/probes/<token>")
+def db_detail_probes(server_id: int, db_name: str, token: str):
+    """Poll target for db_detail probes that missed the page deadline."""
+    finished, still = collect_pending(token)
+    if finished is None:
+        return jsonify({"slots": {}, "pending": []}), 404
+
+    slots = {}
+    for name, value in finished.items():
+        slots.update(_render_probe_slots(name, value))
+    return jsonify({"slots": slots, "pending": still})
+
+
 @app.route(
     "/server/<int:server_id>/db/<path:db_name>/objects/download-multi",
     methods=["GET"]
@@ -1004,188 +684,281 @@ def download_objects_multi(server_id: int, db_name: str):
     if not selected_names:
         return make_response("No objects selected", 400)
 
-    conn = get_sql_connection(server['name'], db_name)
+    filename = f"{db_name}_{obj_type.lower()}_VISIBLE_selected.csv"
 
-    buf = io.StringIO()
-    w = csv.writer(buf)
+    def generate():
+        # Metadata arrives in growing batches (first batch small so bytes go
+        # out right away); each object's sections are flushed as written.
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        index_lookup = get_index_lookup(server['name'], db_name) if obj_type == "TABLE" else None
+        conn = get_sql_connection(server['name'], db_name)
+        try:
+            pos, batch = 0, MULTI_CSV_FIRST_BATCH
+            while pos < len(selected_names):
+                chunk = selected_names[pos:pos + batch]
+                pos += len(chunk)
+                batch = min(batch * 2, MULTI_CSV_MAX_BATCH)
+
+                # The CSV has no plan section: skip the plan DMV fetch + parse.
+                metas = get_objects_metadata(conn, db_name, chunk, obj_type, index_lookup=index_lookup,
+                                             with_plans=False)
+                for full_name in chunk:
+                    meta = metas.get(full_name)
+                    if not meta:
+                        continue
+                    _write_object_csv_sections(w, meta, obj_type)
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate(0)
+        finally:
+            conn.close()
 
-    for full_name in selected_names:
-        meta = get_object_metadata(conn, db_name, full_name, obj_type)
-        if not meta:
-            continue
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
-        e = meta.get("extras", {}) or {}
-        referenced = meta.get("referenced", []) or []
-        referencing = meta.get("referencing", []) or []
-        ref_summary = meta.get("referenced_summary", {}) or {}
-
-        # ----------------------------
-        # 1) OVERVIEW (single neat row)
-        # ----------------------------
-        w.writerow(["OBJECT_OVERVIEW"])
-        w.writerow([
-            "full_name","type_desc","create_date","modify_date",
-            "row_count","used_mb","reserved_mb","index_count",
-            "is_partitioned","partition_count","partition_scheme","partition_function","partition_key",
-            "parameter_count",
-            "uses_temp_tables","uses_transactions","uses_cursor","uses_while_loop","uses_triggers"
-            ])
 
+def _write_object_csv_sections(w, meta: dict, obj_type: str):
+    """One object's OVERVIEW / DEPENDENCIES / PARAMETERS / TABLE sections for the multi-object CSV."""
+    e = meta.get("extras", {}) or {}
+    referenced = meta.get("referenced", []) or []
+    referencing = meta.get("referencing", []) or []
+    ref_summary = meta.get("referenced_summary", {}) or {}
+
+    # ----------------------------
+    # 1) OVERVIEW (single neat row)
+    # ----------------------------
+    w.writerow(["OBJECT_OVERVIEW"])
+    w.writerow([
+        "full_name","type_desc","create_date","modify_date",
+        "row_count","used_mb","reserved_mb","index_count",
+        "is_partitioned","partition_count","partition_scheme","partition_function","partition_key",
+        "parameter_count",
+        "uses_temp_tables","uses_transactions","uses_cursor","uses_while_loop","uses_triggers"
+        ])
 
-        param_count = len(e.get("parameters", []) or [])
 
-        w.writerow([
-            meta.get("full_name"),
-            meta.get("type_desc"),
-            meta.get("create_date"),
-            meta.get("modify_date"),
-            
-            e.get("row_count"),
-            e.get("used_mb"),
-            e.get("reserved_mb"),
-            e.get("index_count"),
+    param_count = len(e.get("parameters", []) or [])
 
-            e.get("is_partitioned") if obj_type == "TABLE" else "",
-            e.get("partition_count") if obj_type == "TABLE" else "",
-            e.get("partition_scheme") if obj_type == "TABLE" else "",
-            e.get("partition_function") if obj_type == "TABLE" else "",
-            e.get("partition_key") if obj_type == "TABLE" else "",
+    w.writerow([
+        meta.get("full_name"),
+        meta.get("type_desc"),
+        meta.get("create_date"),
+        meta.get("modify_date"),
+        
+        e.get("row_count"),
+        e.get("used_mb"),
+        e.get("reserved_mb"),
+        e.get("index_count"),
 
-            (len(e.get("parameters", []) or []) if obj_type in ("PROCEDURE","FUNCTION") else ""),
+        e.get("is_partitioned") if obj_type == "TABLE" else "",
+        e.get("partition_count") if obj_type == "TABLE" else "",
+        e.get("partition_scheme") if obj_type == "TABLE" else "",
+        e.get("partition_function") if obj_type == "TABLE" else "",
+        e.get("partition_key") if obj_type == "TABLE" else "",
 
-            e.get("uses_temp_tables") if obj_type in ("PROCEDURE","VIEW") else "",
-            e.get("uses_transactions") if obj_type in ("PROCEDURE",) else "",
-            e.get("uses_cursor") if obj_type in ("PROCEDURE","VIEW") else "",
-            e.get("uses_while_loop") if obj_type in ("PROCEDURE","VIEW") else "",
-            e.get("uses_triggers") if obj_type in ("PROCEDURE","VIEW") else "",])
+        (len(e.get("parameters", []) or []) if obj_type in ("PROCEDURE","FUNCTION") else ""),
 
+        e.get("uses_temp_tables") if obj_type in ("PROCEDURE","VIEW") else "",
+        e.get("uses_transactions") if obj_type in ("PROCEDURE",) else "",
+        e.get("uses_cursor") if obj_type in ("PROCEDURE","VIEW") else "",
+        e.get("uses_while_loop") if obj_type in ("PROCEDURE","VIEW") else "",
+        e.get("uses_triggers") if obj_type in ("PROCEDURE","VIEW") else "",])
 
-        # ----------------------------
-        # 2) REFERENCED SUMMARY
-        # ----------------------------
-        
 
-        # ----------------------------
-        # 3) DEPENDENCIES (neat table)
-        # ----------------------------
-        w.writerow(["DEPENDENCIES"])
-        w.writerow(["direction", "object_full_name", "type_desc"])
+    # ----------------------------
+    # 2) REFERENCED SUMMARY
+    # ----------------------------
+    
 
-        for r in referenced:
-            w.writerow(["ReferencedByThis", r.get("full_name"), r.get("type_desc")])
+    # ----------------------------
+    # 3) DEPENDENCIES (neat table)
+    # ----------------------------
+    w.writerow(["DEPENDENCIES"])
+    w.writerow(["direction", "object_full_name", "type_desc"])
 
-        for r in referencing:
-            w.writerow(["ReferencesThis", r.get("full_name"), r.get("type_desc")])
+    for r in referenced:
+        w.writerow(["ReferencedByThis", r.get("full_name"), r.get("type_desc")])
 
+    for r in referencing:
+        w.writerow(["ReferencesThis", r.get("full_name"), r.get("type_desc")])
+
+    w.writerow([])
+
+    # ----------------------------
+    # 4) PARAMETERS (only for SP/FN)
+    # ----------------------------
+    params = e.get("parameters", []) or []
+    if obj_type in ("PROCEDURE", "FUNCTION") and params:
+        w.writerow(["PARAMETERS"])
+        if obj_type == "PROCEDURE":
+            w.writerow(["param_name","data_type","is_output","is_nullable","max_length","precision","scale"])
+            for p in params:
+                w.writerow([
+                    p.get("name"),
+                    p.get("system_type_name") or p.get("data_type"),
+                    p.get("is_output"),
+                    p.get("is_nullable"),
+                    p.get("max_length"),
+                    p.get("precision"),
+                    p.get("scale"),
+                ])
+        else:
+            w.writerow(["param_name","data_type","max_length","precision","scale"])
+            for p in params:
+                w.writerow([
+                    p.get("name"),
+                    p.get("system_type_name") or p.get("data_type"),
+                    p.get("max_length"),
+                    p.get("precision"),
+                    p.get("scale"),
+                ])
         w.writerow([])
 
-        # ----------------------------
-        # 4) PARAMETERS (only for SP/FN)
-        # ----------------------------
-        params = e.get("parameters", []) or []
-        if obj_type in ("PROCEDURE", "FUNCTION") and params:
-            w.writerow(["PARAMETERS"])
-            if obj_type == "PROCEDURE":
-                w.writerow(["param_name","data_type","is_output","is_nullable","max_length","precision","scale"])
-                for p in params:
-                    w.writerow([
-                        p.get("name"),
-                        p.get("system_type_name") or p.get("data_type"),
-                        p.get("is_output"),
-                        p.get("is_nullable"),
-                        p.get("max_length"),
-                        p.get("precision"),
-                        p.get("scale"),
-                    ])
-            else:
-                w.writerow(["param_name","data_type","max_length","precision","scale"])
-                for p in params:
-                    w.writerow([
-                        p.get("name"),
-                        p.get("system_type_name") or p.get("data_type"),
-                        p.get("max_length"),
-                        p.get("precision"),
-                        p.get("scale"),
-                    ])
+    # ----------------------------
+    # 5) TABLE-ONLY: PK / INDEXES / FKs
+    # ----------------------------
+    if obj_type == "TABLE":
+        pk = e.get("primary_key") or {}
+        if pk:
+            w.writerow(["PRIMARY_KEY"])
+            w.writerow(["pk_name", "pk_columns"])
+            w.writerow([pk.get("name"), ", ".join(pk.get("columns", []) or [])])
             w.writerow([])
 
-        # ----------------------------
-        # 5) TABLE-ONLY: PK / INDEXES / FKs
-        # ----------------------------
-        if obj_type == "TABLE":
-            pk = e.get("primary_key") or {}
-            if pk:
-                w.writerow(["PRIMARY_KEY"])
-                w.writerow(["pk_name", "pk_columns"])
-                w.writerow([pk.get("name"), ", ".join(pk.get("columns", []) or [])])
-                w.writerow([])
+        idxs = e.get("indexes", []) or []
+        if idxs:
+            w.writerow(["INDEXES"])
+            w.writerow(["index_name","type_desc","is_unique","is_primary_key","key_columns","included_columns","fragmentation_percent"])
+            for idx in idxs:
+                w.writerow([
+                    idx.get("name"),
+                    idx.get("type_desc"),
+                    idx.get("is_unique"),
+                    idx.get("is_primary_key"),
+                    ", ".join(idx.get("key_columns", []) or []),
+                    ", ".join(idx.get("included_columns", []) or []),
+                    idx.get("fragmentation_percent"),
+                ])
+            w.writerow([])
 
-            idxs = e.get("indexes", []) or []
-            if idxs:
-                w.writerow(["INDEXES"])
-                w.writerow(["index_name","type_desc","is_unique","is_primary_key","key_columns","included_columns","fragmentation_percent"])
-                for idx in idxs:
-                    w.writerow([
-                        idx.get("name"),
-                        idx.get("type_desc"),
-                        idx.get("is_unique"),
-                        idx.get("is_primary_key"),
-                        ", ".join(idx.get("key_columns", []) or []),
-                        ", ".join(idx.get("included_columns", []) or []),
-                        idx.get("fragmentation_percent"),
-                    ])
-                w.writerow([])
+        fks = e.get("foreign_keys", []) or []
+        if fks:
+            w.writerow(["FOREIGN_KEYS"])
+            w.writerow(["fk_name","parent_table","parent_columns","ref_table","ref_columns"])
+            for fk in fks:
+                w.writerow([
+                    fk.get("name"),
+                    fk.get("parent_table"),
+                    ", ".join(fk.get("parent_columns", []) or []),
+                    fk.get("ref_table"),
+                    ", ".join(fk.get("ref_columns", []) or []),
+                ])
+            w.writerow([])
 
-            fks = e.get("foreign_keys", []) or []
-            if fks:
-                w.writerow(["FOREIGN_KEYS"])
-                w.writerow(["fk_name","parent_table","parent_columns","ref_table","ref_columns"])
-                for fk in fks:
-                    w.writerow([
-                        fk.get("name"),
-                        fk.get("parent_table"),
-                        ", ".join(fk.get("parent_columns", []) or []),
-                        fk.get("ref_table"),
-                        ", ".join(fk.get("ref_columns", []) or []),
+        parts = e.get("partitions") or e.get("partition_info") or []
+        if parts:
+            w.writerow(["PARTITIONS"])
+            w.writerow(["partition_number", "row_count", "reserved_mb", "used_mb", "data_compression"])
+            for p in parts:
+                w.writerow([
+                    p.get("partition_number"),
+                    p.get("row_count"),
+                    p.get("reserved_mb"),
+                    p.get("used_mb"),
+                    p.get("data_compression") or p.get("data_compression_desc"),
                     ])
                 w.writerow([])
 
-            parts = e.get("partitions") or e.get("partition_info") or []
-            if parts:
-                w.writerow(["PARTITIONS"])
-                w.writerow(["partition_number", "row_count", "reserved_mb", "used_mb", "data_compression"])
-                for p in parts:
-                    w.writerow([
-                        p.get("partition_number"),
-                        p.get("row_count"),
-                        p.get("reserved_mb"),
-                        p.get("used_mb"),
-                        p.get("data_compression") or p.get("data_compression_desc"),
-                        ])
-                    w.writerow([])
-
-
-        # Separator between objects
-        w.writerow(["-----"])
-        w.writerow([])
 
-    conn.close()
+    # Separator between objects
+    w.writerow(["-----"])
+    w.writerow([])
 
-    csv_data = buf.getvalue()
-    buf.close()
 
-    filename = f"{db_name}_{obj_type.lower()}_VISIBLE_selected.csv"
-    bio = io.BytesIO(csv_data.encode("utf-8"))
-    bio.seek(0)
-    return send_file(
-        bio,
-        mimetype="text/csv; charset=utf-8",
-        as_attachment=True,
-        download_name=filename,
-        max_age=0,
-    )
+
+@app.route("/server/<int:server_id>/db/<path:db_name>/objects/dependencies")
+def object_dependencies(server_id: int, db_name: str):
+    """Direct or transitive dependencies of one object, from the cached graph.
+
+    ?name=schema.object&direction=upstream|downstream&transitive=1
+    """
+    server = get_server_by_id(server_id)
+    if not server:
+        abort(404)
+
+    name = (request.args.get("name") or "").strip()
+    if not name:
+        return jsonify({"status": "error", "message": "name required"}), 400
+    direction = (request.args.get("direction") or "downstream").lower()
+    transitive = request.args.get("transitive") == "1"
+
+    graph = get_dependency_graph(server['name'], db_name)
+    if direction == "upstream":
+        items = graph.upstream_closure(name) if transitive else graph.referenced(name)
+    else:
+        items = graph.impact_radius(name) if transitive else graph.referencing(name)
+
+    return jsonify({
+        "status": "ok",
+        "name": name,
+        "direction": "upstream" if direction == "upstream" else "downstream",
+        "transitive": transitive,
+        "objects": items,
+    })
 
 
+@app.route("/server/<int:server_id>/db/<path:db_name>/objects/procedure-trend")
+def procedure_perf_trend(server_id: int, db_name: str):
+    """Harvested CPU/reads/duration of one procedure per bucket.
+
+    ?name=schema.proc&hours=168&bucket=60 (minutes)
+    """
+    server = get_server_by_id(server_id)
+    if not server:
+        abort(404)
+
+    name = (request.args.get("name") or "").strip()
+    if not name:
+        return jsonify({"status": "error", "message": "name required"}), 400
+    hours = max(1, min(request.args.get("hours", 168, type=int), 24 * 90))
+    bucket = max(5, request.args.get("bucket", 60, type=int))
+
+    points = procedure_trend(server_id, db_name, name, hours, bucket)
+    for p in points:
+        p["bucket"] = p["bucket"].isoformat() if p["bucket"] else None
+    return jsonify({"status": "ok", "name": name, "hours": hours, "bucket_minutes": bucket, "points": points})
+
+
+@app.route("/server/<int:server_id>/db/<path:db_name>/objects/fragmentation-scan", methods=["POST"])
+def fragmentation_scan(server_id: int, db_name: str):
+    """Queue an index fragmentation scan (one table via ?name=, else the whole db)."""
+    server = get_server_by_id(server_id)
+    if not server:
+        abort(404)
+
+    object_id = None
+    name = (request.values.get("name") or "").strip()
+    if name:
+        conn = get_sql_connection(server['name'], db_name)
+        try:
+            row = conn.cursor().execute("SELECT OBJECT_ID(?, 'U') AS object_id;", (name,)).fetchone()
+        finally:
+            conn.close()
+        object_id = int(row.object_id) if row and row.object_id is not None else None
+        if object_id is None:
+            return jsonify({"status": "error", "message": f"table {name} not found"}), 404
+
+    result = request_fragmentation_scan(server['name'], db_name, object_id)
+    code = 429 if result["status"] == "rate_limited" else 202
+    return jsonify(result), code
+
 
 @app.route("/server/<int:server_id>/db/<path:db_name>/objects")
 def db_objects(server_id: int, db_name: str):
@@ -1249,19 +1022,42 @@ def db_objects(server_id: int, db_name: str):
     # Single connection to the same instance as inventory DB
     conn = get_sql_connection(server['name'], db_name)
 
+    # One query per metadata facet for the whole selection; dependencies come
+    # from the cached whole-database graph (no catalog queries per hop).
+    index_lookup = get_index_lookup(server['name'], db_name) if obj_type == "TABLE" else None
+    plan_resolver = make_plan_resolver(server['name'], db_name) if obj_type == "PROCEDURE" else None
+    metas = get_objects_metadata(
+        conn, db_name, selected_names, obj_type,
+        with_dependencies=False, index_lookup=index_lookup, plan_resolver=plan_resolver,
+    )
+    dep_graph = get_dependency_graph(server['name'], db_name)
+
+    # Procedures out of the plan cache can still be downloaded from the plan
+    # store (get_object_plan falls back to it), so the button follows both.
+    stored_plans = set()
+    if obj_type == "PROCEDURE":
+        no_current_plan = [
+            m["object_id"] for m in metas.values()
+            if m and (m.get("extras") or {}).get("exec_plan_xml") is None
+        ]
+        try:
+            stored_plans = stored_plan_objects(server['name'], db_name, no_current_plan)
+        except Exception as ex:
+            print(f"[PLAN_STORE] stored plan lookup failed: {ex}")
+
     selected_objects = []
     for full_name in selected_names:
-        meta = get_object_metadata(
-            conn,
-            db_name,
-            full_name,
-            obj_type,
-        )
-
-        # Used by the UI to disable the "Download plan" button when no cached plan exists.
-        if obj_type == "PROCEDURE":
+        meta = metas.get(full_name)
+        if meta:
+            meta["referenced"] = dep_graph.referenced(meta["full_name"])
+            meta["referencing"] = dep_graph.referencing(meta["full_name"])
+            meta["impact_radius"] = dep_graph.impact_radius(meta["full_name"])
+
+        # Used by the UI to disable the "Download plan" button when neither a
+        # cached nor a stored plan exists (same lookup as download_sqlplan).
+        if obj_type == "PROCEDURE" and meta:
             extras = meta.get("extras") or {}
-            extras["has_plan"] = has_cached_proc_plan(conn, db_name, full_name)
+            extras["has_plan"] = extras.get("exec_plan_xml") is not None or meta["object_id"] in stored_plans
             meta["extras"] = extras
 
         selected_objects.append({
@@ -1341,7 +1137,8 @@ def download_object(server_id: int, db_name: str):
     conn = get_sql_connection(server['name'], db_name)
 
     # New signature: (conn, database_name, full_name, obj_type)
-    object_meta = get_object_metadata(conn, db_name, selected_name, selected_type)
+    index_lookup = get_index_lookup(server['name'], db_name) if selected_type == "TABLE" else None
+    object_meta = get_object_metadata(conn, db_name, selected_name, selected_type, index_lookup=index_lookup)
     conn.close()
 
     if not object_meta:
@@ -1565,8 +1362,10 @@ def download_sqlplan(server_id: int, db_name: str):
     """Download the *cached* execution plan for a stored procedure as .sqlplan.
 
     Notes:
-    - This uses sys.dm_exec_procedure_stats + sys.dm_exec_query_plan.
-    - If the procedure hasn't executed since the last restart / cache clear, there may be no row.
+    - Served from plan_store: the DMVs are only asked for the current plan_handle;
+      the plan XML itself is read once per plan and kept in the inventory DB.
+    - If the procedure hasn't executed since the last restart / cache clear and no
+      plan was stored for it earlier, there is nothing to download.
     - The browser decides where the file lands (typically the user's Downloads folder).
     """
 
@@ -1578,28 +1377,11 @@ def download_sqlplan(server_id: int, db_name: str):
     if not sp_full_name:
         abort(400)
 
-    conn = get_sql_connection(server['name'], db_name)
-    try:
-        cur = conn.cursor()
-
-        # Make sure we're in the correct database context for OBJECT_ID
-        cur.execute(f"USE [{db_name.replace(']', ']]')}]")
-
-        sql = """
-        SELECT TOP (1)
-            qp.query_plan AS query_plan
-        FROM sys.dm_exec_procedure_stats AS ps
-        CROSS APPLY sys.dm_exec_query_plan(ps.plan_handle) AS qp
-        WHERE ps.object_id = OBJECT_ID(?)
-        ORDER BY ps.last_execution_time DESC;
-        """
-        cur.execute(sql, sp_full_name)
-        row = cur.fetchone()
-        print(row)
-    finally:
-        conn.close()
+    # Same stored plan the object page rendered; falls back to the last
+    # stored plan when the procedure has left the cache.
+    plan = get_object_plan(server['name'], db_name, sp_full_name)
 
-    if not row or not row[0]:
+    if not plan or not plan.get("plan_xml"):
         # No cached plan available (SP not executed / cache cleared). Keep API honest.
         msg = (
             f"No cached execution plan found for {sp_full_name} in {db_name}. "
@@ -1607,7 +1389,7 @@ def download_sqlplan(server_id: int, db_name: str):
         )
         return make_response(msg, 404)
 
-    xml_plan = str(row[0])
+    xml_plan = str(plan["plan_xml"])
     bio = io.BytesIO(xml_plan.encode("utf-8"))
     bio.seek(0)
 
@@ -1780,6 +1562,7 @@ def add_server():
         conn.commit()
     finally:
         conn.close()
+    invalidate_server_cache()
 
     sid = int(row.ID) if row and getattr(row, "ID", None) is not None else None
 
@@ -1790,6 +1573,42 @@ def add_server():
     }), 201
 
 
+@app.route("/server/bulk-add", methods=["POST"])
+def bulk_add_servers():
+    """
+    Test many servers concurrently and add the reachable ones to dbo.ServerList.
+    Accepts JSON { "servers": ["name", {"server_name": ..., "environment": ...}], "environment": "prod" }
+    or a form with a CSV "file" upload (or "servers" text, one per line) and "environment".
+    Streams NDJSON: one {"type": "server", ...} line per server as its test finishes,
+    then a {"type": "summary", ...} line after the single batch insert.
+    """
+    if request.is_json:
+        data = request.get_json() or {}
+        entries = parse_server_list(data.get("servers"), data.get("environment"))
+    else:
+        upload = request.files.get("file")
+        text = upload.read().decode("utf-8-sig", errors="replace") if upload else (request.form.get("servers") or "")
+        entries = parse_server_csv(text, request.form.get("environment"))
+
+    if not entries:
+        return jsonify({"status": "error", "message": "No server names supplied"}), 400
+    if len(entries) > ONBOARD_MAX_SERVERS:
+        return jsonify({
+            "status": "error",
+            "message": f"Too many servers ({len(entries)}); the limit is {ONBOARD_MAX_SERVERS} per request",
+        }), 413
+
+    def generate():
+        for result in iter_onboarding(entries):
+            yield json.dumps(result, default=str) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+
 
 
 
@@ -1803,6 +1622,7 @@ def get_inventory_app(shared_secret_key=None):
       can be read consistently.
     - Protects inventory routes behind the DataSolveX login session.
     - Adds server-side page logging (all pages) into dbo.page_access_logs.
+    - Starts the background ServerInfo refresh (refresh_scheduler).
     """
 
     if shared_secret_key:
@@ -1909,4 +1729,46 @@ def get_inventory_app(shared_secret_key=None):
 
         app._datasolvex_auto_logger = True
 
+    # -------------------------
+    # Background ServerInfo refresh (idempotent)
+    # -------------------------
+    if not getattr(app, "_datasolvex_refresh_scheduler", False):
+        refresh_scheduler.start()
+        app._datasolvex_refresh_scheduler = True
+
+    # -------------------------
+    # Background procedure/query stats harvest (idempotent)
+    # -------------------------
+    if PERF_HARVEST_INTERVAL > 0 and not getattr(app, "_datasolvex_perf_harvester", False):
+        harvester.start()
+        app._datasolvex_perf_harvester = True
+
+    # -------------------------
+    # Background server metric sampling (idempotent)
+    # -------------------------
+    if METRICS_INTERVAL > 0 and not getattr(app, "_datasolvex_metrics_collector", False):
+        metrics_collector.start()
+        app._datasolvex_metrics_collector = True
+
+    # -------------------------
+    # Background Win32 volume collection (idempotent)
+    # -------------------------
+    if VOLUME_INTERVAL > 0 and not getattr(app, "_datasolvex_volume_collector", False):
+        volume_collector.start()
+        app._datasolvex_volume_collector = True
+
+    # -------------------------
+    # Background db_metadata sweep for fleet reports (idempotent)
+    # -------------------------
+    if DB_METADATA_SWEEP_INTERVAL > 0 and not getattr(app, "_datasolvex_db_metadata_sweeper", False):
+        db_metadata_sweeper.start()
+        app._datasolvex_db_metadata_sweeper = True
+
+    # -------------------------
+    # Background capacity forecast fit (idempotent)
+    # -------------------------
+    if FORECAST_INTERVAL > 0 and not getattr(app, "_datasolvex_capacity_forecaster", False):
+        capacity_forecaster.start()
+        app._datasolvex_capacity_forecaster = True
+
     return app
@@ -0,0 +1,366 @@
+# capacity_forecast.py
+import os
+import threading
+import time
+
+from .db_detail import get_inventory_connection
+from .refresh_scheduler import RefreshScheduler
+from .volume_collector import ensure_volume_objects
+
+# ---------- CAPACITY FORECAST (dbo.db_metadata_history) ----------
+#
+# usp_MergeDbMetadata appends at most one size row per user database per day
+# to dbo.db_metadata_history, and only when something changed. A batch job
+# expands that change log into a daily series (each row holds until the next
+# one), fits a least-squares growth line per database and per drive for every
+# server in one set-based pass, and stores the results. Pages and reports read
+# the stored forecast; nothing is fitted per page view.
+#
+# Drive growth is the growth of the SQL files placed on that drive (data files
+# by primary_data_path, logs by log_path); free space comes from the Win32
+# volume collector, or from the fleet scan's dm_os_volume_stats drives when a
+# host has no volume rows.
+FORECAST_INTERVAL = int(os.getenv("INV_FORECAST_INTERVAL", "21600"))      # seconds (0 = off)
+FORECAST_WINDOW_DAYS = int(os.getenv("INV_FORECAST_WINDOW_DAYS", "90"))   # history used for the fit
+FORECAST_MIN_DAYS = int(os.getenv("INV_FORECAST_MIN_DAYS", "7"))          # fewer days -> no trend
+FORECAST_HISTORY_DAYS = int(os.getenv("INV_FORECAST_HISTORY_DAYS", "730"))
+
+FORECAST_DDL = [
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'CapacityForecastDatabase' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.CapacityForecastDatabase (
+            ServerID            INT            NOT NULL,
+            DatabaseName        SYSNAME        NOT NULL,
+            HistoryDays         INT            NOT NULL,
+            DataSizeMB          FLOAT          NULL,
+            LogSizeMB           FLOAT          NULL,
+            DataGrowthMBPerDay  FLOAT          NULL,
+            LogGrowthMBPerDay   FLOAT          NULL,
+            DataMountPoint      NVARCHAR(260)  NULL,
+            LogMountPoint       NVARCHAR(260)  NULL,
+            ComputedAt          DATETIME2(0)   NOT NULL,
+            CONSTRAINT PK_CapacityForecastDatabase PRIMARY KEY (ServerID, DatabaseName)
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'CapacityForecastDrive' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.CapacityForecastDrive (
+            ServerID            INT            NOT NULL,
+            MountPoint          NVARCHAR(260)  NOT NULL,
+            HistoryDays         INT            NOT NULL,
+            DatabaseCount       INT            NOT NULL,
+            SqlFilesMB          FLOAT          NULL,
+            GrowthMBPerDay      FLOAT          NULL,
+            TotalMB             FLOAT          NULL,
+            FreeMB              FLOAT          NULL,
+            DaysUntilFull       FLOAT          NULL,
+            FullOn              DATE           NULL,
+            ComputedAt          DATETIME2(0)   NOT NULL,
+            CONSTRAINT PK_CapacityForecastDrive PRIMARY KEY (ServerID, MountPoint)
+        );
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_ComputeCapacityForecast
+        @WindowDays   INT,
+        @MinDays      INT,
+        @HistoryDays  INT
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Today  DATE = CAST(GETDATE() AS DATE);
+        DECLARE @From   DATE = DATEADD(DAY, -@WindowDays, @Today);
+        DECLARE @Cutoff DATE = DATEADD(DAY, -@HistoryDays, @Today);
+
+        -- Retention: drop rows superseded before the cutoff, and dropped databases.
+        DELETE h
+        FROM dbo.db_metadata_history AS h
+        WHERE h.snapshot_date < @Cutoff
+          AND (EXISTS (SELECT 1 FROM dbo.db_metadata_history AS n
+                       WHERE n.server_id = h.server_id
+                         AND n.database_name = h.database_name
+                         AND n.snapshot_date > h.snapshot_date
+                         AND n.snapshot_date <= @Cutoff)
+               OR NOT EXISTS (SELECT 1 FROM dbo.db_metadata AS m
+                              WHERE m.server_id = h.server_id
+                                AND m.database_name = h.database_name));
+
+        CREATE TABLE #days (x INT NOT NULL PRIMARY KEY, d DATE NOT NULL);
+        INSERT INTO #days (x, d)
+        SELECT t.n, DATEADD(DAY, t.n, @From)
+        FROM (SELECT TOP (@WindowDays + 1) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS n
+              FROM sys.all_objects AS a CROSS JOIN sys.all_objects AS b) AS t;
+
+        -- Daily series for current databases: each change row holds until the next.
+        -- db_metadata(_history).data_size_mb / log_size_mb hold GB; the fit works in MB.
+        SELECT c.server_id, c.database_name, d.x,
+               CONVERT(FLOAT, ISNULL(c.data_size_mb, 0)) * 1024.0 AS data_mb,
+               CONVERT(FLOAT, ISNULL(c.log_size_mb, 0))  * 1024.0 AS log_mb,
+               c.primary_data_path, c.log_path
+        INTO #daily
+        FROM (
+            SELECT h.server_id, h.database_name, h.snapshot_date, h.data_size_mb, h.log_size_mb,
+                   h.primary_data_path, h.log_path,
+                   LEAD(h.snapshot_date) OVER (PARTITION BY h.server_id, h.database_name
+                                               ORDER BY h.snapshot_date) AS next_date
+            FROM dbo.db_metadata_history AS h
+            WHERE EXISTS (SELECT 1 FROM dbo.db_metadata AS m
+                          WHERE m.server_id = h.server_id
+                            AND m.database_name = h.database_name)
+        ) AS c
+        JOIN #days AS d
+          ON d.d >= c.snapshot_date
+         AND (c.next_date IS NULL OR d.d < c.next_date);
+
+        -- Resolve each file path to the longest matching mount point.
+        SELECT v.ServerID, v.MountPoint, CONVERT(FLOAT, v.TotalBytes) AS TotalBytes, CONVERT(FLOAT, v.FreeBytes) AS FreeBytes
+        INTO #mounts
+        FROM dbo.ServerVolumes AS v;
+
+        INSERT INTO #mounts (ServerID, MountPoint, TotalBytes, FreeBytes)
+        SELECT d.ServerID, d.MountPoint, d.TotalBytes, d.AvailableBytes
+        FROM dbo.ServerDrives AS d
+        WHERE NOT EXISTS (SELECT 1 FROM #mounts AS m WHERE m.ServerID = d.ServerID);
+
+        SELECT p.server_id, p.path, ISNULL(mp.MountPoint, LEFT(p.path, 3)) AS mount_point
+        INTO #paths
+        FROM (
+            SELECT server_id, primary_data_path AS path FROM #daily WHERE primary_data_path IS NOT NULL
+            UNION
+            SELECT server_id, log_path FROM #daily WHERE log_path IS NOT NULL
+        ) AS p
+        OUTER APPLY (
+            SELECT TOP (1) m.MountPoint
+            FROM #mounts AS m
+            WHERE m.ServerID = p.server_id
+              AND LEFT(p.path, LEN(m.MountPoint)) = m.MountPoint
+            ORDER BY LEN(m.MountPoint) DESC
+        ) AS mp;
+
+        -- Per-database fit: slope = (n*Sxy - Sx*Sy) / (n*Sxx - Sx^2).
+        SELECT s.server_id, s.database_name, s.n,
+               s.data_now, s.log_now,
+               CASE WHEN s.n >= @MinDays
+                    THEN (s.n * s.sxy_d - s.sx * s.sy_d) / NULLIF(s.n * s.sxx - s.sx * s.sx, 0) END AS data_slope,
+               CASE WHEN s.n >= @MinDays
+                    THEN (s.n * s.sxy_l - s.sx * s.sy_l) / NULLIF(s.n * s.sxx - s.sx * s.sx, 0) END AS log_slope
+        INTO #db_fit
+        FROM (
+            SELECT server_id, database_name,
+                   CONVERT(FLOAT, COUNT(*)) AS n,
+                   SUM(CONVERT(FLOAT, x)) AS sx,
+                   SUM(CONVERT(FLOAT, x) * x) AS sxx,
+                   SUM(data_mb) AS sy_d, SUM(x * data_mb) AS sxy_d,
+                   SUM(log_mb)  AS sy_l, SUM(x * log_mb)  AS sxy_l,
+                   MAX(CASE WHEN x = @WindowDays THEN data_mb END) AS data_now,
+                   MAX(CASE WHEN x = @WindowDays THEN log_mb END)  AS log_now
+            FROM #daily
+            GROUP BY server_id, database_name
+        ) AS s;
+
+        -- Per-drive fit over the summed size of the files on each drive.
+        SELECT s.server_id, s.mount_point, s.n, s.db_count, s.used_now,
+               CASE WHEN s.n >= @MinDays
+                    THEN (s.n * s.sxy - s.sx * s.sy) / NULLIF(s.n * s.sxx - s.sx * s.sx, 0) END AS slope
+        INTO #drive_fit
+        FROM (
+            SELECT dd.server_id, dd.mount_point,
+                   CONVERT(FLOAT, COUNT(*)) AS n,
+                   SUM(CONVERT(FLOAT, dd.x)) AS sx,
+                   SUM(CONVERT(FLOAT, dd.x) * dd.x) AS sxx,
+                   SUM(dd.mb) AS sy, SUM(dd.x * dd.mb) AS sxy,
+                   MAX(dd.db_count) AS db_count,
+                   MAX(CASE WHEN dd.x = @WindowDays THEN dd.mb END) AS used_now
+            FROM (
+                SELECT f.server_id, f.mount_point, f.x, SUM(f.mb) AS mb, COUNT(DISTINCT f.database_name) AS db_count
+                FROM (
+                    SELECT d.server_id, pd.mount_point, d.x, d.database_name, d.data_mb AS mb
+                    FROM #daily AS d
+                    JOIN #paths AS pd ON pd.server_id = d.server_id AND pd.path = d.primary_data_path
+                    UNION ALL
+                    SELECT d.server_id, pl.mount_point, d.x, d.database_name, d.log_mb
+                    FROM #daily AS d
+                    JOIN #paths AS pl ON pl.server_id = d.server_id AND pl.path = d.log_path
+                ) AS f
+                GROUP BY f.server_id, f.mount_point, f.x
+            ) AS dd
+            GROUP BY dd.server_id, dd.mount_point
+        ) AS s;
+
+        BEGIN TRANSACTION;
+
+        DELETE FROM dbo.CapacityForecastDatabase;
+        INSERT INTO dbo.CapacityForecastDatabase
+            (ServerID, DatabaseName, HistoryDays, DataSizeMB, LogSizeMB,
+             DataGrowthMBPerDay, LogGrowthMBPerDay, DataMountPoint, LogMountPoint, ComputedAt)
+        SELECT f.server_id, f.database_name, f.n, f.data_now, f.log_now,
+               f.data_slope, f.log_slope, pd.mount_point, pl.mount_point, SYSDATETIME()
+        FROM #db_fit AS f
+        LEFT JOIN dbo.db_metadata AS m ON m.server_id = f.server_id AND m.database_name = f.database_name
+        LEFT JOIN #paths AS pd ON pd.server_id = f.server_id AND pd.path = m.primary_data_path
+        LEFT JOIN #paths AS pl ON pl.server_id = f.server_id AND pl.path = m.log_path;
+
+        DELETE FROM dbo.CapacityForecastDrive;
+        INSERT INTO dbo.CapacityForecastDrive
+            (ServerID, MountPoint, HistoryDays, DatabaseCount, SqlFilesMB, GrowthMBPerDay,
+             TotalMB, FreeMB, DaysUntilFull, FullOn, ComputedAt)
+        SELECT f.server_id, f.mount_point, f.n, f.db_count, f.used_now, f.slope,
+               m.TotalBytes / 1048576.0, m.FreeBytes / 1048576.0,
+               x.days_until_full,
+               CASE WHEN x.days_until_full < 36500 THEN DATEADD(DAY, CONVERT(INT, x.days_until_full), @Today) END,
+               SYSDATETIME()
+        FROM #drive_fit AS f
+        LEFT JOIN #mounts AS m ON m.ServerID = f.server_id AND m.MountPoint = f.mount_point
+        CROSS APPLY (
+            SELECT CASE WHEN f.slope > 0 AND m.FreeBytes IS NOT NULL
+                        THEN (m.FreeBytes / 1048576.0) / f.slope END AS days_until_full
+        ) AS x;
+
+        COMMIT TRANSACTION;
+
+        SELECT (SELECT COUNT(*) FROM #db_fit)    AS databases,
+               (SELECT COUNT(*) FROM #drive_fit) AS drives;
+    END
+    """,
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_forecast_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        ensure_volume_objects(inv_conn)
+        cur = inv_conn.cursor()
+        for ddl in FORECAST_DDL:
+            cur.execute(ddl)
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Batch fit
+# ------------------------
+
+def compute_forecast(
+    window_days: int = FORECAST_WINDOW_DAYS,
+    min_days: int = FORECAST_MIN_DAYS,
+    history_days: int = FORECAST_HISTORY_DAYS,
+) -> dict:
+    """Refit every database and drive trend in one inventory call; summary dict."""
+    t0 = time.monotonic()
+    conn = get_inventory_connection()
+    try:
+        ensure_forecast_objects(conn)
+        cur = conn.cursor()
+        cur.execute(
+            "{CALL dbo.usp_ComputeCapacityForecast (?, ?, ?)}",
+            (window_days, min_days, history_days),
+        )
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "databases": int(row.databases) if row else 0,
+        "drives": int(row.drives) if row else 0,
+        "elapsed": round(time.monotonic() - t0, 3),
+    }
+
+
+forecaster = RefreshScheduler(refresh_fn=compute_forecast, interval=FORECAST_INTERVAL, name="capacity-forecast")
+
+
+# ------------------------
+# Readers (stored forecast only)
+# ------------------------
+
+def get_drive_forecasts(server_id: int) -> dict:
+    """{mount_point: forecast dict} for one server from the last batch fit."""
+    conn = get_inventory_connection()
+    try:
+        ensure_forecast_objects(conn)
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT MountPoint, HistoryDays, DatabaseCount, SqlFilesMB, GrowthMBPerDay,
+                   TotalMB, FreeMB, DaysUntilFull, FullOn, ComputedAt
+            FROM dbo.CapacityForecastDrive
+            WHERE ServerID = ?;
+            """,
+            server_id,
+        )
+        rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    return {
+        r.MountPoint: {
+            "history_days": r.HistoryDays,
+            "database_count": r.DatabaseCount,
+            "sql_files_mb": r.SqlFilesMB,
+            "growth_mb_per_day": r.GrowthMBPerDay,
+            "free_mb": r.FreeMB,
+            "days_until_full": r.DaysUntilFull,
+            "full_on": r.FullOn,
+            "computed_at": r.ComputedAt,
+        }
+        for r in rows
+    }
+
+
+def get_database_forecast(server_id: int, db_name: str) -> dict | None:
+    """Growth trend for one database plus the forecast of the drive holding its data files."""
+    conn = get_inventory_connection()
+    try:
+        ensure_forecast_objects(conn)
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT f.HistoryDays, f.DataSizeMB, f.LogSizeMB, f.DataGrowthMBPerDay, f.LogGrowthMBPerDay,
+                   f.DataMountPoint, f.LogMountPoint, f.ComputedAt,
+                   dd.DaysUntilFull AS DataDriveDaysUntilFull, dd.FullOn AS DataDriveFullOn,
+                   ld.DaysUntilFull AS LogDriveDaysUntilFull, ld.FullOn AS LogDriveFullOn
+            FROM dbo.CapacityForecastDatabase AS f
+            LEFT JOIN dbo.CapacityForecastDrive AS dd
+              ON dd.ServerID = f.ServerID AND dd.MountPoint = f.DataMountPoint
+            LEFT JOIN dbo.CapacityForecastDrive AS ld
+              ON ld.ServerID = f.ServerID AND ld.MountPoint = f.LogMountPoint
+            WHERE f.ServerID = ? AND f.DatabaseName = ?;
+            """,
+            (server_id, db_name),
+        )
+        r = cur.fetchone()
+    finally:
+        conn.close()
+
+    if not r:
+        return None
+    growth = None
+    if r.DataGrowthMBPerDay is not None or r.LogGrowthMBPerDay is not None:
+        growth = (r.DataGrowthMBPerDay or 0) + (r.LogGrowthMBPerDay or 0)
+    return {
+        "history_days": r.HistoryDays,
+        "data_growth_mb_per_day": r.DataGrowthMBPerDay,
+        "log_growth_mb_per_day": r.LogGrowthMBPerDay,
+        "growth_mb_per_day": growth,
+        "size_in_90d_mb": ((r.DataSizeMB or 0) + (r.LogSizeMB or 0) + growth * 90) if growth is not None else None,
+        "data_mount_point": r.DataMountPoint,
+        "log_mount_point": r.LogMountPoint,
+        "data_drive_days_until_full": r.DataDriveDaysUntilFull,
+        "data_drive_full_on": r.DataDriveFullOn,
+        "log_drive_days_until_full": r.LogDriveDaysUntilFull,
+        "log_drive_full_on": r.LogDriveFullOn,
+        "computed_at": r.ComputedAt,
+    }
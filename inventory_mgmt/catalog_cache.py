@@ -0,0 +1,142 @@
+# catalog_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .db_detail import get_target_connection
+
+# Object catalog per (server, db), kept in memory between /objects views.
+# Each view pays one cheap signature query against sys.objects; the full
+# catalog is reloaded (single UNION ALL) only when the signature moved.
+CATALOG_CACHE_MAX = int(os.getenv("INV_CATALOG_CACHE_MAX", "256"))
+# Upper bound on reuse: changes the signature cannot see (schema renames).
+CATALOG_MAX_AGE = int(os.getenv("INV_CATALOG_MAX_AGE", "3600"))
+
+OBJECT_TYPES = ("TABLE", "VIEW", "PROCEDURE", "FUNCTION")
+
+# Any CREATE/ALTER bumps modify_date; any DROP lowers the count.
+SIGNATURE_SQL = """
+SELECT COUNT(*) AS object_count, MAX(modify_date) AS last_modified
+FROM sys.objects
+WHERE is_ms_shipped = 0;
+"""
+
+CATALOG_SQL = """
+SELECT 'TABLE' AS object_type, t.object_id, s.name AS schema_name, t.name AS object_name
+FROM sys.tables AS t
+JOIN sys.schemas AS s ON t.schema_id = s.schema_id
+WHERE t.is_ms_shipped = 0
+
+UNION ALL
+
+SELECT 'VIEW', v.object_id, s.name, v.name
+FROM sys.views AS v
+JOIN sys.schemas AS s ON v.schema_id = s.schema_id
+WHERE v.is_ms_shipped = 0
+
+UNION ALL
+
+SELECT 'PROCEDURE', p.object_id, s.name, p.name
+FROM sys.procedures AS p
+JOIN sys.schemas AS s ON p.schema_id = s.schema_id
+WHERE p.is_ms_shipped = 0
+
+UNION ALL
+
+SELECT 'FUNCTION', o.object_id, s.name, o.name
+FROM sys.objects AS o
+JOIN sys.schemas AS s ON o.schema_id = s.schema_id
+WHERE o.is_ms_shipped = 0
+  AND o.type IN ('FN','IF','TF','FS','FT')
+
+UNION ALL
+
+SELECT 'TRIGGER', tr.object_id, NULL, tr.name
+FROM sys.triggers AS tr
+WHERE tr.is_ms_shipped = 0
+  AND tr.parent_class_desc = 'OBJECT_OR_COLUMN';
+"""
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # (server, db) -> {"signature", "loaded_at", "summary", "by_type"}
+
+
+def catalog_signature(cur):
+    """(object count, MAX(modify_date)) of user objects; moves on any CREATE/ALTER/DROP."""
+    row = cur.execute(SIGNATURE_SQL).fetchone()
+    return (int(row.object_count or 0), row.last_modified)
+
+
+def _load_catalog(cur):
+    by_type = {t: [] for t in OBJECT_TYPES}
+    table_triggers = 0
+    for row in cur.execute(CATALOG_SQL).fetchall():
+        if row.object_type == "TRIGGER":
+            table_triggers += 1
+            continue
+        by_type[row.object_type].append(
+            {
+                "object_id": int(row.object_id),
+                "schema": row.schema_name,
+                "name": row.object_name,
+                "full_name": f"{row.schema_name}.{row.object_name}",
+            }
+        )
+
+    for items in by_type.values():
+        items.sort(key=lambda x: (x["schema"].lower(), x["name"].lower()))
+
+    summary = {
+        "tables": len(by_type["TABLE"]),
+        "views": len(by_type["VIEW"]),
+        "procedures": len(by_type["PROCEDURE"]),
+        "functions": len(by_type["FUNCTION"]),
+        "table_triggers": table_triggers,
+    }
+    return summary, by_type
+
+
+def get_object_catalog(server_name: str, db_name: str):
+    """(objects_summary, objects_by_type) for one database, served from memory
+    while sys.objects' count / MAX(modify_date) signature is unchanged."""
+    key = (server_name.lower(), db_name.lower())
+
+    conn = get_target_connection(server_name, db_name)
+    try:
+        cur = conn.cursor()
+        signature = catalog_signature(cur)
+
+        with _lock:
+            entry = _cache.get(key)
+            if (
+                entry is not None
+                and entry["signature"] == signature
+                and time.monotonic() - entry["loaded_at"] < CATALOG_MAX_AGE
+            ):
+                _cache.move_to_end(key)
+                return entry["summary"], entry["by_type"]
+
+        summary, by_type = _load_catalog(cur)
+    finally:
+        conn.close()
+
+    with _lock:
+        _cache[key] = {
+            "signature": signature,
+            "loaded_at": time.monotonic(),
+            "summary": summary,
+            "by_type": by_type,
+        }
+        _cache.move_to_end(key)
+        while len(_cache) > CATALOG_CACHE_MAX:
+            _cache.popitem(last=False)
+    return summary, by_type
+
+
+def invalidate_catalog(server_name: str, db_name: str | None = None):
+    """Drop cached catalogs for one database, or every database of a server."""
+    server_key = server_name.lower()
+    with _lock:
+        for key in [k for k in _cache if k[0] == server_key and (db_name is None or k[1] == db_name.lower())]:
+            _cache.pop(key, None)
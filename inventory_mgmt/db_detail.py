@@ -4,6 +4,9 @@ from datetime import datetime
 import pyodbc
 from dotenv import load_dotenv
 
+from .fleet_scanner import get_inventory_connection
+from .server_cache import get_server_name_by_id
+
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
 INV_DB_SERVER = os.getenv("INV_DB_SERVER")
@@ -37,38 +40,6 @@ def get_target_connection(server_name: str, database: str = "master"):
     return pyodbc.connect(conn_str)
 
 
-def get_server_name_by_id(server_id: int) -> str | None:
-    conn = get_inventory_connection()
-    cur = conn.cursor()
-    row = cur.execute("SELECT ServerName FROM dbo.ServerList WHERE ID = ?;", (server_id,)).fetchone()
-    conn.close()
-    return row.ServerName if row else None
-
-
-def get_inventory_connection():
-    if not INV_DB_SERVER or not INV_DB_NAME:
-        raise RuntimeError("INV_DB_SERVER or INV_DB_NAME is not set in .env")
-
-    if INV_DB_TRUSTED:
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            "Trusted_Connection=yes;"
-        )
-    else:
-        if not INV_DB_USER or not INV_DB_PASSWORD:
-            raise RuntimeError("Using SQL auth but INV_DB_USER / INV_DB_PASSWORD not set")
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            f"UID={INV_DB_USER};"
-            f"PWD={INV_DB_PASSWORD};"
-        )
-    return pyodbc.connect(conn_str)
-
-
 # ---------- 1. Ensure db_metadata table exists ----------
 
 def ensure_db_metadata_table():
@@ -140,478 +111,367 @@ def ensure_db_metadata_table():
     conn = get_inventory_connection()
     cur = conn.cursor()
     cur.execute(ddl)
+    for stmt in _db_metadata_merge_ddl():
+        cur.execute(stmt)
     conn.commit()
     conn.close()
 
 
 
-# ---------- 2. Snapshot metadata for ONE database ----------
+# ---------- 2. Snapshot metadata (all databases of a server, one batch) ----------
+
+# A page view reuses the stored row while it is younger than this (seconds).
+DB_METADATA_TTL_SECONDS = int(os.getenv("INV_DB_METADATA_TTL", "300"))
+
+# Column order shared by the TVP type, the MERGE and _snapshot_rows().
+DB_METADATA_COLUMNS = [
+    ("database_id", "INT NOT NULL"),
+    ("database_name", "SYSNAME NOT NULL"),
+    ("is_system_db", "BIT NOT NULL"),
+    ("state_desc", "NVARCHAR(60) NOT NULL"),
+    ("user_access_desc", "NVARCHAR(60) NOT NULL"),
+    ("is_read_only", "BIT NOT NULL"),
+    ("is_encrypted", "BIT NOT NULL"),
+    ("compatibility_level", "TINYINT NOT NULL"),
+    ("collation_name", "NVARCHAR(128) NULL"),
+    ("data_size_mb", "DECIMAL(18,2) NULL"),
+    ("log_size_mb", "DECIMAL(18,2) NULL"),
+    ("data_used_mb", "DECIMAL(18,2) NULL"),
+    ("log_used_mb", "DECIMAL(18,2) NULL"),
+    ("data_file_count", "INT NULL"),
+    ("log_file_count", "INT NULL"),
+    ("primary_data_path", "NVARCHAR(260) NULL"),
+    ("log_path", "NVARCHAR(260) NULL"),
+    ("recovery_model_desc", "NVARCHAR(60) NOT NULL"),
+    ("last_full_backup", "DATETIME NULL"),
+    ("last_diff_backup", "DATETIME NULL"),
+    ("last_log_backup", "DATETIME NULL"),
+    ("page_verify_option_desc", "NVARCHAR(60) NOT NULL"),
+    ("is_auto_close_on", "BIT NOT NULL"),
+    ("is_auto_shrink_on", "BIT NOT NULL"),
+    ("is_auto_create_stats_on", "BIT NOT NULL"),
+    ("is_auto_update_stats_on", "BIT NOT NULL"),
+    ("is_auto_update_stats_async_on", "BIT NOT NULL"),
+    ("is_read_committed_snapshot_on", "BIT NOT NULL"),
+    ("is_snapshot_isolation_on", "BIT NOT NULL"),
+    ("owner_name", "NVARCHAR(128) NULL"),
+    ("contains_sensitive_data", "BIT NULL"),
+    ("is_in_availability_group", "BIT NOT NULL"),
+    ("availability_group_name", "NVARCHAR(128) NULL"),
+    ("is_published_for_replication", "BIT NOT NULL"),
+    ("is_subscribed_for_replication", "BIT NOT NULL"),
+    ("last_dbcc_checkdb", "DATETIME NULL"),
+    ("last_user_access", "DATETIME NULL"),
+]
+
+
+def _db_metadata_merge_ddl() -> list[str]:
+    names = [c for c, _ in DB_METADATA_COLUMNS]
+    type_cols = ",\n            ".join(f"{c} {t}" for c, t in DB_METADATA_COLUMNS)
+    set_cols = ",\n                ".join(f"tgt.{c} = src.{c}" for c in names if c != "database_id")
+    insert_cols = ", ".join(names)
+    insert_vals = ", ".join(f"src.{c}" for c in names)
+    return [
+        """
+        IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'db_metadata_history' AND schema_id = SCHEMA_ID('dbo'))
+        BEGIN
+            CREATE TABLE dbo.db_metadata_history (
+                server_id          INT            NOT NULL,
+                database_name      SYSNAME        NOT NULL,
+                snapshot_date      DATE           NOT NULL,
+                data_size_mb       DECIMAL(18,2)  NULL,
+                log_size_mb        DECIMAL(18,2)  NULL,
+                primary_data_path  NVARCHAR(260)  NULL,
+                log_path           NVARCHAR(260)  NULL,
+                recorded_at        DATETIME2(0)   NOT NULL,
+                CONSTRAINT PK_db_metadata_history PRIMARY KEY (server_id, database_name, snapshot_date)
+                    WITH (DATA_COMPRESSION = PAGE)
+            );
+        END
+        """,
+        f"""
+        IF TYPE_ID(N'dbo.DbMetadataSnapshotType') IS NULL
+        BEGIN
+            CREATE TYPE dbo.DbMetadataSnapshotType AS TABLE (
+            {type_cols},
+            PRIMARY KEY (database_id)
+            );
+        END
+        """,
+        f"""
+        CREATE OR ALTER PROCEDURE dbo.usp_MergeDbMetadata
+            @ServerID INT,
+            @Rows dbo.DbMetadataSnapshotType READONLY
+        AS
+        BEGIN
+            SET NOCOUNT ON;
+
+            -- @Rows is the whole instance: databases missing from it were dropped.
+            WITH tgt AS (
+                SELECT * FROM dbo.db_metadata WITH (HOLDLOCK) WHERE server_id = @ServerID
+            )
+            MERGE tgt
+            USING @Rows AS src
+                  ON tgt.database_id = src.database_id
+            WHEN MATCHED THEN
+                UPDATE SET
+                {set_cols},
+                tgt.collected_at = GETDATE()
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT (server_id, {insert_cols}, collected_at)
+                VALUES (@ServerID, {insert_vals}, GETDATE())
+            WHEN NOT MATCHED BY SOURCE THEN
+                DELETE;
+
+            -- Size history: one row per user DB per day, written only when
+            -- something changed since the DB's previous row.
+            DECLARE @Today DATE = CAST(GETDATE() AS DATE);
+
+            UPDATE h
+            SET h.data_size_mb      = r.data_size_mb,
+                h.log_size_mb       = r.log_size_mb,
+                h.primary_data_path = r.primary_data_path,
+                h.log_path          = r.log_path,
+                h.recorded_at       = SYSDATETIME()
+            FROM dbo.db_metadata_history AS h
+            JOIN @Rows AS r
+              ON h.server_id = @ServerID
+             AND h.database_name = r.database_name
+             AND h.snapshot_date = @Today
+            WHERE EXISTS (SELECT r.data_size_mb, r.log_size_mb, r.primary_data_path, r.log_path
+                          EXCEPT
+                          SELECT h.data_size_mb, h.log_size_mb, h.primary_data_path, h.log_path);
+
+            INSERT INTO dbo.db_metadata_history
+                (server_id, database_name, snapshot_date, data_size_mb, log_size_mb, primary_data_path, log_path, recorded_at)
+            SELECT @ServerID, r.database_name, @Today, r.data_size_mb, r.log_size_mb, r.primary_data_path, r.log_path, SYSDATETIME()
+            FROM @Rows AS r
+            OUTER APPLY (
+                SELECT TOP (1) p.snapshot_date, p.data_size_mb, p.log_size_mb, p.primary_data_path, p.log_path
+                FROM dbo.db_metadata_history AS p
+                WHERE p.server_id = @ServerID
+                  AND p.database_name = r.database_name
+                ORDER BY p.snapshot_date DESC
+            ) AS last
+            WHERE r.is_system_db = 0
+              AND (last.snapshot_date IS NULL
+                   OR (last.snapshot_date < @Today
+                       AND EXISTS (SELECT r.data_size_mb, r.log_size_mb, r.primary_data_path, r.log_path
+                                   EXCEPT
+                                   SELECT last.data_size_mb, last.log_size_mb, last.primary_data_path, last.log_path)));
+        END
+        """,
+        """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_db_metadata_server_db'
+                       AND object_id = OBJECT_ID(N'dbo.db_metadata'))
+        BEGIN
+            CREATE INDEX IX_db_metadata_server_db
+            ON dbo.db_metadata (server_id, database_name, collected_at DESC);
+        END
+        """,
+    ]
+
+
+# One round-trip: every database on the instance, then per-db backups,
+# AG membership and last user access as separate result sets (each may be
+# denied on its own without losing the rest).
+SNAPSHOT_BATCH_SQL = """
+SET NOCOUNT ON;
+
+SELECT
+    d.database_id,
+    d.name                  AS database_name,
+    CASE WHEN d.database_id <= 4 THEN 1 ELSE 0 END AS is_system_db,
+    d.state_desc,
+    d.user_access_desc,
+    d.is_read_only,
+    d.is_encrypted,
+    d.compatibility_level,
+    d.collation_name,
+    f.data_size_mb,
+    f.log_size_mb,
+    f.data_file_count,
+    f.log_file_count,
+    f.primary_data_path,
+    f.log_path,
+    d.recovery_model_desc,
+    d.page_verify_option_desc,
+    d.is_auto_close_on,
+    d.is_auto_shrink_on,
+    d.is_auto_create_stats_on,
+    d.is_auto_update_stats_on,
+    d.is_auto_update_stats_async_on,
+    d.is_read_committed_snapshot_on,
+    CASE WHEN d.snapshot_isolation_state = 1 THEN 1 ELSE 0 END AS is_snapshot_isolation_on,
+    SUSER_SNAME(d.owner_sid) AS owner_name,
+    d.is_published           AS is_published_for_replication,
+    d.is_subscribed          AS is_subscribed_for_replication
+FROM sys.databases AS d
+LEFT JOIN (
+    SELECT
+        mf.database_id,
+        CONVERT(DECIMAL(18,2), SUM(CASE WHEN mf.type_desc = 'ROWS' THEN mf.size END) * 8.0 / 1024/1024) AS data_size_mb,
+        CONVERT(DECIMAL(18,2), SUM(CASE WHEN mf.type_desc = 'LOG'  THEN mf.size END) * 8.0 / 1024/1024) AS log_size_mb,
+        SUM(CASE WHEN mf.type_desc = 'ROWS' THEN 1 ELSE 0 END) AS data_file_count,
+        SUM(CASE WHEN mf.type_desc = 'LOG'  THEN 1 ELSE 0 END) AS log_file_count,
+        MAX(CASE WHEN mf.type_desc = 'ROWS' THEN mf.physical_name END) AS primary_data_path,
+        MAX(CASE WHEN mf.type_desc = 'LOG'  THEN mf.physical_name END) AS log_path
+    FROM sys.master_files AS mf
+    GROUP BY mf.database_id
+) AS f
+    ON f.database_id = d.database_id;
+
+SELECT
+    bs.database_name,
+    MAX(CASE WHEN bs.type = 'D' THEN bs.backup_finish_date END) AS last_full_backup,
+    MAX(CASE WHEN bs.type = 'I' THEN bs.backup_finish_date END) AS last_diff_backup,
+    MAX(CASE WHEN bs.type = 'L' THEN bs.backup_finish_date END) AS last_log_backup
+FROM msdb.dbo.backupset AS bs
+GROUP BY bs.database_name;
+
+SELECT
+    drs.database_id,
+    MAX(ag.name) AS ag_name
+FROM sys.dm_hadr_database_replica_states AS drs
+INNER JOIN sys.availability_groups AS ag
+    ON drs.group_id = ag.group_id
+WHERE drs.is_local = 1
+GROUP BY drs.database_id;
+
+SELECT
+    us.database_id,
+    MAX(v.last_access) AS last_access
+FROM sys.dm_db_index_usage_stats AS us
+CROSS APPLY (VALUES (us.last_user_seek), (us.last_user_scan),
+                    (us.last_user_lookup), (us.last_user_update)) AS v(last_access)
+GROUP BY us.database_id;
+"""
+
+
+def _next_rows(cur) -> list:
+    """Rows of the next result set, or [] when it is missing/denied."""
+    try:
+        if cur.nextset():
+            return cur.fetchall()
+    except pyodbc.Error:
+        pass
+    return []
 
-def snapshot_db_metadata(server_id: int, database_name: str):
-    """
-    Capture metadata for a single database on this instance into dbo.db_metadata.
-    - If row exists for (server_id, database_id), UPDATE.
-    - Else, INSERT.
-    """
 
-    # Inventory DB connection (for reading ServerList + writing dbo.db_metadata)
-    inv_conn = get_inventory_connection()
-    inv_cur = inv_conn.cursor()
+def collect_server_db_metadata(server_name: str) -> list[dict]:
+    """Read metadata for every database on `server_name` in one batch."""
+    target_conn = get_target_connection(server_name, "master")
+    try:
+        tcur = target_conn.cursor()
+        tcur.execute(SNAPSHOT_BATCH_SQL)
+        dbs = tcur.fetchall()
+        backups = {r.database_name: r for r in _next_rows(tcur)}
+        ags = {r.database_id: r.ag_name for r in _next_rows(tcur)}
+        usage = {r.database_id: r.last_access for r in _next_rows(tcur)}
+    finally:
+        target_conn.close()
 
-    server_name = get_server_name_by_id(server_id)
-    if not server_name:
-        inv_conn.close()
-        return
+    snapshots = []
+    for d in dbs:
+        b = backups.get(d.database_name)
+        snapshots.append(
+            {
+                "database_id": d.database_id,
+                "database_name": d.database_name,
+                "is_system_db": d.is_system_db,
+                "state_desc": d.state_desc,
+                "user_access_desc": d.user_access_desc,
+                "is_read_only": d.is_read_only,
+                "is_encrypted": d.is_encrypted,
+                "compatibility_level": d.compatibility_level,
+                "collation_name": d.collation_name,
+                "data_size_mb": d.data_size_mb or 0,
+                "log_size_mb": d.log_size_mb or 0,
+                "data_used_mb": None,
+                "log_used_mb": None,
+                "data_file_count": d.data_file_count or 0,
+                "log_file_count": d.log_file_count or 0,
+                "primary_data_path": d.primary_data_path,
+                "log_path": d.log_path,
+                "recovery_model_desc": d.recovery_model_desc,
+                "last_full_backup": b.last_full_backup if b else None,
+                "last_diff_backup": b.last_diff_backup if b else None,
+                "last_log_backup": b.last_log_backup if b else None,
+                "page_verify_option_desc": d.page_verify_option_desc,
+                "is_auto_close_on": d.is_auto_close_on,
+                "is_auto_shrink_on": d.is_auto_shrink_on,
+                "is_auto_create_stats_on": d.is_auto_create_stats_on,
+                "is_auto_update_stats_on": d.is_auto_update_stats_on,
+                "is_auto_update_stats_async_on": d.is_auto_update_stats_async_on,
+                "is_read_committed_snapshot_on": d.is_read_committed_snapshot_on,
+                "is_snapshot_isolation_on": d.is_snapshot_isolation_on,
+                "owner_name": d.owner_name,
+                "contains_sensitive_data": None,
+                "is_in_availability_group": 1 if d.database_id in ags else 0,
+                "availability_group_name": ags.get(d.database_id),
+                "is_published_for_replication": d.is_published_for_replication,
+                "is_subscribed_for_replication": d.is_subscribed_for_replication,
+                "last_dbcc_checkdb": None,
+                "last_user_access": usage.get(d.database_id),
+            }
+        )
+    return snapshots
 
-    # Target server connection (for reading sys.* metadata from that server)
-    target_conn = get_target_connection(server_name, "master")
-    tcur = target_conn.cursor()
 
-    # Basic row from sys.databases
-    tcur.execute(
-        """
-        SELECT
-            d.database_id,
-            d.name                  AS database_name,
-            CASE WHEN d.database_id <= 4 THEN 1 ELSE 0 END AS is_system_db,
-            d.state_desc,
-            d.user_access_desc,
-            d.is_read_only,
-            d.is_encrypted,
-            d.compatibility_level,
-            d.collation_name,
-            d.recovery_model_desc,
-            d.page_verify_option_desc,
-            d.is_auto_close_on,
-            d.is_auto_shrink_on,
-            d.is_auto_create_stats_on,
-            d.is_auto_update_stats_on,
-            d.is_auto_update_stats_async_on,
-            d.is_read_committed_snapshot_on,
-            d.snapshot_isolation_state,
-            d.snapshot_isolation_state_desc,
-            SUSER_SNAME(d.owner_sid) AS owner_name,
-            d.is_published           AS is_published_for_replication,
-            d.is_subscribed          AS is_subscribed_for_replication
-        FROM sys.databases AS d
-        WHERE d.name = ?
-        """,
-        (database_name,),
-    )
-    db_row = tcur.fetchone()
-    if not db_row:
-        target_conn.close()
-        inv_conn.close()
-        raise ValueError(f"Database '{database_name}' not found on this instance.")
+def snapshot_server_db_metadata(server_id: int) -> list[dict]:
+    """Snapshot every database of a server into dbo.db_metadata with one set-based MERGE."""
+    server_name = get_server_name_by_id(server_id)
+    if not server_name:
+        return []
 
-    database_id = db_row.database_id
+    snapshots = collect_server_db_metadata(server_name)
+    if not snapshots:
+        return []
 
-    # snapshot_isolation_state -> BIT-style flag
-    snapshot_state = getattr(db_row, "snapshot_isolation_state", 0) or 0
-    is_snapshot_isolation_on = 1 if snapshot_state == 1 else 0
+    names = [c for c, _ in DB_METADATA_COLUMNS]
+    rows = [tuple(s[c] for c in names) for s in snapshots]
 
-    # Size info from sys.master_files
-    tcur.execute(
-        """
-        SELECT
-            CONVERT(DECIMAL(18,2),
-                SUM(CASE WHEN mf.type_desc = 'ROWS' THEN mf.size END) * 8.0 / 1024/1024
-            ) AS data_size_mb,
-            CONVERT(DECIMAL(18,2),
-                SUM(CASE WHEN mf.type_desc = 'LOG'  THEN mf.size END) * 8.0 / 1024/1024
-            ) AS log_size_mb,
-            SUM(CASE WHEN mf.type_desc = 'ROWS' THEN 1 ELSE 0 END) AS data_file_count,
-            SUM(CASE WHEN mf.type_desc = 'LOG'  THEN 1 ELSE 0 END) AS log_file_count,
-            MAX(CASE WHEN mf.type_desc = 'ROWS' THEN mf.physical_name END) AS primary_data_path,
-            MAX(CASE WHEN mf.type_desc = 'LOG'  THEN mf.physical_name END) AS log_path
-        FROM sys.master_files AS mf
-        WHERE DB_NAME(mf.database_id) = ?;
-        """,
-        (database_name,),
-    )
-    size_row = tcur.fetchone()
-    data_size_mb = size_row.data_size_mb or 0
-    log_size_mb = size_row.log_size_mb or 0
-    data_file_count = size_row.data_file_count or 0
-    log_file_count = size_row.log_file_count or 0
-    primary_data_path = size_row.primary_data_path
-    log_path = size_row.log_path
-
-    data_used_mb = None
-    log_used_mb = None
-
-    # Backup history (msdb)
+    inv_conn = get_inventory_connection()
     try:
-        tcur.execute(
-            """
-            WITH last_full AS (
-                SELECT MAX(backup_finish_date) AS last_full_backup
-                FROM msdb.dbo.backupset
-                WHERE type = 'D'
-                  AND database_name = ?
-            ),
-            last_diff AS (
-                SELECT MAX(backup_finish_date) AS last_diff_backup
-                FROM msdb.dbo.backupset
-                WHERE type = 'I'
-                  AND database_name = ?
-            ),
-            last_log AS (
-                SELECT MAX(backup_finish_date) AS last_log_backup
-                FROM msdb.dbo.backupset
-                WHERE type = 'L'
-                  AND database_name = ?
-            )
-            SELECT
-                lf.last_full_backup,
-                ld.last_diff_backup,
-                ll.last_log_backup
-            FROM last_full lf
-            CROSS JOIN last_diff ld
-            CROSS JOIN last_log ll;
-            """,
-            (database_name, database_name, database_name),
-        )
-        b = tcur.fetchone()
-        if b:
-            last_full_backup = b.last_full_backup
-            last_diff_backup = b.last_diff_backup
-            last_log_backup = b.last_log_backup
-        else:
-            last_full_backup = None
-            last_diff_backup = None
-            last_log_backup = None
-    except Exception:
-        last_full_backup = None
-        last_diff_backup = None
-        last_log_backup = None
+        inv_conn.cursor().execute("{CALL dbo.usp_MergeDbMetadata (?, ?)}", (server_id, rows))
+        inv_conn.commit()
+    finally:
+        inv_conn.close()
+    return snapshots
 
-    # AG participation
-    is_in_availability_group = 0
-    availability_group_name = None
-    try:
-        tcur.execute(
-            """
-            SELECT TOP (1)
-                1 AS is_in_ag,
-                ag.name AS ag_name
-            FROM sys.databases AS d
-            INNER JOIN sys.dm_hadr_database_replica_states AS drs
-                ON d.database_id = drs.database_id
-            INNER JOIN sys.availability_groups AS ag
-                ON drs.group_id = ag.group_id
-            WHERE d.name = ?;
-            """,
-            (database_name,),
-        )
-        ag_row = tcur.fetchone()
-        if ag_row:
-            is_in_availability_group = ag_row.is_in_ag
-            availability_group_name = ag_row.ag_name
-    except Exception:
-        pass
 
-    # Last user access
-    last_user_access = None
+def _db_metadata_age_seconds(server_id: int, database_name: str) -> float | None:
+    conn = get_inventory_connection()
     try:
-        tcur.execute(
+        row = conn.cursor().execute(
             """
-            SELECT MAX(last_access) AS last_access
-            FROM (
-                SELECT MAX(last_user_seek)   AS last_access
-                FROM sys.dm_db_index_usage_stats
-                WHERE database_id = ?
-                UNION ALL
-                SELECT MAX(last_user_scan)
-                FROM sys.dm_db_index_usage_stats
-                WHERE database_id = ?
-                UNION ALL
-                SELECT MAX(last_user_lookup)
-                FROM sys.dm_db_index_usage_stats
-                WHERE database_id = ?
-                UNION ALL
-                SELECT MAX(last_user_update)
-                FROM sys.dm_db_index_usage_stats
-                WHERE database_id = ?
-            ) AS x;
+            SELECT DATEDIFF(SECOND, MAX(collected_at), GETDATE()) AS age_seconds
+            FROM dbo.db_metadata
+            WHERE server_id = ?
+              AND database_name = ?;
             """,
-            (database_id, database_id, database_id, database_id),
-        )
-        lu = tcur.fetchone()
-        if lu and lu.last_access:
-            last_user_access = lu.last_access
-    except Exception:
-        last_user_access = None
-
-    last_dbcc_checkdb = None
-    contains_sensitive_data = None
+            (server_id, database_name),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row.age_seconds if row and row.age_seconds is not None else None
 
-    # Upsert into db_metadata
-    inv_cur.execute(
-        """
-        SELECT db_meta_id
-        FROM dbo.db_metadata
-        WHERE server_id = ?
-          AND database_id = ?;
-        """,
-        (server_id, database_id),
-    )
-    existing = inv_cur.fetchone()
 
-    if existing:
-        # UPDATE
-        inv_cur.execute(
-            """
-            UPDATE dbo.db_metadata
-            SET
-                database_name        = ?,
-                is_system_db         = ?,
-
-                state_desc           = ?,
-                user_access_desc     = ?,
-                is_read_only         = ?,
-                is_encrypted         = ?,
-                compatibility_level  = ?,
-                collation_name       = ?,
-
-                data_size_mb         = ?,
-                log_size_mb          = ?,
-                data_used_mb         = ?,
-                log_used_mb          = ?,
-                data_file_count      = ?,
-                log_file_count       = ?,
-                primary_data_path    = ?,
-                log_path             = ?,
-
-                recovery_model_desc  = ?,
-                last_full_backup     = ?,
-                last_diff_backup     = ?,
-                last_log_backup      = ?,
-
-                page_verify_option_desc = ?,
-                is_auto_close_on     = ?,
-                is_auto_shrink_on    = ?,
-                is_auto_create_stats_on       = ?,
-                is_auto_update_stats_on       = ?,
-                is_auto_update_stats_async_on = ?,
-                is_read_committed_snapshot_on = ?,
-                is_snapshot_isolation_on      = ?,
-
-                owner_name           = ?,
-                contains_sensitive_data = ?,
-
-                is_in_availability_group = ?,
-                availability_group_name  = ?,
-                is_published_for_replication = ?,
-                is_subscribed_for_replication = ?,
-
-                last_dbcc_checkdb   = ?,
-                last_user_access    = ?,
-                collected_at        = GETDATE()
-            WHERE server_id   = ?
-              AND database_id = ?;
-            """,
-            (
-                db_row.database_name,
-                db_row.is_system_db,
-
-                db_row.state_desc,
-                db_row.user_access_desc,
-                db_row.is_read_only,
-                db_row.is_encrypted,
-                db_row.compatibility_level,
-                db_row.collation_name,
-
-                data_size_mb,
-                log_size_mb,
-                data_used_mb,
-                log_used_mb,
-                data_file_count,
-                log_file_count,
-                primary_data_path,
-                log_path,
-
-                db_row.recovery_model_desc,
-                last_full_backup,
-                last_diff_backup,
-                last_log_backup,
-
-                db_row.page_verify_option_desc,
-                db_row.is_auto_close_on,
-                db_row.is_auto_shrink_on,
-                db_row.is_auto_create_stats_on,
-                db_row.is_auto_update_stats_on,
-                db_row.is_auto_update_stats_async_on,
-                db_row.is_read_committed_snapshot_on,
-                is_snapshot_isolation_on,
-
-                db_row.owner_name,
-                contains_sensitive_data,
-
-                is_in_availability_group,
-                availability_group_name,
-                db_row.is_published_for_replication,
-                db_row.is_subscribed_for_replication,
-
-                last_dbcc_checkdb,
-                last_user_access,
-                server_id,
-                database_id,
-            ),
-        )
-    else:
-        # INSERT
-        inv_cur.execute(
-            """
-            INSERT INTO dbo.db_metadata (
-                server_id,
-                database_id,
-                database_name,
-                is_system_db,
-
-                state_desc,
-                user_access_desc,
-                is_read_only,
-                is_encrypted,
-                compatibility_level,
-                collation_name,
-
-                data_size_mb,
-                log_size_mb,
-                data_used_mb,
-                log_used_mb,
-                data_file_count,
-                log_file_count,
-                primary_data_path,
-                log_path,
-
-                recovery_model_desc,
-                last_full_backup,
-                last_diff_backup,
-                last_log_backup,
-
-                page_verify_option_desc,
-                is_auto_close_on,
-                is_auto_shrink_on,
-                is_auto_create_stats_on,
-                is_auto_update_stats_on,
-                is_auto_update_stats_async_on,
-                is_read_committed_snapshot_on,
-                is_snapshot_isolation_on,
-
-                owner_name,
-                contains_sensitive_data,
-
-                is_in_availability_group,
-                availability_group_name,
-                is_published_for_replication,
-                is_subscribed_for_replication,
-
-                last_dbcc_checkdb,
-                last_user_access,
-                collected_at
-            )
-            VALUES (
-                ?,  -- server_id
-                ?,  -- database_id
-                ?,  -- database_name
-                ?,  -- is_system_db
-
-                ?,  -- state_desc
-                ?,  -- user_access_desc
-                ?,  -- is_read_only
-                ?,  -- is_encrypted
-                ?,  -- compatibility_level
-                ?,  -- collation_name
-
-                ?,  -- data_size_mb
-                ?,  -- log_size_mb
-                ?,  -- data_used_mb
-                ?,  -- log_used_mb
-                ?,  -- data_file_count
-                ?,  -- log_file_count
-                ?,  -- primary_data_path
-                ?,  -- log_path
-
-                ?,  -- recovery_model_desc
-                ?,  -- last_full_backup
-                ?,  -- last_diff_backup
-                ?,  -- last_log_backup
-
-                ?,  -- page_verify_option_desc
-                ?,  -- is_auto_close_on
-                ?,  -- is_auto_shrink_on
-                ?,  -- is_auto_create_stats_on
-                ?,  -- is_auto_update_stats_on
-                ?,  -- is_auto_update_stats_async_on
-                ?,  -- is_read_committed_snapshot_on
-                ?,  -- is_snapshot_isolation_on
-
-                ?,  -- owner_name
-                ?,  -- contains_sensitive_data
-
-                ?,  -- is_in_availability_group
-                ?,  -- availability_group_name
-                ?,  -- is_published_for_replication
-                ?,  -- is_subscribed_for_replication
-
-                ?,  -- last_dbcc_checkdb
-                ?,  -- last_user_access
-                GETDATE()
-            );
-            """,
-            (
-                server_id,
-                database_id,
-                db_row.database_name,
-                db_row.is_system_db,
-
-                db_row.state_desc,
-                db_row.user_access_desc,
-                db_row.is_read_only,
-                db_row.is_encrypted,
-                db_row.compatibility_level,
-                db_row.collation_name,
-
-                data_size_mb,
-                log_size_mb,
-                data_used_mb,
-                log_used_mb,
-                data_file_count,
-                log_file_count,
-                primary_data_path,
-                log_path,
-
-                db_row.recovery_model_desc,
-                last_full_backup,
-                last_diff_backup,
-                last_log_backup,
-
-                db_row.page_verify_option_desc,
-                db_row.is_auto_close_on,
-                db_row.is_auto_shrink_on,
-                db_row.is_auto_create_stats_on,
-                db_row.is_auto_update_stats_on,
-                db_row.is_auto_update_stats_async_on,
-                db_row.is_read_committed_snapshot_on,
-                is_snapshot_isolation_on,
-
-                db_row.owner_name,
-                contains_sensitive_data,
-
-                is_in_availability_group,
-                availability_group_name,
-                db_row.is_published_for_replication,
-                db_row.is_subscribed_for_replication,
-
-                last_dbcc_checkdb,
-                last_user_access,
-            ),
-        )
+def snapshot_db_metadata(server_id: int, database_name: str, force: bool = False):
+    """
+    Make sure dbo.db_metadata has a fresh row for this database.
+    - Rows younger than DB_METADATA_TTL_SECONDS are reused (no target round-trip).
+    - Otherwise the whole server is snapshotted in one batch + one MERGE, so the
+      next database opened on this server is already fresh.
+    """
+    if not force:
+        age = _db_metadata_age_seconds(server_id, database_name)
+        if age is not None and age < DB_METADATA_TTL_SECONDS:
+            return
 
-    inv_conn.commit()
-    target_conn.close()
-    inv_conn.close()
+    snapshots = snapshot_server_db_metadata(server_id)
+    if not any(s["database_name"] == database_name for s in snapshots):
+        raise ValueError(f"Database '{database_name}' not found on this instance.")
 
 
 # ---------- 3. Read metadata back for the dashboard ----------
@@ -0,0 +1,162 @@
+# dependency_graph.py
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .catalog_cache import catalog_signature
+from .db_detail import get_target_connection
+from .objects_detail import _map_type_desc_to_logical, _split_full_name
+
+# Whole-database dependency graph per (server, db), loaded with one query over
+# sys.sql_expression_dependencies and reused while the sys.objects signature
+# (see catalog_cache) is unchanged. Drill-down hops and transitive questions
+# (impact radius) are answered from memory.
+GRAPH_CACHE_MAX = int(os.getenv("INV_DEP_GRAPH_CACHE_MAX", "64"))
+GRAPH_MAX_AGE = int(os.getenv("INV_DEP_GRAPH_MAX_AGE", "3600"))
+
+# Object-to-object edges only (class 1); type/XML-collection references carry
+# ids that are not object_ids.
+EDGES_SQL = """
+SELECT DISTINCT
+    d.referencing_id,
+    s1.name     AS referencing_schema,
+    o1.name     AS referencing_name,
+    o1.type_desc AS referencing_type_desc,
+    d.referenced_id,
+    s2.name     AS referenced_schema,
+    o2.name     AS referenced_name,
+    o2.type_desc AS referenced_type_desc
+FROM sys.sql_expression_dependencies AS d
+JOIN sys.objects AS o1 ON o1.object_id = d.referencing_id
+JOIN sys.schemas AS s1 ON s1.schema_id = o1.schema_id
+JOIN sys.objects AS o2 ON o2.object_id = d.referenced_id
+JOIN sys.schemas AS s2 ON s2.schema_id = o2.schema_id
+WHERE d.referencing_class = 1
+  AND d.referenced_class = 1
+  AND d.referenced_id IS NOT NULL;
+"""
+
+
+class DependencyGraph:
+    """Adjacency lists keyed by object_id, with a schema.name lookup.
+
+    "referenced" / upstream  = objects this one depends on.
+    "referencing" / downstream = objects that depend on this one.
+    """
+
+    def __init__(self):
+        self.nodes = {}        # object_id -> {full_name, object_type, type_desc}
+        self.by_name = {}      # (schema.lower(), name.lower()) -> object_id
+        self.upstream = {}     # object_id -> set(object_id) it references
+        self.downstream = {}   # object_id -> set(object_id) referencing it
+
+    def _add_node(self, object_id, schema_name, object_name, type_desc):
+        if object_id not in self.nodes:
+            self.nodes[object_id] = {
+                "full_name": f"{schema_name}.{object_name}",
+                "object_type": _map_type_desc_to_logical(type_desc),
+                "type_desc": type_desc,
+            }
+            self.by_name[(schema_name.lower(), object_name.lower())] = object_id
+
+    def add_edge(self, row):
+        src, dst = int(row.referencing_id), int(row.referenced_id)
+        self._add_node(src, row.referencing_schema, row.referencing_name, row.referencing_type_desc)
+        self._add_node(dst, row.referenced_schema, row.referenced_name, row.referenced_type_desc)
+        self.upstream.setdefault(src, set()).add(dst)
+        self.downstream.setdefault(dst, set()).add(src)
+
+    def object_id(self, full_name: str):
+        schema_name, object_name = _split_full_name(full_name)
+        return self.by_name.get((schema_name.lower(), (object_name or "").lower()))
+
+    def _entries(self, ids, depths=None):
+        items = []
+        for oid in ids:
+            item = dict(self.nodes[oid])
+            if depths is not None:
+                item["depth"] = depths[oid]
+            items.append(item)
+        items.sort(key=lambda x: (x.get("depth", 0), x["full_name"].lower()))
+        return items
+
+    def _walk(self, start, edges):
+        """BFS from `start` over `edges`; {object_id: hop distance}, cycles visited once."""
+        depths = {}
+        queue = deque([(start, 0)])
+        while queue:
+            oid, depth = queue.popleft()
+            for nxt in edges.get(oid, ()):
+                if nxt != start and nxt not in depths:
+                    depths[nxt] = depth + 1
+                    queue.append((nxt, depth + 1))
+        return depths
+
+    def referenced(self, full_name: str):
+        """Direct upstream: what this object references (same shape as objects_detail)."""
+        oid = self.object_id(full_name)
+        return self._entries(self.upstream.get(oid, ())) if oid is not None else []
+
+    def referencing(self, full_name: str):
+        """Direct downstream: what references this object."""
+        oid = self.object_id(full_name)
+        return self._entries(self.downstream.get(oid, ())) if oid is not None else []
+
+    def upstream_closure(self, full_name: str):
+        """Everything this object depends on, transitively, with hop depth."""
+        oid = self.object_id(full_name)
+        if oid is None:
+            return []
+        depths = self._walk(oid, self.upstream)
+        return self._entries(depths, depths)
+
+    def impact_radius(self, full_name: str):
+        """All transitive dependents (what can break if this object changes), with hop depth."""
+        oid = self.object_id(full_name)
+        if oid is None:
+            return []
+        depths = self._walk(oid, self.downstream)
+        return self._entries(depths, depths)
+
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # (server, db) -> {"signature", "loaded_at", "graph"}
+
+
+def _load_graph(cur) -> DependencyGraph:
+    graph = DependencyGraph()
+    for row in cur.execute(EDGES_SQL).fetchall():
+        graph.add_edge(row)
+    return graph
+
+
+def get_dependency_graph(server_name: str, db_name: str) -> DependencyGraph:
+    """Cached graph for one database; reloaded when sys.objects' signature moves."""
+    key = (server_name.lower(), db_name.lower())
+
+    conn = get_target_connection(server_name, db_name)
+    try:
+        cur = conn.cursor()
+        signature = catalog_signature(cur)
+
+        with _lock:
+            entry = _cache.get(key)
+            if (
+                entry is not None
+                and entry["signature"] == signature
+                and time.monotonic() - entry["loaded_at"] < GRAPH_MAX_AGE
+            ):
+                _cache.move_to_end(key)
+                return entry["graph"]
+
+        graph = _load_graph(cur)
+    finally:
+        conn.close()
+
+    with _lock:
+        _cache[key] = {"signature": signature, "loaded_at": time.monotonic(), "graph": graph}
+        _cache.move_to_end(key)
+        while len(_cache) > GRAPH_CACHE_MAX:
+            _cache.popitem(last=False)
+    return graph
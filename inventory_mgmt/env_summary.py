@@ -0,0 +1,199 @@
+# env_summary.py
+import os
+import threading
+import time
+
+from . import fleet_scanner
+from .fleet_scanner import ensure_fleet_scan_objects, get_cu_details, get_inventory_connection
+from .server_cache import list_servers
+
+ENV_KEYS = ("test", "prod", "dev")
+
+# Filter options are rebuilt after each fleet scan; the TTL covers scans run
+# by another process (multi-worker deployments).
+FILTER_OPTIONS_TTL = int(os.getenv("INV_FILTER_OPTIONS_TTL", "600"))
+
+
+# ---------- FILTERED ROWS + GROUPED COUNTS (one round-trip) ----------
+
+# #env_base holds every server with its env bucket and an is_match flag for
+# the page filters, so the rows and the per-env counts share one scan of
+# ServerList/ServerInfo/ServerCU. Overall totals ignore the filters.
+SUMMARY_SQL = """
+SET NOCOUNT ON;
+
+SELECT
+    sl.ID                       AS id,
+    sl.ServerName               AS name,
+    CASE WHEN LOWER(LTRIM(RTRIM(sl.Environment))) IN ('test', 'prod', 'dev')
+         THEN LOWER(LTRIM(RTRIM(sl.Environment)))
+         ELSE 'test' END        AS env,
+    ISNULL(si.Status, 'UNKNOWN') AS status,
+    si.OSVersion                AS os_version,
+    si.SQLVersion               AS sql_version,
+    cu.CULevel                  AS cu_level,
+    cu.CUReference              AS cu_reference,
+    COALESCE(si.LastCUUpdated, si.LastScan, si.LastUpdated) AS cu_checked_at,
+    CASE WHEN {match} THEN 1 ELSE 0 END AS is_match
+INTO #env_base
+FROM dbo.ServerList AS sl
+LEFT JOIN dbo.ServerInfo AS si ON si.ServerID = sl.ID
+LEFT JOIN dbo.ServerCU   AS cu ON cu.ServerID = sl.ID;
+
+SELECT id, name, env, status, os_version, sql_version, cu_level, cu_reference, cu_checked_at
+FROM #env_base
+WHERE is_match = 1 {env_clause}
+ORDER BY name;
+
+SELECT
+    env,
+    ISNULL(os_version, 'N/A')  AS os_version,
+    ISNULL(sql_version, 'N/A') AS sql_version,
+    GROUPING(os_version)       AS g_os,
+    GROUPING(sql_version)      AS g_sql,
+    COUNT(*)                   AS overall_total,
+    SUM(is_match)              AS total_filtered
+FROM #env_base
+GROUP BY GROUPING SETS ((env), (env, os_version), (env, sql_version))
+ORDER BY env, g_os, g_sql, os_version, sql_version;
+
+DROP TABLE #env_base;
+"""
+
+
+def _match_predicate(search, windows_version, status, cu_level, sql_version):
+    conditions = []
+    params = []
+    if search:
+        conditions.append("sl.ServerName LIKE ?")
+        params.append(f"%{search}%")
+    if windows_version:
+        conditions.append("si.OSVersion = ?")
+        params.append(windows_version)
+    if status:
+        conditions.append("UPPER(ISNULL(si.Status, 'UNKNOWN')) = UPPER(?)")
+        params.append(status)
+    if cu_level:
+        conditions.append("cu.CULevel = ?")
+        params.append(cu_level)
+    if sql_version:
+        conditions.append("si.SQLVersion LIKE ?")
+        params.append(f"%{sql_version}%")
+    return (" AND ".join(conditions) or "1 = 1"), params
+
+
+def get_environment_summary(search=None, windows_version=None, status=None, cu_level=None,
+                            sql_version=None, env=None):
+    """Filtered server rows per env + counts by Windows / SQL version.
+
+    Returns (env_rows, env_summaries) in the shape environments.html expects.
+    """
+    # Stale/missing CU rows are refreshed (concurrently) before filtering on them.
+    cu_details = get_cu_details(list_servers())
+
+    match_sql, params = _match_predicate(search, windows_version, status, cu_level, sql_version)
+    env_clause = ""
+    if env in ENV_KEYS:
+        env_clause = "AND env = ?"
+        params = params + [env]
+
+    sql = SUMMARY_SQL.format(match=match_sql, env_clause=env_clause)
+
+    conn = get_inventory_connection()
+    try:
+        ensure_fleet_scan_objects(conn)  # dbo.ServerCU
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.nextset()
+        groups = cur.fetchall()
+    finally:
+        conn.close()
+
+    env_rows = {k: [] for k in ENV_KEYS}
+    for r in rows:
+        env_rows[r.env].append(
+            {
+                "id": r.id,
+                "name": r.name,
+                "status": r.status,
+                "os_version": r.os_version,
+                "sql_version": r.sql_version,
+                "cu_level": r.cu_level,
+                "cu_reference": r.cu_reference,
+                "cu_checked_at": r.cu_checked_at,
+                "cu_error": (cu_details.get(int(r.id)) or {}).get("error"),
+            }
+        )
+    if env in ENV_KEYS:
+        env_rows = {env: env_rows[env]}
+
+    env_summaries = {
+        k: {"counts_by_windows": [], "counts_by_sql": [], "total_filtered": 0, "overall_total": 0}
+        for k in ENV_KEYS
+    }
+    for g in groups:
+        summary = env_summaries[g.env]
+        filtered = int(g.total_filtered or 0)
+        if g.g_os and g.g_sql:
+            summary["overall_total"] = int(g.overall_total or 0)
+            summary["total_filtered"] = filtered
+        elif filtered and not g.g_os:
+            summary["counts_by_windows"].append((g.os_version, filtered))
+        elif filtered and not g.g_sql:
+            summary["counts_by_sql"].append((g.sql_version, filtered))
+
+    return env_rows, env_summaries
+
+
+# ---------- FILTER OPTIONS (cached per fleet scan) ----------
+
+FILTER_OPTIONS_SQL = """
+SET NOCOUNT ON;
+SELECT DISTINCT OSVersion FROM dbo.ServerInfo WHERE OSVersion IS NOT NULL ORDER BY OSVersion;
+SELECT DISTINCT ISNULL(Status, 'UNKNOWN') AS Status FROM dbo.ServerInfo ORDER BY Status;
+SELECT DISTINCT SQLVersion FROM dbo.ServerInfo WHERE SQLVersion IS NOT NULL ORDER BY SQLVersion;
+SELECT DISTINCT CULevel FROM dbo.ServerCU WHERE CULevel IS NOT NULL ORDER BY CULevel;
+"""
+
+_options_lock = threading.Lock()
+_options_cache = {"generation": None, "loaded_at": 0.0, "value": None}
+
+
+def get_filter_options() -> dict:
+    """{windows_versions, statuses, sql_versions, cu_levels}; reloaded after each fleet scan."""
+    with _options_lock:
+        fresh = (
+            _options_cache["value"] is not None
+            and _options_cache["generation"] == fleet_scanner.scan_generation
+            and time.monotonic() - _options_cache["loaded_at"] < FILTER_OPTIONS_TTL
+        )
+        if fresh:
+            return _options_cache["value"]
+
+        conn = get_inventory_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(FILTER_OPTIONS_SQL)
+            windows_versions = [r[0] for r in cur.fetchall() if r[0]]
+            cur.nextset()
+            statuses = [r[0] for r in cur.fetchall() if r[0]]
+            cur.nextset()
+            sql_versions = [r[0] for r in cur.fetchall() if r[0]]
+            cu_levels = []
+            try:
+                if cur.nextset():
+                    cu_levels = [r[0] for r in cur.fetchall() if r[0]]
+            except Exception:
+                cu_levels = []  # dbo.ServerCU not created yet
+        finally:
+            conn.close()
+
+        value = {
+            "windows_versions": windows_versions,
+            "statuses": statuses,
+            "sql_versions": sql_versions,
+            "cu_levels": cu_levels,
+        }
+        _options_cache.update(generation=fleet_scanner.scan_generation, loaded_at=time.monotonic(), value=value)
+        return value
@@ -0,0 +1,336 @@
+# fleet_reports.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .capacity_forecast import ensure_forecast_objects
+from .db_detail import get_inventory_connection, snapshot_server_db_metadata
+from .refresh_scheduler import RefreshScheduler
+
+# ---------- FLEET REPORTS (dbo.db_metadata + dbo.ServerInfo) ----------
+#
+# Named fleet questions answered with one inventory query each: no target is
+# contacted while a report is viewed or exported. dbo.db_metadata is kept
+# current for every server by a background sweep (the same one-batch
+# snapshot db_detail uses), so reports do not depend on someone having opened
+# each database page.
+DB_METADATA_SWEEP_INTERVAL = int(os.getenv("INV_DB_METADATA_SWEEP_INTERVAL", "3600"))   # seconds (0 = off)
+DB_METADATA_SWEEP_WORKERS = int(os.getenv("INV_DB_METADATA_SWEEP_WORKERS", "8"))
+REPORT_PAGE_LIMIT = int(os.getenv("INV_REPORT_PAGE_LIMIT", "500"))
+REPORT_CSV_LIMIT = int(os.getenv("INV_REPORT_CSV_LIMIT", "100000"))
+REPORT_FETCH_SIZE = 500
+
+# Filtered / ordered indexes matching the report predicates below (each
+# report query carries the same literal filters so these can be used).
+REPORT_INDEX_DDL = [
+    ("IX_db_metadata_rpt_full_backup",
+     "(last_full_backup) INCLUDE (server_id, database_name, recovery_model_desc, last_log_backup) "
+     "WHERE is_system_db = 0"),
+    ("IX_db_metadata_rpt_log_size",
+     "(log_size_mb DESC) INCLUDE (server_id, database_name, data_size_mb) WHERE is_system_db = 0"),
+    ("IX_db_metadata_rpt_data_size",
+     "(data_size_mb DESC) INCLUDE (server_id, database_name, log_size_mb) WHERE is_system_db = 0"),
+    ("IX_db_metadata_rpt_auto_shrink",
+     "(server_id, database_name) WHERE is_auto_shrink_on = 1"),
+    ("IX_db_metadata_rpt_auto_close",
+     "(server_id, database_name) WHERE is_auto_close_on = 1"),
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_report_indexes(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        cur = inv_conn.cursor()
+        for name, definition in REPORT_INDEX_DDL:
+            cur.execute(
+                f"""
+                IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}'
+                               AND object_id = OBJECT_ID(N'dbo.db_metadata'))
+                BEGIN
+                    CREATE INDEX {name} ON dbo.db_metadata {definition};
+                END
+                """
+            )
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Report definitions
+# ------------------------
+
+# dbo.db_metadata.data_size_mb / log_size_mb hold GB (see db_detail.SNAPSHOT_BATCH_SQL).
+_DB_COLUMNS = [
+    ("server_name", "Server"),
+    ("server_status", "Status"),
+    ("database_name", "Database"),
+    ("state_desc", "State"),
+    ("recovery_model_desc", "Recovery"),
+    ("compatibility_level", "Compat"),
+    ("data_size_mb", "Data GB"),
+    ("log_size_mb", "Log GB"),
+    ("last_full_backup", "Last full"),
+    ("last_log_backup", "Last log"),
+    ("page_verify_option_desc", "Page verify"),
+    ("availability_group_name", "AG"),
+    ("collected_at", "Collected"),
+]
+
+_DB_SQL = """
+SELECT TOP (?)
+    sl.ID AS server_id, sl.ServerName AS server_name, si.Status AS server_status,
+    dm.database_name, dm.state_desc, dm.recovery_model_desc, dm.compatibility_level,
+    dm.data_size_mb, dm.log_size_mb, dm.last_full_backup, dm.last_log_backup,
+    dm.page_verify_option_desc, dm.availability_group_name, dm.collected_at
+FROM dbo.db_metadata AS dm
+JOIN dbo.ServerList AS sl ON sl.ID = dm.server_id
+LEFT JOIN dbo.ServerInfo AS si ON si.ServerID = dm.server_id
+WHERE dm.is_system_db = 0
+  AND ({where})
+  AND (? IS NULL OR sl.ServerName LIKE ?)
+ORDER BY {order_by};
+"""
+
+_SERVER_COLUMNS = [
+    ("server_name", "Server"),
+    ("server_status", "Status"),
+    ("sql_version", "SQL version"),
+    ("sql_edition", "Edition"),
+    ("user_databases", "User DBs"),
+    ("data_gb", "Data GB"),
+    ("log_gb", "Log GB"),
+    ("largest_log_gb", "Largest log GB"),
+    ("auto_shrink_dbs", "Auto-shrink DBs"),
+    ("stale_full_backup_dbs", "No full backup in N days"),
+    ("ag_dbs", "AG DBs"),
+    ("metadata_collected_at", "Collected"),
+]
+
+_SERVER_SQL = """
+SELECT TOP (?)
+    sl.ID AS server_id, sl.ServerName AS server_name, si.Status AS server_status,
+    si.SQLVersion AS sql_version, si.SQLEdition AS sql_edition,
+    COUNT(dm.database_id) AS user_databases,
+    SUM(dm.data_size_mb) AS data_gb,
+    SUM(dm.log_size_mb)  AS log_gb,
+    MAX(dm.log_size_mb)  AS largest_log_gb,
+    SUM(CASE WHEN dm.is_auto_shrink_on = 1 THEN 1 ELSE 0 END) AS auto_shrink_dbs,
+    SUM(CASE WHEN dm.database_id IS NOT NULL
+              AND (dm.last_full_backup IS NULL OR dm.last_full_backup < DATEADD(DAY, -?, GETDATE()))
+             THEN 1 ELSE 0 END) AS stale_full_backup_dbs,
+    SUM(CASE WHEN dm.is_in_availability_group = 1 THEN 1 ELSE 0 END) AS ag_dbs,
+    MAX(dm.collected_at) AS metadata_collected_at
+FROM dbo.ServerList AS sl
+LEFT JOIN dbo.ServerInfo AS si ON si.ServerID = sl.ID
+LEFT JOIN dbo.db_metadata AS dm ON dm.server_id = sl.ID AND dm.is_system_db = 0
+WHERE (? IS NULL OR sl.ServerName LIKE ?)
+GROUP BY sl.ID, sl.ServerName, si.Status, si.SQLVersion, si.SQLEdition
+ORDER BY sl.ServerName;
+"""
+
+_DRIVE_FORECAST_COLUMNS = [
+    ("server_name", "Server"),
+    ("mount_point", "Drive"),
+    ("database_count", "DBs"),
+    ("sql_files_gb", "SQL files GB"),
+    ("growth_mb_per_day", "Growth MB/day"),
+    ("free_gb", "Free GB"),
+    ("days_until_full", "Days until full"),
+    ("full_on", "Full on"),
+    ("computed_at", "Computed"),
+]
+
+_DRIVE_FORECAST_SQL = """
+SELECT TOP (?)
+    sl.ID AS server_id, sl.ServerName AS server_name, f.MountPoint AS mount_point,
+    f.DatabaseCount AS database_count,
+    CONVERT(DECIMAL(18,2), f.SqlFilesMB / 1024.0) AS sql_files_gb,
+    CONVERT(DECIMAL(18,2), f.GrowthMBPerDay) AS growth_mb_per_day,
+    CONVERT(DECIMAL(18,2), f.FreeMB / 1024.0) AS free_gb,
+    CONVERT(INT, f.DaysUntilFull) AS days_until_full,
+    f.FullOn AS full_on, f.ComputedAt AS computed_at
+FROM dbo.CapacityForecastDrive AS f
+JOIN dbo.ServerList AS sl ON sl.ID = f.ServerID
+WHERE f.DaysUntilFull <= ?
+  AND (? IS NULL OR sl.ServerName LIKE ?)
+ORDER BY f.DaysUntilFull;
+"""
+
+_DB_GROWTH_COLUMNS = [
+    ("server_name", "Server"),
+    ("database_name", "Database"),
+    ("size_mb", "Size MB"),
+    ("growth_mb_per_day", "Growth MB/day"),
+    ("data_mount_point", "Data drive"),
+    ("history_days", "Days of history"),
+    ("computed_at", "Computed"),
+]
+
+_DB_GROWTH_SQL = """
+SELECT TOP (?)
+    sl.ID AS server_id, sl.ServerName AS server_name, f.DatabaseName AS database_name,
+    CONVERT(DECIMAL(18,2), ISNULL(f.DataSizeMB, 0) + ISNULL(f.LogSizeMB, 0)) AS size_mb,
+    CONVERT(DECIMAL(18,2), ISNULL(f.DataGrowthMBPerDay, 0) + ISNULL(f.LogGrowthMBPerDay, 0)) AS growth_mb_per_day,
+    f.DataMountPoint AS data_mount_point, f.HistoryDays AS history_days, f.ComputedAt AS computed_at
+FROM dbo.CapacityForecastDatabase AS f
+JOIN dbo.ServerList AS sl ON sl.ID = f.ServerID
+WHERE ISNULL(f.DataGrowthMBPerDay, 0) + ISNULL(f.LogGrowthMBPerDay, 0) >= ?
+  AND (? IS NULL OR sl.ServerName LIKE ?)
+ORDER BY ISNULL(f.DataGrowthMBPerDay, 0) + ISNULL(f.LogGrowthMBPerDay, 0) DESC;
+"""
+
+
+def _db_report(title, where, order_by="sl.ServerName, dm.database_name", params=()):
+    return {
+        "title": title,
+        "sql": _DB_SQL.format(where=where, order_by=order_by),
+        "params": list(params),
+        "columns": _DB_COLUMNS,
+    }
+
+
+# key -> {title, sql, params: [(name, default)], columns: [(key, label)]}
+# SQL parameter order: limit, report params, server filter (twice).
+REPORTS = {
+    "server_compare": {
+        "title": "Server comparison",
+        "sql": _SERVER_SQL,
+        "params": [("days", 7)],
+        "columns": _SERVER_COLUMNS,
+    },
+    "auto_shrink": _db_report("Databases with AUTO_SHRINK on", "dm.is_auto_shrink_on = 1"),
+    "auto_close": _db_report("Databases with AUTO_CLOSE on", "dm.is_auto_close_on = 1"),
+    "no_recent_full_backup": _db_report(
+        "No full backup in N days",
+        "dm.database_name <> N'tempdb' AND (dm.last_full_backup IS NULL OR dm.last_full_backup < DATEADD(DAY, -?, GETDATE()))",
+        order_by="dm.last_full_backup, sl.ServerName, dm.database_name",
+        params=[("days", 7)],
+    ),
+    "full_recovery_no_log_backup": _db_report(
+        "FULL recovery without a log backup in N hours",
+        "dm.recovery_model_desc = N'FULL' AND (dm.last_log_backup IS NULL OR dm.last_log_backup < DATEADD(HOUR, -?, GETDATE()))",
+        order_by="dm.last_log_backup, sl.ServerName, dm.database_name",
+        params=[("hours", 24)],
+    ),
+    "largest_logs": _db_report("Largest log files", "1 = 1", order_by="dm.log_size_mb DESC"),
+    "largest_databases": _db_report("Largest databases", "1 = 1", order_by="dm.data_size_mb DESC"),
+    "page_verify_not_checksum": _db_report(
+        "Page verify not CHECKSUM", "dm.page_verify_option_desc <> N'CHECKSUM'"
+    ),
+    "old_compatibility": _db_report(
+        "Compatibility level below N",
+        "dm.compatibility_level < ?",
+        order_by="dm.compatibility_level, sl.ServerName, dm.database_name",
+        params=[("level", 130)],
+    ),
+    "not_online": _db_report("Databases not ONLINE", "dm.state_desc <> N'ONLINE'"),
+    # Stored capacity forecast (capacity_forecast.py batch fit)
+    "drives_filling_up": {
+        "title": "Drives full within N days",
+        "sql": _DRIVE_FORECAST_SQL,
+        "params": [("days", 90)],
+        "columns": _DRIVE_FORECAST_COLUMNS,
+    },
+    "fastest_growing_databases": {
+        "title": "Fastest growing databases",
+        "sql": _DB_GROWTH_SQL,
+        "params": [("min_mb_per_day", 1)],
+        "columns": _DB_GROWTH_COLUMNS,
+    },
+}
+
+
+def list_reports() -> list[dict]:
+    return [{"key": k, "title": r["title"], "params": r["params"]} for k, r in REPORTS.items()]
+
+
+def resolve_params(report_key: str, values) -> dict:
+    """Report parameters from a request-args-like mapping (ints, defaults when missing/invalid)."""
+    report = REPORTS[report_key]
+    resolved = {}
+    for name, default in report["params"]:
+        try:
+            resolved[name] = int(values.get(name, default))
+        except (TypeError, ValueError):
+            resolved[name] = default
+    return resolved
+
+
+def iter_report(report_key: str, params: dict, server_filter: str | None = None, limit: int = REPORT_PAGE_LIMIT):
+    """Yield report rows as dicts (one query, fetched in batches; connection closed at the end)."""
+    report = REPORTS[report_key]
+    like = f"%{server_filter}%" if server_filter else None
+    args = [limit, *[params[name] for name, _ in report["params"]], like, like]
+
+    conn = get_inventory_connection()
+    try:
+        ensure_report_indexes(conn)
+        ensure_forecast_objects(conn)
+        cur = conn.cursor()
+        cur.execute(report["sql"], args)
+        names = [c[0] for c in cur.description]
+        while True:
+            rows = cur.fetchmany(REPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for r in rows:
+                yield dict(zip(names, r))
+    finally:
+        conn.close()
+
+
+# ------------------------
+# Background db_metadata sweep
+# ------------------------
+
+def _snapshot_one(server_id: int, server_name: str) -> bool:
+    try:
+        snapshot_server_db_metadata(server_id)
+        return True
+    except Exception as ex:
+        print(f"[DB_METADATA_SWEEP] {server_name}: {ex}")
+        return False
+
+
+def sweep_db_metadata(max_workers: int = DB_METADATA_SWEEP_WORKERS) -> dict:
+    """Snapshot dbo.db_metadata for every server (offline servers keep their last rows)."""
+    t0 = time.monotonic()
+
+    conn = get_inventory_connection()
+    try:
+        servers = conn.cursor().execute(
+            """
+            SELECT sl.ID, sl.ServerName
+            FROM dbo.ServerList AS sl
+            LEFT JOIN dbo.ServerInfo AS si ON si.ServerID = sl.ID
+            WHERE ISNULL(si.Status, 'ONLINE') <> 'OFFLINE'
+            ORDER BY sl.ServerName;
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+
+    results = []
+    if servers:
+        workers = max(1, min(max_workers, len(servers)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-meta-sweep") as pool:
+            results = list(pool.map(lambda s: _snapshot_one(int(s.ID), str(s.ServerName)), servers))
+
+    online = sum(1 for ok in results if ok)
+    return {
+        "servers": len(results),
+        "online": online,
+        "offline": len(results) - online,
+        "elapsed": round(time.monotonic() - t0, 3),
+    }
+
+
+sweeper = RefreshScheduler(refresh_fn=sweep_db_metadata, interval=DB_METADATA_SWEEP_INTERVAL, name="db-metadata-sweep")
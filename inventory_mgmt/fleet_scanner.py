@@ -0,0 +1,703 @@
+# fleet_scanner.py
+import os
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pyodbc
+from dotenv import load_dotenv
+
+# Load the same .env as app.py
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
+
+INV_DB_SERVER = os.getenv("INV_DB_SERVER")
+INV_DB_NAME = os.getenv("INV_DB_NAME")
+INV_DB_USER = os.getenv("INV_DB_USER")
+INV_DB_PASSWORD = os.getenv("INV_DB_PASSWORD")
+INV_DB_TRUSTED = (os.getenv("INV_DB_TRUSTED", "YES").upper() == "YES")
+
+# Bounded pool: pyodbc releases the GIL while waiting on the network,
+# so threads are enough to overlap connects/queries across servers.
+FLEET_SCAN_WORKERS = int(os.getenv("INV_FLEET_SCAN_WORKERS", "32"))
+FLEET_CONNECT_TIMEOUT = int(os.getenv("INV_FLEET_CONNECT_TIMEOUT", "5"))   # login timeout (s)
+FLEET_QUERY_TIMEOUT = int(os.getenv("INV_FLEET_QUERY_TIMEOUT", "15"))      # per-probe query timeout (s)
+LIVE_DRIVES_BUDGET = float(os.getenv("INV_LIVE_DRIVES_BUDGET", "8"))       # whole-page budget for live drive reads (s)
+CU_TTL_SECONDS = int(os.getenv("INV_CU_TTL_SECONDS", str(24 * 3600)))        # CU level only changes when patched
+LIVE_CU_BUDGET = float(os.getenv("INV_LIVE_CU_BUDGET", "8"))               # page budget for refreshing stale CU rows (s)
+
+
+# ------------------------
+# Connections
+# ------------------------
+
+def get_inventory_connection():
+    if not INV_DB_SERVER or not INV_DB_NAME:
+        raise RuntimeError("INV_DB_SERVER or INV_DB_NAME is not set in .env")
+
+    if INV_DB_TRUSTED:
+        conn_str = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={INV_DB_SERVER};"
+            f"DATABASE={INV_DB_NAME};"
+            "Trusted_Connection=yes;"
+        )
+    else:
+        if not INV_DB_USER or not INV_DB_PASSWORD:
+            raise RuntimeError("Using SQL auth but INV_DB_USER / INV_DB_PASSWORD not set")
+        conn_str = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={INV_DB_SERVER};"
+            f"DATABASE={INV_DB_NAME};"
+            f"UID={INV_DB_USER};"
+            f"PWD={INV_DB_PASSWORD};"
+        )
+    return pyodbc.connect(conn_str)
+
+
+def get_probe_connection(server_name: str, connect_timeout: int = FLEET_CONNECT_TIMEOUT):
+    """Connection to a target instance with login + query timeouts (dead servers fail fast)."""
+    base = (
+        "DRIVER={ODBC Driver 17 for SQL Server};"
+        f"SERVER={server_name};"
+        "DATABASE=master;"
+        f"Connection Timeout={connect_timeout};"
+    )
+    if INV_DB_TRUSTED:
+        conn_str = base + "Trusted_Connection=yes;"
+    else:
+        if not INV_DB_USER or not INV_DB_PASSWORD:
+            raise RuntimeError("Using SQL auth but INV_DB_USER / INV_DB_PASSWORD not set")
+        conn_str = base + f"UID={INV_DB_USER};PWD={INV_DB_PASSWORD};"
+
+    conn = pyodbc.connect(conn_str, timeout=connect_timeout)
+    conn.timeout = FLEET_QUERY_TIMEOUT
+    return conn
+
+
+# ------------------------
+# Inventory-side objects (TVP types, ServerDrives, procs), created once per process
+# ------------------------
+
+FLEET_SCAN_DDL = [
+    """
+    IF TYPE_ID(N'dbo.ServerInfoSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerInfoSnapshotType AS TABLE (
+            ServerID        INT            NOT NULL PRIMARY KEY,
+            Status          NVARCHAR(20)   NOT NULL,
+            SQLVersion      NVARCHAR(256)  NULL,
+            SQLEdition      NVARCHAR(128)  NULL,
+            OSVersion       NVARCHAR(128)  NULL,
+            LastRestart     DATETIME2      NULL,
+            TotalDatabases  INT            NULL,
+            TotalSizeGB     DECIMAL(38,2)  NULL,
+            LastCUUpdated   DATETIME2      NULL
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'dbo.ServerDrives') AND type = 'U')
+    BEGIN
+        CREATE TABLE dbo.ServerDrives (
+            ServerID        INT            NOT NULL,
+            MountPoint      NVARCHAR(260)  NOT NULL,
+            VolumeName      NVARCHAR(260)  NULL,
+            TotalBytes      BIGINT         NULL,
+            AvailableBytes  BIGINT         NULL,
+            CollectedAt     DATETIME2      NOT NULL CONSTRAINT DF_ServerDrives_CollectedAt DEFAULT (SYSDATETIME()),
+            CONSTRAINT PK_ServerDrives PRIMARY KEY (ServerID, MountPoint)
+        );
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerIdListType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerIdListType AS TABLE (ServerID INT NOT NULL PRIMARY KEY);
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerDrivesSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerDrivesSnapshotType AS TABLE (
+            ServerID        INT            NOT NULL,
+            MountPoint      NVARCHAR(260)  NOT NULL,
+            VolumeName      NVARCHAR(260)  NULL,
+            TotalBytes      BIGINT         NULL,
+            AvailableBytes  BIGINT         NULL,
+            PRIMARY KEY (ServerID, MountPoint)
+        );
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_ReplaceServerDrives
+        @Servers dbo.ServerIdListType READONLY,
+        @Drives  dbo.ServerDrivesSnapshotType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        -- Only servers that answered are replaced; offline servers keep their last drives.
+        BEGIN TRAN;
+            DELETE d
+            FROM dbo.ServerDrives AS d
+            JOIN @Servers AS s ON s.ServerID = d.ServerID;
+
+            INSERT INTO dbo.ServerDrives (ServerID, MountPoint, VolumeName, TotalBytes, AvailableBytes)
+            SELECT ServerID, MountPoint, VolumeName, TotalBytes, AvailableBytes
+            FROM @Drives;
+        COMMIT;
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'dbo.ServerCU') AND type = 'U')
+    BEGIN
+        CREATE TABLE dbo.ServerCU (
+            ServerID        INT            NOT NULL CONSTRAINT PK_ServerCU PRIMARY KEY,
+            ProductVersion  NVARCHAR(50)   NULL,
+            CULevel         NVARCHAR(50)   NULL,
+            CUReference     NVARCHAR(255)  NULL,
+            CollectedAt     DATETIME2      NULL,
+            LastAttemptAt   DATETIME2      NULL,
+            LastError       NVARCHAR(1000) NULL
+        );
+    END
+    """,
+    """
+    -- Failed refreshes are recorded too (negative cache for CU_TTL_SECONDS)
+    IF COL_LENGTH('dbo.ServerCU', 'LastAttemptAt') IS NULL
+    BEGIN
+        ALTER TABLE dbo.ServerCU ADD LastAttemptAt DATETIME2 NULL, LastError NVARCHAR(1000) NULL;
+        ALTER TABLE dbo.ServerCU ALTER COLUMN CollectedAt DATETIME2 NULL;
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerCUSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerCUSnapshotType AS TABLE (
+            ServerID        INT            NOT NULL PRIMARY KEY,
+            ProductVersion  NVARCHAR(50)   NULL,
+            CULevel         NVARCHAR(50)   NULL,
+            CUReference     NVARCHAR(255)  NULL
+        );
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerCUFailureType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerCUFailureType AS TABLE (
+            ServerID        INT            NOT NULL PRIMARY KEY,
+            Error           NVARCHAR(1000) NULL
+        );
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_MergeServerCU
+        @Rows dbo.ServerCUSnapshotType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        MERGE dbo.ServerCU AS tgt
+        USING @Rows AS src
+              ON tgt.ServerID = src.ServerID
+        WHEN MATCHED THEN
+            UPDATE SET
+                tgt.ProductVersion = src.ProductVersion,
+                tgt.CULevel        = src.CULevel,
+                tgt.CUReference    = src.CUReference,
+                tgt.CollectedAt    = SYSDATETIME(),
+                tgt.LastAttemptAt  = SYSDATETIME(),
+                tgt.LastError      = NULL
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (ServerID, ProductVersion, CULevel, CUReference, CollectedAt, LastAttemptAt)
+            VALUES (src.ServerID, src.ProductVersion, src.CULevel, src.CUReference, SYSDATETIME(), SYSDATETIME());
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_RecordServerCUFailure
+        @Rows dbo.ServerCUFailureType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        -- Only the attempt is recorded; the last known CU values are kept.
+        MERGE dbo.ServerCU AS tgt
+        USING @Rows AS src
+              ON tgt.ServerID = src.ServerID
+        WHEN MATCHED THEN
+            UPDATE SET
+                tgt.LastAttemptAt = SYSDATETIME(),
+                tgt.LastError     = src.Error
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (ServerID, LastAttemptAt, LastError)
+            VALUES (src.ServerID, SYSDATETIME(), src.Error);
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_MergeServerInfoSnapshot
+        @Rows dbo.ServerInfoSnapshotType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        -- OFFLINE rows only move Status/LastScan; the last known facts are kept.
+        MERGE dbo.ServerInfo AS tgt
+        USING @Rows AS src
+              ON tgt.ServerID = src.ServerID
+        WHEN MATCHED THEN
+            UPDATE SET
+                tgt.Status         = src.Status,
+                tgt.SQLVersion     = CASE WHEN src.Status = 'ONLINE' THEN src.SQLVersion     ELSE tgt.SQLVersion     END,
+                tgt.SQLEdition     = CASE WHEN src.Status = 'ONLINE' THEN src.SQLEdition     ELSE tgt.SQLEdition     END,
+                tgt.OSVersion      = CASE WHEN src.Status = 'ONLINE' THEN src.OSVersion      ELSE tgt.OSVersion      END,
+                tgt.LastRestart    = CASE WHEN src.Status = 'ONLINE' THEN src.LastRestart    ELSE tgt.LastRestart    END,
+                tgt.TotalDatabases = CASE WHEN src.Status = 'ONLINE' THEN src.TotalDatabases ELSE tgt.TotalDatabases END,
+                tgt.TotalSizeGB    = CASE WHEN src.Status = 'ONLINE' THEN src.TotalSizeGB    ELSE tgt.TotalSizeGB    END,
+                tgt.LastCUUpdated  = CASE WHEN src.Status = 'ONLINE' THEN src.LastCUUpdated  ELSE tgt.LastCUUpdated  END,
+                tgt.LastScan       = SYSDATETIME(),
+                tgt.LastUpdated    = SYSDATETIME()
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (ServerID, Status, SQLVersion, SQLEdition, OSVersion, LastRestart,
+                    TotalDatabases, TotalSizeGB, LastScan, LastUpdated, LastCUUpdated)
+            VALUES (src.ServerID, src.Status, src.SQLVersion, src.SQLEdition, src.OSVersion, src.LastRestart,
+                    ISNULL(src.TotalDatabases, 0), ISNULL(src.TotalSizeGB, 0), SYSDATETIME(), SYSDATETIME(), src.LastCUUpdated);
+    END
+    """,
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_fleet_scan_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        cur = inv_conn.cursor()
+        for ddl in FLEET_SCAN_DDL:
+            cur.execute(ddl)
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Per-server probe (one round-trip)
+# ------------------------
+
+# Everything refresh_all_server_info used to ask in seven separate queries.
+# OS version and resource-update time were optional there (denied/unsupported
+# on some instances), so they come back as their own result sets and are read
+# tolerantly; only the first result set decides ONLINE.
+PROBE_SQL = """
+SET NOCOUNT ON;
+SELECT
+    CAST(LEFT(@@VERSION, CHARINDEX(CHAR(10), @@VERSION + CHAR(10)) - 1) AS NVARCHAR(256)) AS sql_version,
+    CAST(SERVERPROPERTY('Edition') AS NVARCHAR(128))                               AS sql_edition,
+    (SELECT CONVERT(DATETIME2, sqlserver_start_time) FROM sys.dm_os_sys_info)      AS last_restart,
+    (SELECT COUNT(*) FROM sys.databases WHERE database_id > 4)                     AS total_databases,
+    (SELECT CAST(SUM(CAST(size AS BIGINT)) * 8.0 / 1024 / 1024 AS DECIMAL(38,2))
+       FROM sys.master_files WHERE database_id > 4)                                AS total_size_gb,
+    CAST(SERVERPROPERTY('ProductVersion') AS NVARCHAR(50))                         AS product_version,
+    CAST(SERVERPROPERTY('ProductLevel') AS NVARCHAR(50))                           AS product_level,
+    CAST(SERVERPROPERTY('ProductUpdateLevel') AS NVARCHAR(50))                     AS product_update_level,
+    CAST(SERVERPROPERTY('ProductUpdateReference') AS NVARCHAR(255))                AS product_update_reference;
+
+SELECT TOP (1) windows_release AS os_version FROM sys.dm_os_windows_info;
+
+SELECT CAST(SERVERPROPERTY('ResourceLastUpdateDateTime') AS DATETIME2) AS last_cu_updated;
+
+SELECT DISTINCT
+    vs.volume_mount_point,
+    vs.logical_volume_name,
+    vs.total_bytes,
+    vs.available_bytes
+FROM sys.master_files AS mf
+CROSS APPLY sys.dm_os_volume_stats(mf.database_id, mf.file_id) AS vs;
+"""
+
+CU_SQL = """
+SELECT
+    CAST(SERVERPROPERTY('ProductVersion') AS NVARCHAR(50)) AS product_version,
+    CAST(SERVERPROPERTY('ProductLevel') AS NVARCHAR(50)) AS product_level,
+    CAST(SERVERPROPERTY('ProductUpdateLevel') AS NVARCHAR(50)) AS product_update_level,
+    CAST(SERVERPROPERTY('ProductUpdateReference') AS NVARCHAR(255)) AS product_update_reference;
+"""
+
+DRIVES_SQL = """
+SET NOCOUNT ON;
+SELECT DISTINCT
+    vs.volume_mount_point,
+    vs.logical_volume_name,
+    vs.total_bytes,
+    vs.available_bytes
+FROM sys.master_files AS mf
+CROSS APPLY sys.dm_os_volume_stats(mf.database_id, mf.file_id) AS vs;
+"""
+
+
+def drive_dict(mount_point, name, total_bytes, available_bytes) -> dict:
+    """Drive entry in the shape the server cards expect."""
+    total_gb = (total_bytes or 0) / 1024.0 / 1024.0 / 1024.0
+    free_gb = (available_bytes or 0) / 1024.0 / 1024.0 / 1024.0
+    free_pct = None
+    if total_gb > 0:
+        free_pct = round((free_gb / total_gb) * 100, 1)
+    return {
+        "mount_point": mount_point,
+        "name": name,
+        "total_gb": total_gb,
+        "free_gb": free_gb,
+        "free_pct": free_pct,
+    }
+
+
+def _next_rows(cur) -> list:
+    """Rows of the next result set, or [] when it is missing/denied."""
+    try:
+        if cur.nextset():
+            return cur.fetchall()
+    except pyodbc.Error:
+        pass
+    return []
+
+
+def probe_server(server_id: int, server_name: str) -> dict:
+    """Probe one instance; never raises (unreachable -> status OFFLINE)."""
+    result = {
+        "server_id": int(server_id),
+        "server_name": server_name,
+        "status": "OFFLINE",
+        "sql_version": None,
+        "sql_edition": None,
+        "os_version": None,
+        "last_restart": None,
+        "total_databases": None,
+        "total_size_gb": None,
+        "last_cu_updated": None,
+        "product_version": None,
+        "cu_level": None,
+        "cu_reference": None,
+        "drives": [],
+        "error": None,
+        "elapsed": 0.0,
+    }
+    t0 = time.monotonic()
+    try:
+        conn = get_probe_connection(server_name)
+        try:
+            cur = conn.cursor()
+            row = cur.execute(PROBE_SQL).fetchone()
+            os_rows = _next_rows(cur)
+            cu_rows = _next_rows(cur)
+            # No VIEW SERVER STATE for volume stats: keep the server facts
+            drives = [
+                (d.volume_mount_point, d.logical_volume_name, d.total_bytes, d.available_bytes)
+                for d in _next_rows(cur)
+            ]
+        finally:
+            conn.close()
+
+        if row:
+            result.update(
+                status="ONLINE",
+                sql_version=row.sql_version,
+                sql_edition=row.sql_edition,
+                os_version=os_rows[0].os_version if os_rows else None,
+                last_restart=row.last_restart,
+                total_databases=int(row.total_databases or 0),
+                total_size_gb=float(row.total_size_gb or 0),
+                last_cu_updated=cu_rows[0].last_cu_updated if cu_rows else None,
+                product_version=row.product_version,
+                # Prefer ProductUpdateLevel when available (often CUxx), else ProductLevel.
+                cu_level=row.product_update_level or row.product_level,
+                cu_reference=row.product_update_reference,
+                drives=drives,
+            )
+    except Exception as ex:
+        result["error"] = str(ex)
+    result["elapsed"] = round(time.monotonic() - t0, 3)
+    return result
+
+
+def _snapshot_row(r: dict) -> tuple:
+    # Column order = dbo.ServerInfoSnapshotType
+    return (
+        r["server_id"],
+        r["status"],
+        r["sql_version"],
+        r["sql_edition"],
+        r["os_version"],
+        r["last_restart"],
+        r["total_databases"],
+        r["total_size_gb"],
+        r["last_cu_updated"],
+    )
+
+
+def _cu_row(r: dict) -> tuple:
+    # Column order = dbo.ServerCUSnapshotType
+    return (r["server_id"], r["product_version"], r["cu_level"], r["cu_reference"])
+
+
+def _unique_drives(drives):
+    # One row per mount point (PK of ServerDrives)
+    seen = {}
+    for d in drives:
+        if d[0] is not None:
+            seen.setdefault(d[0], d)
+    return list(seen.values())
+
+
+# ------------------------
+# Fleet scan
+# ------------------------
+
+# Bumped after every completed scan; caches derived from ServerInfo key on it.
+scan_generation = 0
+
+
+def scan_fleet(max_workers: int = FLEET_SCAN_WORKERS) -> dict:
+    """Probe every server in dbo.ServerList concurrently and MERGE dbo.ServerInfo once.
+
+    Returns a summary: {servers, online, offline, elapsed, results}.
+    """
+    t0 = time.monotonic()
+
+    inv_conn = get_inventory_connection()
+    try:
+        ensure_fleet_scan_objects(inv_conn)
+        servers = inv_conn.cursor().execute(
+            "SELECT ID, ServerName FROM dbo.ServerList ORDER BY ServerName;"
+        ).fetchall()
+    finally:
+        inv_conn.close()
+
+    results = []
+    if servers:
+        workers = max(1, min(max_workers, len(servers)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet-scan") as pool:
+            results = list(pool.map(lambda s: probe_server(s.ID, str(s.ServerName)), servers))
+
+    if results:
+        inv_conn = get_inventory_connection()
+        try:
+            cur = inv_conn.cursor()
+            cur.execute(
+                "{CALL dbo.usp_MergeServerInfoSnapshot (?)}",
+                ([_snapshot_row(r) for r in results],),
+            )
+
+            online_rows = [r for r in results if r["status"] == "ONLINE"]
+            if online_rows:
+                cur.execute(
+                    "{CALL dbo.usp_MergeServerCU (?)}",
+                    ([_cu_row(r) for r in online_rows],),
+                )
+                cur.execute(
+                    "{CALL dbo.usp_ReplaceServerDrives (?, ?)}",
+                    (
+                        [(r["server_id"],) for r in online_rows],
+                        [(r["server_id"], *d) for r in online_rows for d in _unique_drives(r["drives"])],
+                    ),
+                )
+            inv_conn.commit()
+        finally:
+            inv_conn.close()
+
+    global scan_generation
+    scan_generation += 1
+
+    online = sum(1 for r in results if r["status"] == "ONLINE")
+    return {
+        "servers": len(results),
+        "online": online,
+        "offline": len(results) - online,
+        "elapsed": round(time.monotonic() - t0, 3),
+        "results": results,
+    }
+
+
+# ------------------------
+# Drives: stored snapshot + live fan-out
+# ------------------------
+
+def load_stored_drives(cur) -> dict:
+    """{server_id: [drive dict, ...]} from dbo.ServerDrives (one query for the whole fleet)."""
+    drives = {}
+    try:
+        rows = cur.execute(
+            """
+            SELECT d.ServerID, d.MountPoint, d.VolumeName, d.TotalBytes, d.AvailableBytes
+            FROM dbo.ServerDrives AS d
+            JOIN dbo.ServerList AS sl ON sl.ID = d.ServerID
+            ORDER BY d.ServerID, d.MountPoint;
+            """
+        ).fetchall()
+    except Exception:
+        # Table not created yet (no scan has run)
+        rows = []
+
+    for r in rows:
+        drives.setdefault(int(r.ServerID), []).append(
+            drive_dict(r.MountPoint, r.VolumeName, r.TotalBytes, r.AvailableBytes)
+        )
+    return drives
+
+
+def _read_drives_live(server_name: str) -> list[dict]:
+    conn = get_probe_connection(server_name)
+    try:
+        rows = conn.cursor().execute(DRIVES_SQL).fetchall()
+    finally:
+        conn.close()
+    return [drive_dict(d.volume_mount_point, d.logical_volume_name, d.total_bytes, d.available_bytes) for d in rows]
+
+
+def collect_drives_live(servers, budget: float = LIVE_DRIVES_BUDGET, max_workers: int = FLEET_SCAN_WORKERS) -> dict:
+    """Read drives from every server concurrently within one time budget for the page.
+
+    `servers` is a list of (server_id, server_name). Servers that fail or miss
+    the budget are left out of the result (callers fall back to stored drives).
+    """
+    if not servers:
+        return {}
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(servers))), thread_name_prefix="live-drives")
+    try:
+        futures = {pool.submit(_read_drives_live, name): sid for sid, name in servers}
+        done, _ = wait(futures, timeout=budget)
+        live = {}
+        for f in done:
+            try:
+                live[futures[f]] = f.result()
+            except Exception:
+                pass
+        return live
+    finally:
+        # Don't hold the page for stragglers; they finish (or time out) on their own.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------
+# CU details: persisted by the scan, TTL + concurrent refresh for stale rows
+# ------------------------
+
+def load_cu_details() -> dict:
+    """{server_id: {product_version, cu_level, cu_reference, collected_at, checked_at, error}} from dbo.ServerCU.
+
+    checked_at is the last refresh attempt, successful or not; error is set
+    only for servers whose CU level has never been read.
+    """
+    conn = get_inventory_connection()
+    try:
+        ensure_fleet_scan_objects(conn)
+        rows = conn.cursor().execute(
+            """
+            SELECT ServerID, ProductVersion, CULevel, CUReference, CollectedAt,
+                   COALESCE(LastAttemptAt, CollectedAt) AS CheckedAt, LastError
+            FROM dbo.ServerCU;
+            """
+        ).fetchall()
+    except Exception:
+        # Table not created yet (no scan has run)
+        rows = []
+    finally:
+        conn.close()
+
+    return {
+        int(r.ServerID): {
+            "product_version": r.ProductVersion,
+            "cu_level": r.CULevel,
+            "cu_reference": r.CUReference,
+            "collected_at": r.CollectedAt,
+            "checked_at": r.CheckedAt,
+            "error": r.LastError if r.CollectedAt is None else None,
+        }
+        for r in rows
+    }
+
+
+def _fetch_cu_live(server_id: int, server_name: str) -> dict:
+    conn = get_probe_connection(server_name)
+    try:
+        row = conn.cursor().execute(CU_SQL).fetchone()
+    finally:
+        conn.close()
+    return {
+        "server_id": int(server_id),
+        "product_version": row.product_version if row else None,
+        "cu_level": (row.product_update_level or row.product_level) if row else None,
+        "cu_reference": row.product_update_reference if row else None,
+    }
+
+
+def get_cu_details(servers, ttl: int = CU_TTL_SECONDS, budget: float = LIVE_CU_BUDGET) -> dict:
+    """CU details for `servers` [(server_id, server_name)], refreshing stale ones concurrently.
+
+    Rows checked within `ttl` come straight from dbo.ServerCU. Missing/stale rows
+    are fetched live in parallel within `budget` seconds and written back in one
+    MERGE; servers that fail or miss the budget keep their stored value (with
+    an error for servers never seen) and have the failed attempt recorded, so
+    an unreachable server is not probed again on every page until `ttl` passes.
+    """
+    cached = load_cu_details()
+    now = datetime.now()
+    stale = [
+        (sid, name) for sid, name in servers
+        if sid not in cached
+        or cached[sid]["checked_at"] is None
+        or (now - cached[sid]["checked_at"]).total_seconds() > ttl
+    ]
+
+    if stale:
+        pool = ThreadPoolExecutor(max_workers=max(1, min(FLEET_SCAN_WORKERS, len(stale))), thread_name_prefix="live-cu")
+        try:
+            futures = {pool.submit(_fetch_cu_live, sid, name): sid for sid, name in stale}
+            done, _ = wait(futures, timeout=budget)
+            fresh, failed = [], []
+            for f in futures:
+                sid = futures[f]
+                try:
+                    if f not in done:
+                        raise TimeoutError("CU refresh timed out")
+                    fresh.append(f.result())
+                except Exception as ex:
+                    failed.append((sid, str(ex)[:1000]))
+                    if cached.get(sid, {}).get("collected_at") is None:
+                        cached[sid] = {
+                            "product_version": None,
+                            "cu_level": None,
+                            "cu_reference": None,
+                            "collected_at": None,
+                            "checked_at": now,
+                            "error": str(ex),
+                        }
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        conn = get_inventory_connection()
+        try:
+            cur = conn.cursor()
+            if fresh:
+                cur.execute("{CALL dbo.usp_MergeServerCU (?)}", ([_cu_row(r) for r in fresh],))
+            if failed:
+                cur.execute("{CALL dbo.usp_RecordServerCUFailure (?)}", (failed,))
+            conn.commit()
+        finally:
+            conn.close()
+        for r in fresh:
+            cached[r["server_id"]] = {
+                "product_version": r["product_version"],
+                "cu_level": r["cu_level"],
+                "cu_reference": r["cu_reference"],
+                "collected_at": now,
+                "checked_at": now,
+                "error": None,
+            }
+
+    return cached
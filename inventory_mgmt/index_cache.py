@@ -0,0 +1,306 @@
+# index_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .catalog_cache import catalog_signature
+from .db_detail import get_inventory_connection, get_target_connection
+
+# ---------- INDEX METADATA (per database, cached) ----------
+#
+# Index definitions and sizes for every user table of a database, read once
+# from catalog views/partition stats (no data pages touched) and reused while
+# the sys.objects signature is unchanged. Sizes drift without touching the
+# signature, hence the max age.
+INDEX_CACHE_MAX = int(os.getenv("INV_INDEX_CACHE_MAX", "64"))
+INDEX_CACHE_MAX_AGE = int(os.getenv("INV_INDEX_CACHE_MAX_AGE", "600"))
+
+INDEX_METADATA_SQL = """
+SET NOCOUNT ON;
+
+SELECT i.object_id, i.index_id, i.name, i.type_desc, i.is_primary_key, i.is_unique
+FROM sys.indexes AS i
+JOIN sys.objects AS o ON o.object_id = i.object_id
+WHERE o.type = 'U'
+  AND o.is_ms_shipped = 0
+  AND i.index_id > 0
+  AND i.is_hypothetical = 0;
+
+SELECT ic.object_id, ic.index_id, c.name AS column_name, ic.is_included_column
+FROM sys.index_columns AS ic
+JOIN sys.columns AS c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+JOIN sys.objects AS o ON o.object_id = ic.object_id
+WHERE o.type = 'U'
+  AND o.is_ms_shipped = 0
+ORDER BY ic.object_id, ic.index_id, ic.is_included_column, ic.key_ordinal, ic.index_column_id;
+
+SELECT ps.object_id, ps.index_id,
+    SUM(ps.used_page_count)     * 8.0 / 1024.0 AS used_mb,
+    SUM(ps.reserved_page_count) * 8.0 / 1024.0 AS reserved_mb
+FROM sys.dm_db_partition_stats AS ps
+JOIN sys.objects AS o ON o.object_id = ps.object_id
+WHERE o.type = 'U'
+  AND o.is_ms_shipped = 0
+  AND ps.index_id > 0
+GROUP BY ps.object_id, ps.index_id;
+"""
+
+_lock = threading.Lock()
+_cache = OrderedDict()   # (server, db) -> {"signature", "loaded_at", "indexes"}
+
+
+def _quote(name: str) -> str:
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def _load_indexes(cur) -> dict:
+    """{object_id: [index dict, ...]} in index_id order (objects_detail index shape)."""
+    cur.execute(INDEX_METADATA_SQL)
+    index_rows = cur.fetchall()
+    cur.nextset()
+    column_rows = cur.fetchall()
+    cur.nextset()
+    space_rows = cur.fetchall()
+
+    columns = {}
+    for r in column_rows:
+        keys, included = columns.setdefault((int(r.object_id), int(r.index_id)), ([], []))
+        (included if r.is_included_column else keys).append(_quote(r.column_name))
+    space = {(int(r.object_id), int(r.index_id)): r for r in space_rows}
+
+    indexes = {}
+    for r in sorted(index_rows, key=lambda x: (x.object_id, x.index_id)):
+        key = (int(r.object_id), int(r.index_id))
+        keys, included = columns.get(key, ([], []))
+        sp = space.get(key)
+        indexes.setdefault(key[0], []).append(
+            {
+                "index_id": key[1],
+                "name": r.name,
+                "type_desc": r.type_desc,
+                "is_primary_key": bool(r.is_primary_key),
+                "is_unique": bool(r.is_unique),
+                "key_columns": keys,
+                "included_columns": included,
+                "fragmentation_percent": None,
+                "fragmentation_scanned_at": None,
+                "used_mb": float(sp.used_mb or 0.0) if sp else 0.0,
+                "reserved_mb": float(sp.reserved_mb or 0.0) if sp else 0.0,
+            }
+        )
+    return indexes
+
+
+def _get_db_indexes(server_name: str, db_name: str) -> dict:
+    key = (server_name.lower(), db_name.lower())
+
+    conn = get_target_connection(server_name, db_name)
+    try:
+        cur = conn.cursor()
+        signature = catalog_signature(cur)
+
+        with _lock:
+            entry = _cache.get(key)
+            if (
+                entry is not None
+                and entry["signature"] == signature
+                and time.monotonic() - entry["loaded_at"] < INDEX_CACHE_MAX_AGE
+            ):
+                _cache.move_to_end(key)
+                return entry["indexes"]
+
+        indexes = _load_indexes(cur)
+    finally:
+        conn.close()
+
+    with _lock:
+        _cache[key] = {"signature": signature, "loaded_at": time.monotonic(), "indexes": indexes}
+        _cache.move_to_end(key)
+        while len(_cache) > INDEX_CACHE_MAX:
+            _cache.popitem(last=False)
+    return indexes
+
+
+def get_index_lookup(server_name: str, db_name: str):
+    """object_id -> list of index dicts: cached definitions + last stored fragmentation.
+
+    Pass to objects_detail.get_object(s)_metadata(index_lookup=...).
+    """
+    indexes = _get_db_indexes(server_name, db_name)
+    fragmentation = get_stored_fragmentation(server_name, db_name)
+
+    def lookup(object_id: int):
+        items = []
+        for idx in indexes.get(int(object_id), []):
+            item = dict(idx)
+            frag = fragmentation.get((int(object_id), idx["index_id"]))
+            if frag:
+                item["fragmentation_percent"], item["fragmentation_scanned_at"] = frag
+            items.append(item)
+        return items
+
+    return lookup
+
+
+# ---------- FRAGMENTATION (explicit, async, rate-limited) ----------
+#
+# sys.dm_db_index_physical_stats reads pages even in LIMITED mode, so it only
+# runs when someone asks for it: one scan at a time per process, each target
+# (db or table) at most once per INV_FRAG_SCAN_MIN_INTERVAL. Results land in
+# dbo.IndexFragmentation with their scan time.
+FRAG_SCAN_WORKERS = int(os.getenv("INV_FRAG_SCAN_WORKERS", "1"))
+FRAG_SCAN_MIN_INTERVAL = int(os.getenv("INV_FRAG_SCAN_MIN_INTERVAL", "900"))
+FRAG_SCAN_LOCK_TIMEOUT_MS = int(os.getenv("INV_FRAG_SCAN_LOCK_TIMEOUT_MS", "5000"))
+
+FRAGMENTATION_DDL = """
+IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'IndexFragmentation' AND schema_id = SCHEMA_ID('dbo'))
+BEGIN
+    CREATE TABLE dbo.IndexFragmentation (
+        ServerName           SYSNAME       NOT NULL,
+        DatabaseName         SYSNAME       NOT NULL,
+        ObjectID             INT           NOT NULL,
+        IndexID              INT           NOT NULL,
+        FragmentationPercent DECIMAL(6,2)  NULL,
+        PageCount            BIGINT        NULL,
+        ScannedAt            DATETIME2(0)  NOT NULL,
+        CONSTRAINT PK_IndexFragmentation PRIMARY KEY (ServerName, DatabaseName, ObjectID, IndexID)
+    );
+END
+"""
+
+FRAGMENTATION_SCAN_SQL = f"""
+SET NOCOUNT ON;
+SET DEADLOCK_PRIORITY LOW;
+SET LOCK_TIMEOUT {FRAG_SCAN_LOCK_TIMEOUT_MS};
+
+SELECT ips.object_id, ips.index_id,
+       MAX(ips.avg_fragmentation_in_percent) AS fragmentation_percent,
+       SUM(ips.page_count)                   AS page_count
+FROM sys.dm_db_index_physical_stats(DB_ID(), ?, NULL, NULL, 'LIMITED') AS ips
+JOIN sys.objects AS o ON o.object_id = ips.object_id
+WHERE ips.index_id > 0
+  AND o.type = 'U'
+  AND o.is_ms_shipped = 0
+GROUP BY ips.object_id, ips.index_id;
+"""
+
+_frag_executor = ThreadPoolExecutor(max_workers=FRAG_SCAN_WORKERS, thread_name_prefix="frag-scan")
+_frag_lock = threading.Lock()
+_frag_state = {}   # (server, db, object_id|None) -> {"requested": monotonic, "future": Future}
+_frag_ddl_done = False
+
+
+def _ensure_fragmentation_table(inv_conn):
+    global _frag_ddl_done
+    if _frag_ddl_done:
+        return
+    cur = inv_conn.cursor()
+    cur.execute(FRAGMENTATION_DDL)
+    inv_conn.commit()
+    _frag_ddl_done = True
+
+
+def get_stored_fragmentation(server_name: str, db_name: str) -> dict:
+    """{(object_id, index_id): (fragmentation_percent, scanned_at)} from the last scans."""
+    conn = get_inventory_connection()
+    try:
+        _ensure_fragmentation_table(conn)
+        rows = conn.cursor().execute(
+            """
+            SELECT ObjectID, IndexID, FragmentationPercent, ScannedAt
+            FROM dbo.IndexFragmentation
+            WHERE ServerName = ? AND DatabaseName = ?;
+            """,
+            (server_name, db_name),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        (int(r.ObjectID), int(r.IndexID)): (
+            float(r.FragmentationPercent) if r.FragmentationPercent is not None else None,
+            r.ScannedAt,
+        )
+        for r in rows
+    }
+
+
+def _run_fragmentation_scan(server_name: str, db_name: str, object_id):
+    conn = get_target_connection(server_name, db_name)
+    try:
+        rows = conn.cursor().execute(FRAGMENTATION_SCAN_SQL, (object_id,)).fetchall()
+    finally:
+        conn.close()
+
+    scanned_at = datetime.now().replace(microsecond=0)
+    params = [
+        (
+            server_name,
+            db_name,
+            int(r.object_id),
+            int(r.index_id),
+            round(float(r.fragmentation_percent), 2) if r.fragmentation_percent is not None else None,
+            int(r.page_count or 0),
+            scanned_at,
+        )
+        for r in rows
+    ]
+
+    inv = get_inventory_connection()
+    try:
+        _ensure_fragmentation_table(inv)
+        cur = inv.cursor()
+        if object_id is None:
+            cur.execute(
+                "DELETE FROM dbo.IndexFragmentation WHERE ServerName = ? AND DatabaseName = ?;",
+                (server_name, db_name),
+            )
+        else:
+            cur.execute(
+                "DELETE FROM dbo.IndexFragmentation WHERE ServerName = ? AND DatabaseName = ? AND ObjectID = ?;",
+                (server_name, db_name, object_id),
+            )
+        if params:
+            cur.fast_executemany = True
+            cur.executemany(
+                """
+                INSERT INTO dbo.IndexFragmentation
+                    (ServerName, DatabaseName, ObjectID, IndexID, FragmentationPercent, PageCount, ScannedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+                """,
+                params,
+            )
+        inv.commit()
+    finally:
+        inv.close()
+    return len(params)
+
+
+def request_fragmentation_scan(server_name: str, db_name: str, object_id=None) -> dict:
+    """Queue a LIMITED fragmentation scan of one table (object_id) or the whole db.
+
+    Returns {"status": "queued" | "running" | "rate_limited", "retry_after": seconds?}.
+    """
+    key = (server_name.lower(), db_name.lower(), object_id)
+    now = time.monotonic()
+    with _frag_lock:
+        state = _frag_state.get(key)
+        if state is not None:
+            if not state["future"].done():
+                return {"status": "running"}
+            wait_left = FRAG_SCAN_MIN_INTERVAL - (now - state["requested"])
+            if wait_left > 0:
+                return {"status": "rate_limited", "retry_after": int(wait_left)}
+
+        future = _frag_executor.submit(_run_fragmentation_scan, server_name, db_name, object_id)
+        future.add_done_callback(_log_scan_failure)
+        _frag_state[key] = {"requested": now, "future": future}
+    return {"status": "queued"}
+
+
+def _log_scan_failure(future):
+    ex = future.exception()
+    if ex is not None:
+        print(f"[FRAG_SCAN] scan failed: {ex}")
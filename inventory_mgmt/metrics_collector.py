@@ -0,0 +1,408 @@
+# metrics_collector.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fleet_scanner import get_inventory_connection, get_probe_connection
+from .refresh_scheduler import RefreshScheduler
+
+# ---------- SERVER METRIC TIME SERIES ----------
+#
+# A background collector samples CPU, memory, waits and per-file IO latency
+# from every server in dbo.ServerList and folds each sample into
+# dbo.ServerMetricRollup at three grains (1 minute, 1 hour, 1 day) as running
+# sum / max / count. The server page reads one grain with one query and never
+# touches the target's DMVs.
+METRICS_INTERVAL = int(os.getenv("INV_METRICS_INTERVAL", "60"))       # seconds (0 = collector off)
+METRICS_WORKERS = int(os.getenv("INV_METRICS_WORKERS", "16"))
+METRICS_TOP_SERIES = int(os.getenv("INV_METRICS_TOP_SERIES", "5"))    # wait types / files kept per sample & chart
+
+# Retention per grain, in days.
+METRICS_RETENTION = {
+    "m": int(os.getenv("INV_METRICS_RETAIN_1M_DAYS", "2")),
+    "h": int(os.getenv("INV_METRICS_RETAIN_1H_DAYS", "45")),
+    "d": int(os.getenv("INV_METRICS_RETAIN_1D_DAYS", "730")),
+}
+METRICS_PURGE_EVERY = 3600   # seconds between retention passes
+
+METRICS_DDL = [
+    """
+    IF TYPE_ID(N'dbo.ServerMetricValueType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerMetricValueType AS TABLE (
+            ServerID    INT            NOT NULL,
+            Metric      VARCHAR(40)    NOT NULL,
+            Series      NVARCHAR(300)  NOT NULL,
+            Value       FLOAT          NOT NULL,
+            PRIMARY KEY (ServerID, Metric, Series)
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'ServerMetricRollup' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.ServerMetricRollup (
+            ServerID     INT            NOT NULL,
+            Grain        CHAR(1)        NOT NULL,   -- m / h / d
+            BucketStart  DATETIME2(0)   NOT NULL,
+            Metric       VARCHAR(40)    NOT NULL,
+            Series       NVARCHAR(300)  NOT NULL,   -- '' = whole server; wait type or db/file otherwise
+            ValueSum     FLOAT          NOT NULL,
+            ValueMax     FLOAT          NOT NULL,
+            Samples      INT            NOT NULL,
+            CONSTRAINT PK_ServerMetricRollup PRIMARY KEY (ServerID, Grain, BucketStart, Metric, Series)
+        );
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_RecordServerMetrics
+        @Rows dbo.ServerMetricValueType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        DECLARE @Now DATETIME2(0) = SYSDATETIME();
+
+        MERGE dbo.ServerMetricRollup AS tgt
+        USING (
+            SELECT r.ServerID, g.Grain, r.Metric, r.Series, r.Value,
+                   CASE g.Grain
+                        WHEN 'm' THEN DATEADD(MINUTE, DATEDIFF(MINUTE, '20000101', @Now), CONVERT(DATETIME2(0), '20000101'))
+                        WHEN 'h' THEN DATEADD(HOUR,   DATEDIFF(HOUR,   '20000101', @Now), CONVERT(DATETIME2(0), '20000101'))
+                        ELSE CONVERT(DATETIME2(0), CONVERT(DATE, @Now))
+                   END AS BucketStart
+            FROM @Rows AS r
+            CROSS JOIN (VALUES ('m'), ('h'), ('d')) AS g (Grain)
+        ) AS src
+              ON  tgt.ServerID    = src.ServerID
+              AND tgt.Grain       = src.Grain
+              AND tgt.BucketStart = src.BucketStart
+              AND tgt.Metric      = src.Metric
+              AND tgt.Series      = src.Series
+        WHEN MATCHED THEN
+            UPDATE SET
+                tgt.ValueSum = tgt.ValueSum + src.Value,
+                tgt.ValueMax = CASE WHEN src.Value > tgt.ValueMax THEN src.Value ELSE tgt.ValueMax END,
+                tgt.Samples  = tgt.Samples + 1
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (ServerID, Grain, BucketStart, Metric, Series, ValueSum, ValueMax, Samples)
+            VALUES (src.ServerID, src.Grain, src.BucketStart, src.Metric, src.Series, src.Value, src.Value, 1);
+    END
+    """,
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_metrics_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        cur = inv_conn.cursor()
+        for ddl in METRICS_DDL:
+            cur.execute(ddl)
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Per-server sample (one round-trip, four result sets)
+# ------------------------
+
+# Idle/background waits that say nothing about workload.
+_BENIGN_WAITS = (
+    "BROKER_EVENTHANDLER", "BROKER_RECEIVE_WAITFOR", "BROKER_TASK_STOP", "BROKER_TO_FLUSH",
+    "BROKER_TRANSMITTER", "CHECKPOINT_QUEUE", "CHKPT", "CLR_AUTO_EVENT", "CLR_MANUAL_EVENT",
+    "CLR_SEMAPHORE", "DBMIRROR_DBM_EVENT", "DBMIRROR_EVENTS_QUEUE", "DBMIRROR_WORKER_QUEUE",
+    "DBMIRRORING_CMD", "DIRTY_PAGE_POLL", "DISPATCHER_QUEUE_SEMAPHORE", "EXECSYNC", "FSAGENT",
+    "FT_IFTS_SCHEDULER_IDLE_WAIT", "FT_IFTSHC_MUTEX", "HADR_CLUSAPI_CALL",
+    "HADR_FILESTREAM_IOMGR_IOCOMPLETION", "HADR_LOGCAPTURE_WAIT", "HADR_NOTIFICATION_DEQUEUE",
+    "HADR_TIMER_TASK", "HADR_WORK_QUEUE", "KSOURCE_WAKEUP", "LAZYWRITER_SLEEP", "LOGMGR_QUEUE",
+    "MEMORY_ALLOCATION_EXT", "ONDEMAND_TASK_QUEUE", "PARALLEL_REDO_DRAIN_WORKER",
+    "PARALLEL_REDO_LOG_CACHE", "PARALLEL_REDO_TRAN_LIST", "PARALLEL_REDO_WORKER_SYNC",
+    "PARALLEL_REDO_WORKER_WAIT_WORK", "PREEMPTIVE_XE_GETTARGETSTATE", "PWAIT_ALL_COMPONENTS_INITIALIZED",
+    "PWAIT_DIRECTLOGCONSUMER_GETNEXT", "QDS_ASYNC_QUEUE", "QDS_CLEANUP_STALE_QUERIES_TASK_MAIN_LOOP_SLEEP",
+    "QDS_PERSIST_TASK_MAIN_LOOP_SLEEP", "QDS_SHUTDOWN_QUEUE", "REDO_THREAD_PENDING_WORK",
+    "REQUEST_FOR_DEADLOCK_SEARCH", "RESOURCE_QUEUE", "SERVER_IDLE_CHECK", "SLEEP_BPOOL_FLUSH",
+    "SLEEP_DBSTARTUP", "SLEEP_DCOMSTARTUP", "SLEEP_MASTERDBREADY", "SLEEP_MASTERMDREADY",
+    "SLEEP_MASTERUPGRADED", "SLEEP_MSDBSTARTUP", "SLEEP_SYSTEMTASK", "SLEEP_TASK", "SLEEP_TEMPDBSTARTUP",
+    "SNI_HTTP_ACCEPT", "SOS_WORK_DISPATCHER", "SP_SERVER_DIAGNOSTICS_SLEEP", "SQLTRACE_BUFFER_FLUSH",
+    "SQLTRACE_INCREMENTAL_FLUSH_SLEEP", "SQLTRACE_WAIT_ENTRIES", "UCS_SESSION_REGISTRATION",
+    "VDI_CLIENT_OTHER", "WAIT_FOR_RESULTS", "WAIT_XTP_CKPT_CLOSE", "WAIT_XTP_HOST_WAIT",
+    "WAIT_XTP_OFFLINE_CKPT_NEW_LOG", "WAIT_XTP_RECOVERY", "WAITFOR", "WAITFOR_TASKSHUTDOWN",
+    "XE_DISPATCHER_JOIN", "XE_DISPATCHER_WAIT", "XE_LIVE_TARGET_TVF", "XE_TIMER_EVENT",
+)
+
+SAMPLE_SQL = f"""
+SET NOCOUNT ON;
+
+-- CPU: newest scheduler-monitor record (written about once a minute)
+SELECT TOP (1)
+    rb.record.value('(./Record/SchedulerMonitorEvent/SystemHealth/ProcessUtilization)[1]', 'int') AS sql_cpu_pct,
+    rb.record.value('(./Record/SchedulerMonitorEvent/SystemHealth/SystemIdle)[1]', 'int')          AS idle_pct
+FROM (
+    SELECT [timestamp], CONVERT(XML, record) AS record
+    FROM sys.dm_os_ring_buffers
+    WHERE ring_buffer_type = N'RING_BUFFER_SCHEDULER_MONITOR'
+      AND record LIKE N'%<SystemHealth>%'
+) AS rb
+ORDER BY rb.[timestamp] DESC;
+
+SELECT
+    (SELECT physical_memory_in_use_kb FROM sys.dm_os_process_memory) / 1024.0 AS sql_memory_mb,
+    (SELECT available_physical_memory_kb FROM sys.dm_os_sys_memory) / 1024.0  AS available_memory_mb,
+    (SELECT TOP (1) cntr_value
+     FROM sys.dm_os_performance_counters
+     WHERE counter_name = N'Page life expectancy'
+       AND [object_name] LIKE N'%Buffer Manager%')                             AS page_life_expectancy;
+
+SELECT wait_type, wait_time_ms
+FROM sys.dm_os_wait_stats
+WHERE wait_time_ms > 0
+  AND wait_type NOT IN ({", ".join(f"N'{w}'" for w in _BENIGN_WAITS)});
+
+SELECT
+    DB_NAME(vfs.database_id) + N'/' + mf.name AS file_key,
+    vfs.num_of_reads, vfs.num_of_writes, vfs.io_stall_read_ms, vfs.io_stall_write_ms
+FROM sys.dm_io_virtual_file_stats(NULL, NULL) AS vfs
+JOIN sys.master_files AS mf
+  ON mf.database_id = vfs.database_id AND mf.file_id = vfs.file_id;
+"""
+
+# Cumulative counters from the previous sample, per server (waits / file IO
+# are only meaningful as deltas). Lost on restart: the first sample after
+# that only records the point-in-time metrics.
+_prev_lock = threading.Lock()
+_prev = {}   # server_id -> {"at": monotonic, "waits": {type: ms}, "files": {key: (r, w, stall_r, stall_w)}}
+
+
+def _top(items: dict, n: int) -> list:
+    return sorted(items.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+def sample_server(server_id: int, server_name: str) -> list[tuple]:
+    """(ServerID, Metric, Series, Value) rows for one server; [] when unreachable."""
+    try:
+        conn = get_probe_connection(server_name)
+        try:
+            cur = conn.cursor()
+            cur.execute(SAMPLE_SQL)
+            cpu = cur.fetchone()
+            cur.nextset()
+            mem = cur.fetchone()
+            cur.nextset()
+            waits = {r.wait_type: int(r.wait_time_ms) for r in cur.fetchall()}
+            cur.nextset()
+            files = {
+                r.file_key: (int(r.num_of_reads), int(r.num_of_writes), int(r.io_stall_read_ms), int(r.io_stall_write_ms))
+                for r in cur.fetchall()
+                if r.file_key
+            }
+        finally:
+            conn.close()
+    except Exception as ex:
+        print(f"[METRICS] {server_name}: {ex}")
+        return []
+
+    now = time.monotonic()
+    rows = []
+
+    def add(metric, value, series=""):
+        if value is not None:
+            rows.append((server_id, metric, series[:300], float(value)))
+
+    if cpu is not None and cpu.sql_cpu_pct is not None:
+        add("cpu_sql_pct", cpu.sql_cpu_pct)
+        if cpu.idle_pct is not None:
+            add("cpu_other_pct", max(0, 100 - cpu.idle_pct - cpu.sql_cpu_pct))
+    if mem is not None:
+        add("memory_sql_mb", mem.sql_memory_mb)
+        add("memory_available_mb", mem.available_memory_mb)
+        add("page_life_expectancy", mem.page_life_expectancy)
+
+    with _prev_lock:
+        prev = _prev.get(server_id)
+        _prev[server_id] = {"at": now, "waits": waits, "files": files}
+
+    if prev is not None and now > prev["at"]:
+        elapsed = now - prev["at"]
+
+        # Wait time accrued per wall-clock second; a restart (counters going
+        # backwards) just skips the interval.
+        wait_deltas = {}
+        for wait_type, ms in waits.items():
+            delta = ms - prev["waits"].get(wait_type, 0)
+            if delta > 0:
+                wait_deltas[wait_type] = delta
+        if all(ms >= prev["waits"].get(t, 0) for t, ms in waits.items()):
+            add("wait_ms_per_sec", sum(wait_deltas.values()) / elapsed)
+            for wait_type, delta in _top(wait_deltas, METRICS_TOP_SERIES):
+                add("wait_ms_per_sec", delta / elapsed, wait_type)
+
+        # Average stall per IO over the interval, server-wide and per file.
+        totals = [0, 0, 0, 0]
+        read_latency, write_latency = {}, {}
+        for key, cur_vals in files.items():
+            old = prev["files"].get(key)
+            if old is None:
+                continue
+            d = [c - o for c, o in zip(cur_vals, old)]
+            if any(x < 0 for x in d):
+                continue
+            totals = [t + x for t, x in zip(totals, d)]
+            if d[0] > 0:
+                read_latency[key] = d[2] / d[0]
+            if d[1] > 0:
+                write_latency[key] = d[3] / d[1]
+        if totals[0] > 0:
+            add("io_read_latency_ms", totals[2] / totals[0])
+        if totals[1] > 0:
+            add("io_write_latency_ms", totals[3] / totals[1])
+        for key, value in _top(read_latency, METRICS_TOP_SERIES):
+            add("io_read_latency_ms", value, key)
+        for key, value in _top(write_latency, METRICS_TOP_SERIES):
+            add("io_write_latency_ms", value, key)
+
+    return rows
+
+
+# ------------------------
+# Fleet collection
+# ------------------------
+
+_last_purge = 0.0
+
+
+def _purge(cur):
+    global _last_purge
+    if time.monotonic() - _last_purge < METRICS_PURGE_EVERY:
+        return
+    for grain, days in METRICS_RETENTION.items():
+        cur.execute(
+            "DELETE FROM dbo.ServerMetricRollup WHERE Grain = ? AND BucketStart < DATEADD(DAY, -?, SYSDATETIME());",
+            (grain, days),
+        )
+    _last_purge = time.monotonic()
+
+
+def collect_fleet_metrics(max_workers: int = METRICS_WORKERS) -> dict:
+    """Sample every server in dbo.ServerList and record one rollup MERGE for all of them.
+
+    Returns a summary shaped like scan_fleet's: {servers, online, offline, elapsed, rows}.
+    """
+    t0 = time.monotonic()
+
+    inv_conn = get_inventory_connection()
+    try:
+        ensure_metrics_objects(inv_conn)
+        servers = inv_conn.cursor().execute(
+            "SELECT ID, ServerName FROM dbo.ServerList ORDER BY ServerName;"
+        ).fetchall()
+    finally:
+        inv_conn.close()
+
+    per_server = []
+    if servers:
+        workers = max(1, min(max_workers, len(servers)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metrics") as pool:
+            per_server = list(pool.map(lambda s: sample_server(s.ID, str(s.ServerName)), servers))
+
+    rows = [row for server_rows in per_server for row in server_rows]
+    inv_conn = get_inventory_connection()
+    try:
+        cur = inv_conn.cursor()
+        if rows:
+            cur.execute("{CALL dbo.usp_RecordServerMetrics (?)}", (rows,))
+        _purge(cur)
+        inv_conn.commit()
+    finally:
+        inv_conn.close()
+
+    online = sum(1 for r in per_server if r)
+    return {
+        "servers": len(per_server),
+        "online": online,
+        "offline": len(per_server) - online,
+        "elapsed": round(time.monotonic() - t0, 3),
+        "rows": len(rows),
+    }
+
+
+collector = RefreshScheduler(refresh_fn=collect_fleet_metrics, interval=METRICS_INTERVAL, name="metrics-collector")
+
+
+# ------------------------
+# Read side (server page)
+# ------------------------
+
+# (label, hours of history, grain)
+METRIC_RANGES = {
+    "1h": (1, "m"),
+    "6h": (6, "m"),
+    "24h": (24, "h"),
+    "7d": (24 * 7, "h"),
+    "30d": (24 * 30, "h"),
+    "1y": (24 * 365, "d"),
+}
+
+
+def get_server_metric_series(server_id: int, range_key: str = "24h") -> dict:
+    """Chart-ready series for one server from a single rollup read.
+
+    {"range", "grain", "labels": [iso...], "metrics": {metric: {series: [avg|None...]}},
+     "latest": {metric: last whole-server value}}. Per-wait/per-file series are
+    limited to the METRICS_TOP_SERIES heaviest over the range.
+    """
+    if range_key not in METRIC_RANGES:
+        range_key = "24h"
+    hours, grain = METRIC_RANGES[range_key]
+
+    conn = get_inventory_connection()
+    try:
+        ensure_metrics_objects(conn)
+        rows = conn.cursor().execute(
+            """
+            SELECT BucketStart, Metric, Series, ValueSum / NULLIF(Samples, 0) AS value_avg
+            FROM dbo.ServerMetricRollup
+            WHERE ServerID = ?
+              AND Grain = ?
+              AND BucketStart >= DATEADD(HOUR, -?, SYSDATETIME())
+            ORDER BY BucketStart;
+            """,
+            (server_id, grain, hours),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    buckets = sorted({r.BucketStart for r in rows})
+    position = {b: i for i, b in enumerate(buckets)}
+
+    metrics = {}
+    weight = {}   # (metric, series) -> sum of averages, to rank per-wait/per-file series
+    latest = {}
+    for r in rows:
+        value = float(r.value_avg) if r.value_avg is not None else None
+        values = metrics.setdefault(r.Metric, {}).setdefault(r.Series, [None] * len(buckets))
+        values[position[r.BucketStart]] = value
+        if r.Series:
+            weight[(r.Metric, r.Series)] = weight.get((r.Metric, r.Series), 0.0) + (value or 0.0)
+        elif value is not None:
+            latest[r.Metric] = value   # rows are in bucket order
+
+    for metric, series in metrics.items():
+        named = sorted((s for s in series if s), key=lambda s: weight.get((metric, s), 0.0), reverse=True)
+        for s in named[METRICS_TOP_SERIES:]:
+            del series[s]
+
+    return {
+        "range": range_key,
+        "grain": grain,
+        "labels": [b.isoformat() for b in buckets],
+        "metrics": metrics,
+        "latest": latest,
+    }
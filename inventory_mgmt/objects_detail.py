@@ -78,6 +78,14 @@ def _split_full_name(full_name: str) -> Tuple[str, str]:
     return clean(schema), clean(obj)
 
 
+_TYPE_CODES: Dict[str, List[str]] = {
+    "TABLE": ["U"],
+    "VIEW": ["V"],
+    "PROCEDURE": ["P", "PC"],
+    "FUNCTION": ["FN", "IF", "TF", "FS", "FT"],
+}
+
+
 def _map_sql_type_to_logical(o_type: str) -> Optional[str]:
     """Map sys.objects.type code to our logical types."""
     if o_type == "U":
@@ -98,17 +106,7 @@ def _get_basic_metadata(cursor, schema_name: str, object_name: str, obj_kind: st
     """
     Get base row from sys.objects + sys.schemas for the given name and logical type.
     """
-    type_codes: List[str]
-    if obj_kind == "TABLE":
-        type_codes = ["U"]
-    elif obj_kind == "VIEW":
-        type_codes = ["V"]
-    elif obj_kind == "PROCEDURE":
-        type_codes = ["P", "PC"]
-    elif obj_kind == "FUNCTION":
-        type_codes = ["FN", "IF", "TF", "FS", "FT"]
-    else:
-        type_codes = ["U"]
+    type_codes = _TYPE_CODES.get(obj_kind, ["U"])
 
     sql = """
     SELECT TOP (1)
@@ -177,7 +175,8 @@ def _get_table_space_basic(cursor, full_name: str) -> Dict[str, Any]:
 def _get_table_indexes(cursor, full_name: str) -> List[Dict[str, Any]]:
     """
     Per-index details: name, type, PK, unique, key/included columns,
-    fragmentation %, used/reserved MB.
+    used/reserved MB. Fragmentation is not read here (it scans pages); it
+    comes from the stored scans in index_cache.
     """
     sql = """
     DECLARE @obj_id int = OBJECT_ID(?);
@@ -214,6 +213,7 @@ def _get_table_indexes(cursor, full_name: str) -> List[Dict[str, Any]]:
                 FOR XML PATH(''), TYPE
             ).value('.', 'nvarchar(max)'), 1, 2, '')
         FROM sys.index_columns ic
+        WHERE ic.object_id = @obj_id
         GROUP BY ic.object_id, ic.index_id
     )
     SELECT
@@ -224,19 +224,15 @@ def _get_table_indexes(cursor, full_name: str) -> List[Dict[str, Any]]:
         i.is_unique,
         ISNULL(c.key_cols, '') AS key_columns,
         ISNULL(c.inc_cols, '') AS included_columns,
-        ips.avg_fragmentation_in_percent,
+        CAST(NULL AS FLOAT) AS avg_fragmentation_in_percent,
         ISNULL(s.used_mb, 0.0)     AS used_mb,
         ISNULL(s.reserved_mb, 0.0) AS reserved_mb
     FROM sys.indexes i
     LEFT JOIN idx_space s
         ON s.index_id = i.index_id
-       AND OBJECT_ID = @obj_id
     LEFT JOIN idx_cols c
         ON c.object_id = i.object_id
        AND c.index_id  = i.index_id
-    LEFT JOIN sys.dm_db_index_physical_stats(DB_ID(), @obj_id, NULL, NULL, 'LIMITED') ips
-        ON ips.object_id = i.object_id
-       AND ips.index_id  = i.index_id
     WHERE i.object_id = @obj_id
       AND i.index_id > 0
       AND i.is_hypothetical = 0
@@ -326,6 +322,20 @@ def _get_table_partition_info(cursor, full_name: str) -> Dict[str, Any]:
 
 
 
+def _fragmentation_summary(indexes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Worst stored fragmentation across a table's indexes and when it was scanned."""
+    scanned = [i for i in indexes if i.get("fragmentation_percent") is not None]
+    if not scanned:
+        return {"max_fragmentation_percent": None, "fragmentation_scanned_at": None}
+    return {
+        "max_fragmentation_percent": max(i["fragmentation_percent"] for i in scanned),
+        "fragmentation_scanned_at": min(
+            (i["fragmentation_scanned_at"] for i in scanned if i.get("fragmentation_scanned_at")),
+            default=None,
+        ),
+    }
+
+
 # ------------- PROCEDURE helpers -----------------
 
 
@@ -459,6 +469,12 @@ def _get_procedure_exec_history(cursor, full_name: str) -> List[Dict[str, Any]]:
     if not row:
         return []
 
+    # Return as a list so template can loop
+    return [_exec_history_from_row(row)]
+
+
+def _exec_history_from_row(row) -> Dict[str, Any]:
+    """One dm_exec_procedure_stats row -> exec_history entry."""
     exec_count = int(row.execution_count or 0)
 
     def micros_to_ms(val):
@@ -480,7 +496,7 @@ def _get_procedure_exec_history(cursor, full_name: str) -> List[Dict[str, Any]]:
         (row.total_logical_reads or 0) / exec_count if exec_count else None
     )
 
-    history_row = {
+    return {
         "last_execution_time": row.last_execution_time,
         "execution_count": exec_count,
         "avg_duration_ms": avg_duration_ms,
@@ -491,9 +507,6 @@ def _get_procedure_exec_history(cursor, full_name: str) -> List[Dict[str, Any]]:
         "last_logical_reads": int(row.last_logical_reads or 0),
     }
 
-    # Return as a list so template can loop
-    return [history_row]
-
 
 
 def _parse_exec_plan_xml(plan_xml: str) -> List[Dict[str, Any]]:
@@ -642,6 +655,28 @@ def _get_procedure_exec_stats_and_plan(cursor, full_name: str) -> Dict[str, Any]
     if not s:
         return result  # no stats in cache
 
+    result["has_data"] = True
+    result["stats"] = _exec_stats_from_row(s)
+
+    # 2) Get plan XML from dm_exec_query_plan using plan_handle
+    plan_xml = None
+    try:
+        cursor.execute(
+            "SELECT query_plan FROM sys.dm_exec_query_plan(?);",
+            (s.plan_handle,),
+        )
+        p = cursor.fetchone()
+        if p and getattr(p, "query_plan", None):
+            plan_xml = p.query_plan
+    except pyodbc.Error:
+        plan_xml = None
+
+    result["plan_xml"] = plan_xml
+    return result
+
+
+def _exec_stats_from_row(s) -> Dict[str, Any]:
+    """One dm_exec_procedure_stats row -> exec_stats dict."""
     exec_count = int(s.execution_count or 0)
 
     def micros_to_ms(val):
@@ -658,7 +693,7 @@ def _get_procedure_exec_stats_and_plan(cursor, full_name: str) -> Dict[str, Any]
         total_cpu_ms / exec_count if exec_count and total_cpu_ms is not None else None
     )
 
-    stats = {
+    return {
         "execution_count": exec_count,
         "last_execution_time": s.last_execution_time,
         "total_elapsed_ms": total_elapsed_ms,
@@ -673,25 +708,6 @@ def _get_procedure_exec_stats_and_plan(cursor, full_name: str) -> Dict[str, Any]
         "last_logical_writes": int(s.last_logical_writes or 0),
     }
 
-    result["has_data"] = True
-    result["stats"] = stats
-
-    # 2) Get plan XML from dm_exec_query_plan using plan_handle
-    plan_xml = None
-    try:
-        cursor.execute(
-            "SELECT query_plan FROM sys.dm_exec_query_plan(?);",
-            (s.plan_handle,),
-        )
-        p = cursor.fetchone()
-        if p and getattr(p, "query_plan", None):
-            plan_xml = p.query_plan
-    except pyodbc.Error:
-        plan_xml = None
-
-    result["plan_xml"] = plan_xml
-    return result
-
 
 
 # ------------- VIEW helpers -----------------
@@ -747,22 +763,26 @@ def _get_function_extra(cursor, full_name: str) -> Dict[str, Any]:
 
     # Fallback: rough parse from definition
     defn = _get_object_definition(cursor, full_name)
-    return_type = None
-    if defn:
-        text = defn.lower()
-        # crude heuristic: look for "returns @something TABLE" or "RETURNS datatype"
-        if "returns table" in text:
-            return_type = "TABLE"
-        elif "returns" in text:
-            # this is intentionally simple; real parsing is ugly
-            return_type = "SCALAR"
 
     return {
         "function_type": function_type,
-        "return_data_type": return_type,
+        "return_data_type": _function_return_type_from_definition(defn),
     }
 
 
+def _function_return_type_from_definition(defn: Optional[str]) -> Optional[str]:
+    if not defn:
+        return None
+    text = defn.lower()
+    # crude heuristic: look for "returns @something TABLE" or "RETURNS datatype"
+    if "returns table" in text:
+        return "TABLE"
+    if "returns" in text:
+        # this is intentionally simple; real parsing is ugly
+        return "SCALAR"
+    return None
+
+
 # ------------- dependency helpers -----------------
 
 def _map_type_desc_to_logical(type_desc: str) -> str:
@@ -853,6 +873,7 @@ def get_object_metadata(
     database_name: str,
     full_name: str,
     obj_type: str,
+    index_lookup=None,
 ) -> Optional[Dict[str, Any]]:
     """
     Main function used by your Flask layer.
@@ -861,6 +882,8 @@ def get_object_metadata(
     database_name : name of the DB containing the object
     full_name     : "schema.object" (schema optional, defaults to dbo)
     obj_type      : "table", "view", "procedure", "function" (any case)
+    index_lookup  : optional object_id -> [index dict] (index_cache.get_index_lookup);
+                    used instead of querying the table's indexes
     """
     logical_type = _normalize_object_type(obj_type)
     schema_name, object_name = _split_full_name(full_name)
@@ -896,9 +919,13 @@ def get_object_metadata(
         extras["used_mb"] = base_space["used_mb"]
 
         # 2) per-index info
-        indexes = _get_table_indexes(cursor, meta["full_name"])
+        if index_lookup is not None:
+            indexes = index_lookup(base["object_id"])
+        else:
+            indexes = _get_table_indexes(cursor, meta["full_name"])
         extras["indexes"] = indexes
         extras["index_count"] = len(indexes)
+        extras.update(_fragmentation_summary(indexes))
 
         # 3) partition info
         pinfo = _get_table_partition_info(cursor, meta["full_name"])
@@ -966,3 +993,445 @@ def get_object_metadata(
 
 
     return meta
+
+
+# ------------- batch entry point -----------------
+#
+# get_objects_metadata() resolves a whole selection with one query per facet:
+# names go into #obj_sel once, object_ids are resolved there, and every facet
+# (space, indexes, partitions, definitions, parameters, DMV stats, plans,
+# dependencies) joins #obj_sel instead of being asked object by object.
+
+_SEL_CHUNK = 500  # rows per INSERT ... VALUES (3 params each, < 2100)
+
+_SEL_SETUP_SQL = """
+IF OBJECT_ID('tempdb..#obj_sel') IS NOT NULL DROP TABLE #obj_sel;
+CREATE TABLE #obj_sel (
+    req_idx     INT     NOT NULL PRIMARY KEY,
+    schema_name SYSNAME NOT NULL,
+    object_name SYSNAME NOT NULL,
+    object_id   INT     NULL
+);
+"""
+
+_BATCH_BASIC_SQL = """
+SELECT sel.req_idx, s.name AS schema_name, o.name AS object_name,
+       o.object_id, o.type, o.type_desc, o.create_date, o.modify_date
+FROM #obj_sel AS sel
+JOIN sys.objects AS o ON o.object_id = sel.object_id
+JOIN sys.schemas AS s ON s.schema_id = o.schema_id;
+"""
+
+_BATCH_TABLE_SPACE_SQL = """
+SELECT ps.object_id,
+    SUM(CASE WHEN ps.index_id IN (0,1) THEN ps.row_count ELSE 0 END) AS row_count,
+    SUM(ps.reserved_page_count) * 8.0 / 1024.0 AS reserved_mb,
+    SUM(ps.used_page_count)     * 8.0 / 1024.0 AS used_mb
+FROM sys.dm_db_partition_stats AS ps
+JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = ps.object_id
+GROUP BY ps.object_id;
+"""
+
+_BATCH_TABLE_INDEXES_SQL = """
+WITH sel AS (
+    SELECT DISTINCT object_id FROM #obj_sel WHERE object_id IS NOT NULL
+),
+idx_space AS (
+    SELECT ps.object_id, ps.index_id,
+        SUM(ps.used_page_count)     * 8.0 / 1024.0 AS used_mb,
+        SUM(ps.reserved_page_count) * 8.0 / 1024.0 AS reserved_mb
+    FROM sys.dm_db_partition_stats AS ps
+    JOIN sel ON sel.object_id = ps.object_id
+    GROUP BY ps.object_id, ps.index_id
+),
+idx_cols AS (
+    SELECT
+        ic.object_id,
+        ic.index_id,
+        key_cols = STUFF((
+            SELECT ', ' + QUOTENAME(COL_NAME(ic2.object_id, ic2.column_id))
+            FROM sys.index_columns ic2
+            WHERE ic2.object_id = ic.object_id
+              AND ic2.index_id  = ic.index_id
+              AND ic2.is_included_column = 0
+            ORDER BY ic2.key_ordinal
+            FOR XML PATH(''), TYPE
+        ).value('.', 'nvarchar(max)'), 1, 2, ''),
+        inc_cols = STUFF((
+            SELECT ', ' + QUOTENAME(COL_NAME(ic3.object_id, ic3.column_id))
+            FROM sys.index_columns ic3
+            WHERE ic3.object_id = ic.object_id
+              AND ic3.index_id  = ic.index_id
+              AND ic3.is_included_column = 1
+            ORDER BY ic3.index_column_id
+            FOR XML PATH(''), TYPE
+        ).value('.', 'nvarchar(max)'), 1, 2, '')
+    FROM sys.index_columns ic
+    JOIN sel ON sel.object_id = ic.object_id
+    GROUP BY ic.object_id, ic.index_id
+)
+SELECT
+    i.object_id,
+    i.name,
+    i.index_id,
+    i.type_desc,
+    i.is_primary_key,
+    i.is_unique,
+    ISNULL(c.key_cols, '') AS key_columns,
+    ISNULL(c.inc_cols, '') AS included_columns,
+    CAST(NULL AS FLOAT) AS avg_fragmentation_in_percent,
+    ISNULL(s.used_mb, 0.0)     AS used_mb,
+    ISNULL(s.reserved_mb, 0.0) AS reserved_mb
+FROM sel
+JOIN sys.indexes i
+    ON i.object_id = sel.object_id
+LEFT JOIN idx_space s
+    ON s.object_id = i.object_id
+   AND s.index_id  = i.index_id
+LEFT JOIN idx_cols c
+    ON c.object_id = i.object_id
+   AND c.index_id  = i.index_id
+WHERE i.index_id > 0
+  AND i.is_hypothetical = 0
+ORDER BY i.object_id, i.index_id;
+"""
+
+_BATCH_TABLE_PARTITIONS_SQL = """
+WITH p AS (
+    SELECT
+        pa.object_id,
+        pa.index_id,
+        COUNT(DISTINCT pa.partition_number) AS partition_count
+    FROM sys.partitions AS pa
+    JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = pa.object_id
+    WHERE pa.index_id IN (0,1)
+    GROUP BY pa.object_id, pa.index_id
+)
+SELECT
+    p.object_id,
+    p.partition_count,
+    CASE WHEN p.partition_count > 1 THEN 1 ELSE 0 END AS is_partitioned,
+    ps.name AS partition_scheme,
+    pf.name AS partition_function,
+    c.name  AS partition_key
+FROM p
+JOIN sys.indexes i
+    ON i.object_id = p.object_id
+   AND i.index_id  = p.index_id
+LEFT JOIN sys.partition_schemes ps
+    ON ps.data_space_id = i.data_space_id
+LEFT JOIN sys.partition_functions pf
+    ON pf.function_id = ps.function_id
+LEFT JOIN sys.index_columns ic
+    ON ic.object_id = i.object_id
+   AND ic.index_id  = i.index_id
+   AND ic.partition_ordinal = 1
+LEFT JOIN sys.columns c
+    ON c.object_id = ic.object_id
+   AND c.column_id = ic.column_id;
+"""
+
+_BATCH_DEFINITIONS_SQL = """
+SELECT sm.object_id, sm.definition
+FROM sys.sql_modules AS sm
+JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = sm.object_id;
+"""
+
+_BATCH_PARAMETERS_SQL = """
+SELECT
+    p.object_id,
+    p.name,
+    TYPE_NAME(p.user_type_id) AS data_type,
+    p.is_output,
+    p.max_length,
+    p.precision,
+    p.scale
+FROM sys.parameters p
+JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = p.object_id
+ORDER BY p.object_id, p.parameter_id;
+"""
+
+# Latest cached stats row per procedure (same row the per-object path reads).
+_BATCH_PROC_STATS_CTE = """
+WITH ranked AS (
+    SELECT ps.*,
+           ROW_NUMBER() OVER (PARTITION BY ps.object_id ORDER BY ps.last_execution_time DESC) AS rn
+    FROM sys.dm_exec_procedure_stats AS ps
+    JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = ps.object_id
+    WHERE ps.database_id = DB_ID()
+)
+"""
+
+_BATCH_PROC_STATS_SQL = _BATCH_PROC_STATS_CTE + """
+SELECT
+    object_id,
+    execution_count,
+    cast(last_execution_time as datetime2(0)) as last_execution_time,
+    total_elapsed_time,
+    total_worker_time,
+    total_logical_reads,
+    total_logical_writes,
+    last_elapsed_time,
+    last_worker_time,
+    last_logical_reads,
+    last_logical_writes,
+    plan_handle
+FROM ranked
+WHERE rn = 1;
+"""
+
+_BATCH_PROC_PLANS_SQL = _BATCH_PROC_STATS_CTE + """
+SELECT r.object_id, qp.query_plan
+FROM ranked AS r
+CROSS APPLY sys.dm_exec_query_plan(r.plan_handle) AS qp
+WHERE r.rn = 1;
+"""
+
+_BATCH_REFERENCED_SQL = """
+SELECT DISTINCT
+    d.referencing_id AS object_id,
+    s2.name AS schema_name,
+    o2.name AS object_name,
+    o2.type_desc
+FROM sys.sql_expression_dependencies AS d
+JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = d.referencing_id
+INNER JOIN sys.objects AS o2
+    ON d.referenced_id = o2.object_id
+INNER JOIN sys.schemas AS s2
+    ON o2.schema_id = s2.schema_id
+WHERE d.referenced_id IS NOT NULL;
+"""
+
+_BATCH_REFERENCING_SQL = """
+SELECT DISTINCT
+    d.referenced_id AS object_id,
+    s2.name AS schema_name,
+    o2.name AS object_name,
+    o2.type_desc
+FROM sys.sql_expression_dependencies AS d
+JOIN (SELECT DISTINCT object_id FROM #obj_sel) AS sel ON sel.object_id = d.referenced_id
+INNER JOIN sys.objects AS o2
+    ON d.referencing_id = o2.object_id
+INNER JOIN sys.schemas AS s2
+    ON o2.schema_id = s2.schema_id;
+"""
+
+
+def _load_selection(cursor, names: List[Tuple[str, str]], type_codes: List[str]) -> None:
+    """Fill #obj_sel with (schema, object) pairs and resolve their object_ids."""
+    cursor.execute(_SEL_SETUP_SQL)
+    for start in range(0, len(names), _SEL_CHUNK):
+        chunk = names[start:start + _SEL_CHUNK]
+        values = ",".join("(?, ?, ?)" for _ in chunk)
+        params: List[Any] = []
+        for offset, (schema_name, object_name) in enumerate(chunk):
+            params.extend([start + offset, schema_name, object_name])
+        cursor.execute(f"INSERT INTO #obj_sel (req_idx, schema_name, object_name) VALUES {values};", params)
+
+    cursor.execute(
+        """
+        UPDATE sel
+        SET object_id = o.object_id
+        FROM #obj_sel AS sel
+        JOIN sys.schemas AS s ON s.name = sel.schema_name
+        JOIN sys.objects AS o ON o.schema_id = s.schema_id AND o.name = sel.object_name
+        WHERE o.type IN ({});
+        """.format(",".join("?" for _ in type_codes)),
+        type_codes,
+    )
+
+
+def _rows_by_object(cursor, sql: str) -> Dict[int, List[Any]]:
+    cursor.execute(sql)
+    grouped: Dict[int, List[Any]] = {}
+    for r in cursor.fetchall() or []:
+        grouped.setdefault(int(r.object_id), []).append(r)
+    return grouped
+
+
+def _dependency_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "full_name": f"{r.schema_name}.{r.object_name}",
+            "object_type": _map_type_desc_to_logical(r.type_desc),   # used by template for ?type=
+            "type_desc": r.type_desc,
+        }
+        for r in rows
+    ]
+
+
+def _index_row(r) -> Dict[str, Any]:
+    return {
+        "name": r.name,
+        "type_desc": r.type_desc,
+        "is_primary_key": bool(r.is_primary_key),
+        "is_unique": bool(r.is_unique),
+        "key_columns": (r.key_columns or "").split(", ") if r.key_columns else [],
+        "included_columns": (r.included_columns or "").split(", ") if r.included_columns else [],
+        "fragmentation_percent": float(r.avg_fragmentation_in_percent)
+        if r.avg_fragmentation_in_percent is not None
+        else None,
+        "used_mb": float(r.used_mb or 0.0),
+        "reserved_mb": float(r.reserved_mb or 0.0),
+    }
+
+
+def get_objects_metadata(
+    conn: pyodbc.Connection,
+    database_name: str,
+    full_names: List[str],
+    obj_type: str,
+    with_dependencies: bool = True,
+    index_lookup=None,
+    plan_resolver=None,
+    with_plans: bool = True,
+) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Batch version of get_object_metadata() for a multi-object selection.
+
+    Returns { requested full_name: meta dict (same shape) or None if not found }.
+    Round-trips depend on the number of facets, not the number of objects.
+    with_dependencies=False leaves referenced/referencing empty (callers that
+    read them from dependency_graph); index_lookup as in get_object_metadata().
+    plan_resolver(cursor, {object_id: plan_handle}) -> {object_id: {plan_xml, analysis}}
+    (plan_store.make_plan_resolver) replaces the DMV plan fetch + re-parse;
+    with_plans=False skips plans entirely (exec_plan_* left empty).
+    """
+    logical_type = _normalize_object_type(obj_type)
+    requested = list(dict.fromkeys(n for n in full_names if n))
+    result: Dict[str, Optional[Dict[str, Any]]] = {n: None for n in requested}
+    if not requested:
+        return result
+
+    cursor = conn.cursor()
+    # Make sure we're in the right DB
+    cursor.execute(f"USE [{database_name}];")
+
+    _load_selection(cursor, [_split_full_name(n) for n in requested], _TYPE_CODES.get(logical_type, ["U"]))
+
+    cursor.execute(_BATCH_BASIC_SQL)
+    bases = {int(r.req_idx): r for r in cursor.fetchall() or []}
+    if not bases:
+        cursor.execute("DROP TABLE #obj_sel;")
+        return result
+
+    # ---- type-specific facets (one query each) ----
+    extras_by_id: Dict[int, Dict[str, Any]] = {int(b.object_id): {} for b in bases.values()}
+
+    if logical_type == "TABLE":
+        space = {oid: rows[0] for oid, rows in _rows_by_object(cursor, _BATCH_TABLE_SPACE_SQL).items()}
+        indexes = {} if index_lookup is not None else _rows_by_object(cursor, _BATCH_TABLE_INDEXES_SQL)
+        partitions = {oid: rows[0] for oid, rows in _rows_by_object(cursor, _BATCH_TABLE_PARTITIONS_SQL).items()}
+
+        for oid, extras in extras_by_id.items():
+            sp = space.get(oid)
+            extras["row_count"] = (sp.row_count or 0) if sp else 0
+            extras["reserved_mb"] = float(sp.reserved_mb or 0.0) if sp else 0.0
+            extras["used_mb"] = float(sp.used_mb or 0.0) if sp else 0.0
+
+            if index_lookup is not None:
+                idx_list = index_lookup(oid)
+            else:
+                idx_list = [_index_row(r) for r in indexes.get(oid, [])]
+            extras["indexes"] = idx_list
+            extras["index_count"] = len(idx_list)
+            extras.update(_fragmentation_summary(idx_list))
+
+            pr = partitions.get(oid)
+            extras["is_partitioned"] = bool(pr.is_partitioned) if pr else False
+            extras["partition_scheme"] = pr.partition_scheme if pr else None
+            extras["partition_function"] = pr.partition_function if pr else None
+            extras["partition_key"] = pr.partition_key if pr else None
+            extras["partition_count"] = int(pr.partition_count or 0) if pr else False
+
+    elif logical_type in ("PROCEDURE", "VIEW", "FUNCTION"):
+        definitions = {oid: rows[0].definition for oid, rows in _rows_by_object(cursor, _BATCH_DEFINITIONS_SQL).items()}
+
+        if logical_type == "PROCEDURE":
+            params = _rows_by_object(cursor, _BATCH_PARAMETERS_SQL)
+            stats = {oid: rows[0] for oid, rows in _rows_by_object(cursor, _BATCH_PROC_STATS_SQL).items()}
+            plans: Dict[int, Dict[str, Any]] = {}
+            try:
+                if not with_plans:
+                    plans = {}
+                elif plan_resolver is not None:
+                    plans = plan_resolver(cursor, {oid: r.plan_handle for oid, r in stats.items()})
+                else:
+                    plans = {
+                        oid: {"plan_xml": rows[0].query_plan, "analysis": None}
+                        for oid, rows in _rows_by_object(cursor, _BATCH_PROC_PLANS_SQL).items()
+                    }
+            except pyodbc.Error:
+                plans = {}
+
+            for oid, extras in extras_by_id.items():
+                extras.update(_get_procedure_flags_from_definition(definitions.get(oid)))
+                extras["parameters"] = [
+                    {
+                        "name": r.name,
+                        "data_type": r.data_type,
+                        "is_output": bool(r.is_output),
+                        "max_length": r.max_length,
+                        "precision": r.precision,
+                        "scale": r.scale,
+                    }
+                    for r in params.get(oid, [])
+                ]
+                srow = stats.get(oid)
+                extras["exec_history"] = [_exec_history_from_row(srow)] if srow else []
+                extras["exec_stats"] = _exec_stats_from_row(srow) if srow else None
+                extras["execution_count"] = extras["exec_stats"]["execution_count"] if srow else None
+                extras["last_execution_time"] = extras["exec_stats"]["last_execution_time"] if srow else None
+
+                plan = plans.get(oid) if srow else None
+                plan_xml = plan["plan_xml"] if plan else None
+                analysis = plan["analysis"] if plan else None
+                extras["exec_plan_xml"] = plan_xml
+                extras["exec_plan_analysis"] = analysis
+                if analysis is not None:
+                    extras["exec_plan_ops"] = analysis["operators"]
+                else:
+                    extras["exec_plan_ops"] = _parse_exec_plan_xml(plan_xml) if plan_xml else []
+
+        elif logical_type == "VIEW":
+            for oid, extras in extras_by_id.items():
+                extras.update(_get_view_flags_from_definition(definitions.get(oid)))
+
+        else:
+            for b in bases.values():
+                extras_by_id[int(b.object_id)].update(
+                    {
+                        "function_type": b.type_desc,
+                        "return_data_type": _function_return_type_from_definition(definitions.get(int(b.object_id))),
+                    }
+                )
+
+    # ---- dependencies (both directions) ----
+    referenced: Dict[int, List[Any]] = {}
+    referencing: Dict[int, List[Any]] = {}
+    if with_dependencies:
+        referenced = _rows_by_object(cursor, _BATCH_REFERENCED_SQL)
+        referencing = _rows_by_object(cursor, _BATCH_REFERENCING_SQL)
+
+    cursor.execute("DROP TABLE #obj_sel;")
+
+    for idx, name in enumerate(requested):
+        b = bases.get(idx)
+        if b is None:
+            continue
+        oid = int(b.object_id)
+        result[name] = {
+            "schema_name": b.schema_name,
+            "object_name": b.object_name,
+            "full_name": f"{b.schema_name}.{b.object_name}",
+            "object_id": oid,
+            "type": logical_type,
+            "type_desc": b.type_desc,
+            "create_date": b.create_date,
+            "modify_date": b.modify_date,
+            "extras": dict(extras_by_id[oid]),
+            "referenced": _dependency_rows(referenced.get(oid, [])),
+            "referencing": _dependency_rows(referencing.get(oid, [])),
+        }
+
+    return result
@@ -0,0 +1,100 @@
+# page_probes.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Live probes of a detail page (db_detail: snapshot, object summary, Query Store,
+# backup sizes, AG info) run side by side on one shared pool. The page waits
+# at most PAGE_PROBE_DEADLINE seconds; probes still running are handed back
+# as "pending" under a token and picked up later by the page's poll request.
+#
+# Connections: every probe opens its own pyodbc connection; ODBC driver-manager
+# pooling (pyodbc.pooling, on by default) hands back warm physical connections
+# to the same server/database instead of a new login each time.
+
+PAGE_PROBE_WORKERS = int(os.getenv("INV_PAGE_PROBE_WORKERS", "16"))
+PAGE_PROBE_DEADLINE = float(os.getenv("INV_PAGE_PROBE_DEADLINE", "3"))
+PENDING_TTL_SECONDS = 120
+
+_executor = ThreadPoolExecutor(max_workers=PAGE_PROBE_WORKERS, thread_name_prefix="page-probe")
+
+_pending_lock = threading.Lock()
+_pending = {}   # token -> {"futures": {name: Future}, "created": monotonic}
+
+
+def _result_or_none(future):
+    try:
+        return future.result()
+    except Exception as ex:
+        print(f"[PAGE_PROBE] probe failed: {ex}")
+        return None
+
+
+def _purge_expired(now):
+    for token in [t for t, p in _pending.items() if now - p["created"] > PENDING_TTL_SECONDS]:
+        _pending.pop(token, None)
+
+
+def run_probes(probes: dict, deadline: float = PAGE_PROBE_DEADLINE):
+    """Run {name: callable} concurrently; wait up to `deadline` seconds.
+
+    Returns (results, pending_names, token). Failed probes give None.
+    `token` is None when everything finished in time.
+    """
+    futures = {name: _executor.submit(fn) for name, fn in probes.items()}
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    pending = []
+    for name, f in futures.items():
+        if f.done():
+            results[name] = _result_or_none(f)
+        else:
+            pending.append(name)
+
+    token = None
+    if pending:
+        token = uuid.uuid4().hex
+        now = time.monotonic()
+        with _pending_lock:
+            _purge_expired(now)
+            _pending[token] = {"futures": {n: futures[n] for n in pending}, "created": now}
+    return results, pending, token
+
+
+def wait_probe(token: str, name: str, timeout: float | None = None):
+    """Block until one pending probe finishes (for results the page cannot render without)."""
+    with _pending_lock:
+        entry = _pending.get(token)
+        future = entry["futures"].get(name) if entry else None
+    if future is None:
+        return None
+    wait([future], timeout=timeout)
+    return _result_or_none(future) if future.done() else None
+
+
+def collect_pending(token: str):
+    """Return (finished {name: result}, still_pending [names]) for a page token.
+
+    Returns (None, None) when the token is unknown or expired.
+    """
+    with _pending_lock:
+        entry = _pending.get(token)
+        if entry is None:
+            return None, None
+
+        finished = {}
+        still = []
+        for name, f in entry["futures"].items():
+            if f.done():
+                finished[name] = _result_or_none(f)
+            else:
+                still.append(name)
+
+        if still:
+            entry["futures"] = {n: entry["futures"][n] for n in still}
+        else:
+            _pending.pop(token, None)
+    return finished, still
@@ -0,0 +1,587 @@
+# perf_harvester.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fleet_scanner import get_inventory_connection, get_probe_connection
+from .objects_detail import _split_full_name
+from .refresh_scheduler import RefreshScheduler
+
+# ---------- FLEET PERFORMANCE HARVEST ----------
+#
+# Snapshots sys.dm_exec_procedure_stats and sys.dm_exec_query_stats on every
+# server in dbo.ServerList (one instance-wide query each, all databases at
+# once) and stores what changed since the previous snapshot in
+# dbo.ProcStatsHistory / dbo.QueryStatsHistory. Rankings and trends read the
+# history only; nothing here touches a server interactively.
+PERF_HARVEST_INTERVAL = int(os.getenv("INV_PERF_HARVEST_INTERVAL", "900"))   # seconds (0 = on demand only)
+PERF_HARVEST_WORKERS = int(os.getenv("INV_PERF_HARVEST_WORKERS", "8"))
+PERF_QUERY_STATS_TOP = int(os.getenv("INV_PERF_QUERY_STATS_TOP", "200"))     # query_hash rows kept per server
+PERF_HISTORY_DAYS = int(os.getenv("INV_PERF_HISTORY_DAYS", "30"))
+
+# Sort keys accepted by top_procedures / top_queries -> history column.
+METRICS = {
+    "cpu": "WorkerTimeUs",
+    "duration": "ElapsedTimeUs",
+    "reads": "LogicalReads",
+    "writes": "LogicalWrites",
+    "physical_reads": "PhysicalReads",
+    "executions": "Executions",
+}
+
+# Counters shared by both snapshot types, in TVP column order.
+_COUNTERS = ("ExecutionCount", "WorkerTimeUs", "ElapsedTimeUs", "LogicalReads", "LogicalWrites", "PhysicalReads")
+
+
+def _delta_insert(history: str, last: str, rows: str, key_join: str, key_cols: str, extra_cols: str) -> str:
+    """INSERT ... SELECT of per-row deltas between the `rows` TVP and the server's last snapshot.
+
+    A row is a plain difference when the baseline has the same CachedTime and
+    no counter went backwards. Otherwise (new plan, recompile, eviction and
+    re-cache, restart) the counters are only trusted when the plan was cached
+    after the previous sample, in which case they are all new work; anything
+    else becomes the new baseline without emitting history.
+    """
+    counters_le = " AND ".join(f"r.{c} >= l.{c}" for c in _COUNTERS)
+    delta_cols = ",\n                ".join(
+        f"r.{c} - CASE WHEN k.IsDelta = 1 THEN l.{c} ELSE 0 END AS {c}" for c in _COUNTERS
+    )
+    return f"""
+        INSERT INTO dbo.{history}
+            (CollectedAt, ServerID, {key_cols}, {extra_cols}, IntervalSeconds,
+             Executions, WorkerTimeUs, ElapsedTimeUs, LogicalReads, LogicalWrites, PhysicalReads)
+        SELECT @CollectedAt, @ServerID, {", ".join("r." + c.strip() for c in key_cols.split(","))},
+               {", ".join("r." + c.strip() for c in extra_cols.split(","))},
+               DATEDIFF(SECOND, CASE WHEN k.IsDelta = 1 THEN l.SampleTime ELSE r.CachedTime END, @SampleTime),
+               d.ExecutionCount, d.WorkerTimeUs, d.ElapsedTimeUs, d.LogicalReads, d.LogicalWrites, d.PhysicalReads
+        FROM {rows} AS r
+        LEFT JOIN dbo.{last} AS l
+               ON l.ServerID = @ServerID AND {key_join}
+        CROSS APPLY (
+            SELECT CASE WHEN l.ServerID IS NOT NULL AND l.CachedTime = r.CachedTime AND {counters_le}
+                        THEN 1 ELSE 0 END AS IsDelta
+        ) AS k
+        CROSS APPLY (
+            SELECT
+                {delta_cols}
+        ) AS d
+        WHERE (k.IsDelta = 1 OR r.CachedTime >= COALESCE(l.SampleTime, @PrevSample))
+          AND d.ExecutionCount > 0;
+    """
+
+
+PERF_HARVEST_DDL = [
+    """
+    IF TYPE_ID(N'dbo.ProcStatsSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ProcStatsSnapshotType AS TABLE (
+            DatabaseName    SYSNAME        NOT NULL,
+            ObjectID        INT            NOT NULL,
+            SchemaName      SYSNAME        NULL,
+            ObjectName      SYSNAME        NULL,
+            CachedTime      DATETIME2(3)   NOT NULL,
+            ExecutionCount  BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL,
+            PRIMARY KEY (DatabaseName, ObjectID)
+        );
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.QueryStatsSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.QueryStatsSnapshotType AS TABLE (
+            QueryHash       BINARY(8)      NOT NULL PRIMARY KEY,
+            DatabaseName    SYSNAME        NULL,
+            StatementText   NVARCHAR(4000) NULL,
+            CachedTime      DATETIME2(3)   NOT NULL,
+            ExecutionCount  BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'PerfHarvestState' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.PerfHarvestState (
+            ServerID        INT            NOT NULL CONSTRAINT PK_PerfHarvestState PRIMARY KEY,
+            LastSampleTime  DATETIME2(3)   NOT NULL,   -- target server clock
+            LastHarvestAt   DATETIME2(0)   NOT NULL    -- inventory clock
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'ProcStatsLast' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.ProcStatsLast (
+            ServerID        INT            NOT NULL,
+            DatabaseName    SYSNAME        NOT NULL,
+            ObjectID        INT            NOT NULL,
+            CachedTime      DATETIME2(3)   NOT NULL,
+            SampleTime      DATETIME2(3)   NOT NULL,
+            ExecutionCount  BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL,
+            CONSTRAINT PK_ProcStatsLast PRIMARY KEY (ServerID, DatabaseName, ObjectID)
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'QueryStatsLast' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.QueryStatsLast (
+            ServerID        INT            NOT NULL,
+            QueryHash       BINARY(8)      NOT NULL,
+            CachedTime      DATETIME2(3)   NOT NULL,
+            SampleTime      DATETIME2(3)   NOT NULL,
+            ExecutionCount  BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL,
+            CONSTRAINT PK_QueryStatsLast PRIMARY KEY (ServerID, QueryHash)
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'ProcStatsHistory' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.ProcStatsHistory (
+            CollectedAt     DATETIME2(0)   NOT NULL,
+            ServerID        INT            NOT NULL,
+            DatabaseName    SYSNAME        NOT NULL,
+            ObjectID        INT            NOT NULL,
+            SchemaName      SYSNAME        NULL,
+            ObjectName      SYSNAME        NULL,
+            IntervalSeconds INT            NOT NULL,
+            Executions      BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL,
+            CONSTRAINT PK_ProcStatsHistory PRIMARY KEY (CollectedAt, ServerID, DatabaseName, ObjectID)
+        );
+        CREATE INDEX IX_ProcStatsHistory_Object
+            ON dbo.ProcStatsHistory (ServerID, DatabaseName, SchemaName, ObjectName, CollectedAt);
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'QueryStatsHistory' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.QueryStatsHistory (
+            CollectedAt     DATETIME2(0)   NOT NULL,
+            ServerID        INT            NOT NULL,
+            QueryHash       BINARY(8)      NOT NULL,
+            DatabaseName    SYSNAME        NULL,
+            StatementText   NVARCHAR(4000) NULL,
+            IntervalSeconds INT            NOT NULL,
+            Executions      BIGINT         NOT NULL,
+            WorkerTimeUs    BIGINT         NOT NULL,
+            ElapsedTimeUs   BIGINT         NOT NULL,
+            LogicalReads    BIGINT         NOT NULL,
+            LogicalWrites   BIGINT         NOT NULL,
+            PhysicalReads   BIGINT         NOT NULL,
+            CONSTRAINT PK_QueryStatsHistory PRIMARY KEY (CollectedAt, ServerID, QueryHash)
+        );
+    END
+    """,
+    f"""
+    CREATE OR ALTER PROCEDURE dbo.usp_HarvestExecStats
+        @ServerID        INT,
+        @SampleTime      DATETIME2(3),
+        @ProcRows        dbo.ProcStatsSnapshotType  READONLY,
+        @QueryRows       dbo.QueryStatsSnapshotType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @CollectedAt DATETIME2(0) = SYSDATETIME();
+        DECLARE @PrevSample  DATETIME2(3) =
+            (SELECT LastSampleTime FROM dbo.PerfHarvestState WHERE ServerID = @ServerID);
+
+        BEGIN TRAN;
+        {_delta_insert("ProcStatsHistory", "ProcStatsLast", "@ProcRows",
+                       "l.DatabaseName = r.DatabaseName AND l.ObjectID = r.ObjectID",
+                       "DatabaseName, ObjectID", "SchemaName, ObjectName")}
+        {_delta_insert("QueryStatsHistory", "QueryStatsLast", "@QueryRows",
+                       "l.QueryHash = r.QueryHash",
+                       "QueryHash", "DatabaseName, StatementText")}
+        -- The current snapshot becomes the baseline; evicted entries drop out.
+        DELETE FROM dbo.ProcStatsLast WHERE ServerID = @ServerID;
+        INSERT INTO dbo.ProcStatsLast
+            (ServerID, DatabaseName, ObjectID, CachedTime, SampleTime, {", ".join(_COUNTERS)})
+        SELECT @ServerID, DatabaseName, ObjectID, CachedTime, @SampleTime, {", ".join(_COUNTERS)}
+        FROM @ProcRows;
+
+        DELETE FROM dbo.QueryStatsLast WHERE ServerID = @ServerID;
+        INSERT INTO dbo.QueryStatsLast
+            (ServerID, QueryHash, CachedTime, SampleTime, {", ".join(_COUNTERS)})
+        SELECT @ServerID, QueryHash, CachedTime, @SampleTime, {", ".join(_COUNTERS)}
+        FROM @QueryRows;
+
+        MERGE dbo.PerfHarvestState AS tgt
+        USING (SELECT @ServerID AS ServerID) AS src
+              ON tgt.ServerID = src.ServerID
+        WHEN MATCHED THEN
+            UPDATE SET tgt.LastSampleTime = @SampleTime, tgt.LastHarvestAt = @CollectedAt
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (ServerID, LastSampleTime, LastHarvestAt)
+            VALUES (@ServerID, @SampleTime, @CollectedAt);
+        COMMIT;
+    END
+    """,
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_perf_harvest_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        cur = inv_conn.cursor()
+        for ddl in PERF_HARVEST_DDL:
+            cur.execute(ddl)
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Per-server snapshot (instance-wide, two result sets)
+# ------------------------
+
+# Multiple plans of one procedure (SET options, recompiles) are summed; their
+# earliest cached_time stands for the group. Statement stats are grouped by
+# query_hash and only the heaviest PERF_QUERY_STATS_TOP hashes are kept; the
+# text / database of the costliest plan in each group is used as the sample.
+SNAPSHOT_SQL = """
+SET NOCOUNT ON;
+-- OBJECT_NAME / OBJECT_SCHEMA_NAME honour the isolation level; do not queue
+-- behind schema changes in user databases.
+SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;
+
+SELECT CONVERT(DATETIME2(3), SYSDATETIME()) AS sample_time;
+
+SELECT
+    DB_NAME(ps.database_id)                              AS database_name,
+    ps.object_id,
+    OBJECT_SCHEMA_NAME(ps.object_id, ps.database_id)     AS schema_name,
+    OBJECT_NAME(ps.object_id, ps.database_id)            AS object_name,
+    CONVERT(DATETIME2(3), MIN(ps.cached_time))           AS cached_time,
+    SUM(ps.execution_count)                              AS execution_count,
+    SUM(ps.total_worker_time)                            AS worker_time_us,
+    SUM(ps.total_elapsed_time)                           AS elapsed_time_us,
+    SUM(ps.total_logical_reads)                          AS logical_reads,
+    SUM(ps.total_logical_writes)                         AS logical_writes,
+    SUM(ps.total_physical_reads)                         AS physical_reads
+FROM sys.dm_exec_procedure_stats AS ps
+WHERE ps.database_id > 4
+  AND ps.database_id <> 32767
+GROUP BY ps.database_id, ps.object_id;
+
+WITH grouped AS (
+    SELECT
+        qs.query_hash, qs.sql_handle, qs.plan_handle,
+        qs.statement_start_offset, qs.statement_end_offset,
+        ROW_NUMBER() OVER (PARTITION BY qs.query_hash ORDER BY qs.total_worker_time DESC) AS rn,
+        MIN(qs.creation_time)       OVER (PARTITION BY qs.query_hash) AS cached_time,
+        SUM(qs.execution_count)     OVER (PARTITION BY qs.query_hash) AS execution_count,
+        SUM(qs.total_worker_time)   OVER (PARTITION BY qs.query_hash) AS worker_time_us,
+        SUM(qs.total_elapsed_time)  OVER (PARTITION BY qs.query_hash) AS elapsed_time_us,
+        SUM(qs.total_logical_reads) OVER (PARTITION BY qs.query_hash) AS logical_reads,
+        SUM(qs.total_logical_writes) OVER (PARTITION BY qs.query_hash) AS logical_writes,
+        SUM(qs.total_physical_reads) OVER (PARTITION BY qs.query_hash) AS physical_reads
+    FROM sys.dm_exec_query_stats AS qs
+),
+heaviest AS (
+    SELECT TOP (?) *
+    FROM grouped
+    WHERE rn = 1
+    ORDER BY worker_time_us DESC
+)
+SELECT
+    h.query_hash,
+    DB_NAME(CONVERT(INT, pa.value))                      AS database_name,
+    LEFT(SUBSTRING(st.text, h.statement_start_offset / 2 + 1,
+        (CASE h.statement_end_offset WHEN -1 THEN DATALENGTH(st.text) ELSE h.statement_end_offset END
+         - h.statement_start_offset) / 2 + 1), 4000)    AS statement_text,
+    CONVERT(DATETIME2(3), h.cached_time)                 AS cached_time,
+    h.execution_count, h.worker_time_us, h.elapsed_time_us,
+    h.logical_reads, h.logical_writes, h.physical_reads
+FROM heaviest AS h
+OUTER APPLY sys.dm_exec_sql_text(h.sql_handle) AS st
+OUTER APPLY (
+    SELECT value FROM sys.dm_exec_plan_attributes(h.plan_handle) WHERE attribute = N'dbid'
+) AS pa;
+"""
+
+
+def _counters(r) -> tuple:
+    return (
+        int(r.execution_count or 0),
+        int(r.worker_time_us or 0),
+        int(r.elapsed_time_us or 0),
+        int(r.logical_reads or 0),
+        int(r.logical_writes or 0),
+        int(r.physical_reads or 0),
+    )
+
+
+def snapshot_server(server_id: int, server_name: str) -> dict:
+    """Read both DMVs from one instance. Never raises; errors land in the result."""
+    result = {"server_id": server_id, "server_name": server_name, "status": "OK",
+              "sample_time": None, "procs": [], "queries": [], "error": None}
+    try:
+        conn = get_probe_connection(server_name)
+        try:
+            cur = conn.cursor()
+            cur.execute(SNAPSHOT_SQL, (PERF_QUERY_STATS_TOP,))
+            result["sample_time"] = cur.fetchone().sample_time
+            cur.nextset()
+            result["procs"] = [
+                (r.database_name, int(r.object_id), r.schema_name, r.object_name, r.cached_time, *_counters(r))
+                for r in cur.fetchall()
+                if r.database_name is not None
+            ]
+            cur.nextset()
+            result["queries"] = [
+                (bytes(r.query_hash), r.database_name, r.statement_text, r.cached_time, *_counters(r))
+                for r in cur.fetchall()
+            ]
+        finally:
+            conn.close()
+    except Exception as ex:
+        result["status"] = "FAILED"
+        result["error"] = str(ex)
+    return result
+
+
+# ------------------------
+# Fleet harvest
+# ------------------------
+
+def harvest_fleet(max_workers: int = PERF_HARVEST_WORKERS) -> dict:
+    """Snapshot every server in dbo.ServerList concurrently and store the deltas.
+
+    Returns a summary: {servers, online, offline, elapsed, procs, queries}
+    (online/offline = harvested/failed, so RefreshScheduler.status() reads it).
+    """
+    t0 = time.monotonic()
+
+    inv_conn = get_inventory_connection()
+    try:
+        ensure_perf_harvest_objects(inv_conn)
+        servers = inv_conn.cursor().execute(
+            "SELECT ID, ServerName FROM dbo.ServerList ORDER BY ServerName;"
+        ).fetchall()
+    finally:
+        inv_conn.close()
+
+    results = []
+    if servers:
+        workers = max(1, min(max_workers, len(servers)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="perf-harvest") as pool:
+            results = list(pool.map(lambda s: snapshot_server(s.ID, str(s.ServerName)), servers))
+
+    ok = [r for r in results if r["status"] == "OK"]
+    for r in results:
+        if r["error"]:
+            print(f"[PERF_HARVEST] {r['server_name']}: {r['error']}")
+
+    inv_conn = get_inventory_connection()
+    try:
+        cur = inv_conn.cursor()
+        for r in ok:
+            # One call (and transaction) per server keeps inventory locks short.
+            cur.execute(
+                "{CALL dbo.usp_HarvestExecStats (?, ?, ?, ?)}",
+                (r["server_id"], r["sample_time"], r["procs"], r["queries"]),
+            )
+            inv_conn.commit()
+
+        if PERF_HISTORY_DAYS > 0:
+            for table in ("ProcStatsHistory", "QueryStatsHistory"):
+                cur.execute(
+                    f"DELETE FROM dbo.{table} WHERE CollectedAt < DATEADD(DAY, -?, SYSDATETIME());",
+                    (PERF_HISTORY_DAYS,),
+                )
+            inv_conn.commit()
+    finally:
+        inv_conn.close()
+
+    return {
+        "servers": len(results),
+        "online": len(ok),
+        "offline": len(results) - len(ok),
+        "elapsed": round(time.monotonic() - t0, 3),
+        "procs": sum(len(r["procs"]) for r in ok),
+        "queries": sum(len(r["queries"]) for r in ok),
+    }
+
+
+# ------------------------
+# Rankings / trends (inventory only)
+# ------------------------
+
+def _metric_column(metric: str) -> str:
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r} (expected one of {', '.join(METRICS)})")
+    return METRICS[metric]
+
+
+def _totals(r) -> dict:
+    executions = int(r.executions or 0)
+    cpu_ms = float(r.worker_time_us or 0) / 1000.0
+    duration_ms = float(r.elapsed_time_us or 0) / 1000.0
+    logical_reads = int(r.logical_reads or 0)
+    return {
+        "executions": executions,
+        "cpu_ms": round(cpu_ms, 1),
+        "duration_ms": round(duration_ms, 1),
+        "logical_reads": logical_reads,
+        "logical_writes": int(r.logical_writes or 0),
+        "physical_reads": int(r.physical_reads or 0),
+        "avg_cpu_ms": round(cpu_ms / executions, 3) if executions else None,
+        "avg_duration_ms": round(duration_ms / executions, 3) if executions else None,
+        "avg_logical_reads": round(logical_reads / executions, 1) if executions else None,
+    }
+
+
+_TOTAL_COLUMNS = """
+    SUM(h.Executions)    AS executions,
+    SUM(h.WorkerTimeUs)  AS worker_time_us,
+    SUM(h.ElapsedTimeUs) AS elapsed_time_us,
+    SUM(h.LogicalReads)  AS logical_reads,
+    SUM(h.LogicalWrites) AS logical_writes,
+    SUM(h.PhysicalReads) AS physical_reads
+"""
+
+
+def top_procedures(metric: str = "cpu", hours: int = 24, limit: int = 25, server_id: int | None = None) -> list[dict]:
+    """Heaviest procedures across the fleet over the last `hours`, by `metric`."""
+    column = _metric_column(metric)
+    conn = get_inventory_connection()
+    try:
+        ensure_perf_harvest_objects(conn)
+        rows = conn.cursor().execute(
+            f"""
+            SELECT TOP (?)
+                h.ServerID, sl.ServerName, h.DatabaseName,
+                MAX(h.SchemaName) AS schema_name, MAX(h.ObjectName) AS object_name,
+                {_TOTAL_COLUMNS}
+            FROM dbo.ProcStatsHistory AS h
+            JOIN dbo.ServerList AS sl ON sl.ID = h.ServerID
+            WHERE h.CollectedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+              AND (? IS NULL OR h.ServerID = ?)
+            GROUP BY h.ServerID, sl.ServerName, h.DatabaseName, h.ObjectID
+            ORDER BY SUM(h.{column}) DESC;
+            """,
+            (limit, hours, server_id, server_id),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "server_id": int(r.ServerID),
+            "server_name": r.ServerName,
+            "database_name": r.DatabaseName,
+            "full_name": f"{r.schema_name}.{r.object_name}",
+            **_totals(r),
+        }
+        for r in rows
+    ]
+
+
+def top_queries(metric: str = "cpu", hours: int = 24, limit: int = 25, server_id: int | None = None) -> list[dict]:
+    """Heaviest statements (by query_hash) across the fleet over the last `hours`."""
+    column = _metric_column(metric)
+    conn = get_inventory_connection()
+    try:
+        ensure_perf_harvest_objects(conn)
+        rows = conn.cursor().execute(
+            f"""
+            SELECT TOP (?)
+                h.ServerID, sl.ServerName, h.QueryHash,
+                MAX(h.DatabaseName) AS database_name, MAX(h.StatementText) AS statement_text,
+                {_TOTAL_COLUMNS}
+            FROM dbo.QueryStatsHistory AS h
+            JOIN dbo.ServerList AS sl ON sl.ID = h.ServerID
+            WHERE h.CollectedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+              AND (? IS NULL OR h.ServerID = ?)
+            GROUP BY h.ServerID, sl.ServerName, h.QueryHash
+            ORDER BY SUM(h.{column}) DESC;
+            """,
+            (limit, hours, server_id, server_id),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "server_id": int(r.ServerID),
+            "server_name": r.ServerName,
+            "query_hash": "0x" + bytes(r.QueryHash).hex().upper(),
+            "database_name": r.database_name,
+            "statement_text": r.statement_text,
+            **_totals(r),
+        }
+        for r in rows
+    ]
+
+
+def procedure_trend(server_id: int, db_name: str, full_name: str, hours: int = 168, bucket_minutes: int = 60) -> list[dict]:
+    """Harvested totals of one procedure per time bucket, oldest first."""
+    schema_name, object_name = _split_full_name(full_name)
+    bucket_minutes = max(1, int(bucket_minutes))
+    conn = get_inventory_connection()
+    try:
+        ensure_perf_harvest_objects(conn)
+        rows = conn.cursor().execute(
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @BucketMinutes INT = ?;
+
+            SELECT
+                b.bucket,
+                {_TOTAL_COLUMNS}
+            FROM dbo.ProcStatsHistory AS h
+            CROSS APPLY (
+                SELECT DATEADD(MINUTE, DATEDIFF(MINUTE, '20000101', h.CollectedAt) / @BucketMinutes * @BucketMinutes,
+                               '20000101') AS bucket
+            ) AS b
+            WHERE h.ServerID = ?
+              AND h.DatabaseName = ?
+              AND h.SchemaName = ?
+              AND h.ObjectName = ?
+              AND h.CollectedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+            GROUP BY b.bucket
+            ORDER BY b.bucket;
+            """,
+            (bucket_minutes, server_id, db_name, schema_name, object_name, hours),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"bucket": r.bucket, **_totals(r)} for r in rows]
+
+
+# Background harvester: same single-flight timer as the ServerInfo refresh.
+harvester = RefreshScheduler(refresh_fn=harvest_fleet, interval=PERF_HARVEST_INTERVAL, name="perf-harvest")
@@ -0,0 +1,467 @@
+# plan_store.py
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from .db_detail import get_inventory_connection, get_target_connection
+
+# Cached procedure plans, fetched from sys.dm_exec_query_plan once and kept in
+# the inventory DB:
+#   dbo.PlanStore   - PlanKey -> plan XML + parsed analysis (JSON), with the owning object
+#   dbo.PlanHandles - (server, plan_handle) -> PlanKey, with the owning object
+# PlanKey is a SHA-1 over (server, database, object_id) plus the plan's sorted
+# query_plan_hash values, so a recompiled procedure with an unchanged plan
+# shape reuses its stored plan, but the same shape in another database or
+# object (e.g. one procedure deployed to many databases) gets its own XML.
+PLAN_MEMORY_CACHE_MAX = int(os.getenv("INV_PLAN_MEMORY_CACHE_MAX", "64"))
+TOP_OPERATORS = 5
+
+PLAN_STORE_DDL = """
+IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'PlanStore' AND schema_id = SCHEMA_ID('dbo'))
+BEGIN
+    CREATE TABLE dbo.PlanStore (
+        PlanKey      BINARY(20)    NOT NULL CONSTRAINT PK_PlanStore PRIMARY KEY,
+        ServerName   SYSNAME       NULL,
+        DatabaseName SYSNAME       NULL,
+        ObjectID     INT           NULL,
+        PlanXml      NVARCHAR(MAX) NOT NULL,
+        Analysis     NVARCHAR(MAX) NULL,
+        FetchedAt    DATETIME2(0)  NOT NULL CONSTRAINT DF_PlanStore_FetchedAt DEFAULT SYSDATETIME()
+    );
+END
+
+-- Keys written before PlanKey was scoped to (server, database, object) could
+-- be shared by different objects: drop them (plans are re-fetched on demand).
+IF COL_LENGTH('dbo.PlanStore', 'ObjectID') IS NULL
+BEGIN
+    IF OBJECT_ID(N'dbo.PlanHandles', N'U') IS NOT NULL
+        DELETE FROM dbo.PlanHandles;
+    DELETE FROM dbo.PlanStore;
+    ALTER TABLE dbo.PlanStore ADD ServerName SYSNAME NULL, DatabaseName SYSNAME NULL, ObjectID INT NULL;
+END
+
+IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'PlanHandles' AND schema_id = SCHEMA_ID('dbo'))
+BEGIN
+    CREATE TABLE dbo.PlanHandles (
+        ServerName   SYSNAME        NOT NULL,
+        PlanHandle   VARBINARY(64)  NOT NULL,
+        DatabaseName SYSNAME        NOT NULL,
+        ObjectID     INT            NULL,
+        PlanKey      BINARY(20)     NOT NULL,
+        LastSeenAt   DATETIME2(0)   NOT NULL CONSTRAINT DF_PlanHandles_LastSeenAt DEFAULT SYSDATETIME(),
+        CONSTRAINT PK_PlanHandles PRIMARY KEY (ServerName, PlanHandle)
+    );
+    CREATE INDEX IX_PlanHandles_Object
+        ON dbo.PlanHandles (ServerName, DatabaseName, ObjectID, LastSeenAt DESC)
+        INCLUDE (PlanKey);
+END
+"""
+
+_ddl_done = False
+_mem_lock = threading.Lock()
+_mem_cache = OrderedDict()   # PlanKey -> {"plan_xml", "analysis"}
+
+
+def _ensure_plan_store(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    inv_conn.cursor().execute(PLAN_STORE_DDL)
+    inv_conn.commit()
+    _ddl_done = True
+
+
+def _remember(plan_key: bytes, entry: dict):
+    with _mem_lock:
+        _mem_cache[plan_key] = entry
+        _mem_cache.move_to_end(plan_key)
+        while len(_mem_cache) > PLAN_MEMORY_CACHE_MAX:
+            _mem_cache.popitem(last=False)
+
+
+def _recall(plan_key: bytes):
+    with _mem_lock:
+        entry = _mem_cache.get(plan_key)
+        if entry is not None:
+            _mem_cache.move_to_end(plan_key)
+        return entry
+
+
+# ---------- PLAN ANALYSIS (single incremental pass) ----------
+
+_XML_DECL = re.compile(r"^\s*<\?xml[^>]*\?>")
+_SPILL_TAGS = ("SpillToTempDb", "HashSpillDetails", "SortSpillDetails", "ExchangeSpillDetails")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _float(val):
+    try:
+        return float(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def analyze_plan_xml(plan_xml: str) -> dict:
+    """Parse showplan XML once with iterparse.
+
+    Returns {
+      "operators":          flat RelOp list (same shape as _parse_exec_plan_xml),
+      "costliest":          top operators by own cost (subtree minus children),
+      "missing_indexes":    [{impact, table, equality, inequality, include}],
+      "implicit_conversions": [{issue, expression}],
+      "spills":             [{node_id, physical_op, kind, level}],
+      "other_warnings":     [str],
+      "statements":         [{text, subtree_cost, query_hash, query_plan_hash}],
+    }
+    """
+    result = {
+        "operators": [],
+        "costliest": [],
+        "missing_indexes": [],
+        "implicit_conversions": [],
+        "spills": [],
+        "other_warnings": [],
+        "statements": [],
+    }
+    if not plan_xml:
+        return result
+
+    source = io.BytesIO(_XML_DECL.sub("", str(plan_xml), count=1).encode("utf-8"))
+
+    relop_stack = []      # [node dict, children subtree cost]
+    own_costs = []
+    missing = None        # MissingIndex being built
+    column_usage = None
+    implicit_seen = set()
+    current_statement = None
+
+    try:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            tag = _local(elem.tag)
+
+            if event == "start":
+                if tag == "StmtSimple":
+                    current_statement = {
+                        "text": (elem.get("StatementText") or "").strip()[:400],
+                        "subtree_cost": _float(elem.get("StatementSubTreeCost")),
+                        "query_hash": elem.get("QueryHash"),
+                        "query_plan_hash": elem.get("QueryPlanHash"),
+                    }
+                    result["statements"].append(current_statement)
+                elif tag == "RelOp":
+                    node = {
+                        "node_id": elem.get("NodeId"),
+                        "physical_op": elem.get("PhysicalOp"),
+                        "logical_op": elem.get("LogicalOp"),
+                        "estimate_rows": _float(elem.get("EstimateRows")),
+                        "estimate_io": _float(elem.get("EstimateIO")),
+                        "estimate_cpu": _float(elem.get("EstimateCPU")),
+                        "subtree_cost": _float(elem.get("EstimatedTotalSubtreeCost")),
+                        "level": len(relop_stack),
+                    }
+                    result["operators"].append(node)
+                    relop_stack.append([node, 0.0])
+                elif tag == "MissingIndexGroup":
+                    impact = _float(elem.get("Impact"))
+                    missing = {"impact": impact}
+                elif tag == "MissingIndex" and missing is not None:
+                    missing = {
+                        "impact": missing["impact"],
+                        "table": ".".join(
+                            p for p in (elem.get("Database"), elem.get("Schema"), elem.get("Table")) if p
+                        ),
+                        "equality": [],
+                        "inequality": [],
+                        "include": [],
+                    }
+                elif tag == "ColumnGroup" and missing is not None:
+                    column_usage = (elem.get("Usage") or "").lower()
+                elif tag == "Column" and missing is not None and column_usage in ("equality", "inequality", "include"):
+                    if "table" in missing:
+                        missing[column_usage].append(elem.get("Name"))
+                elif tag == "PlanAffectingConvert":
+                    key = (elem.get("ConvertIssue"), elem.get("Expression"))
+                    if key not in implicit_seen:
+                        implicit_seen.add(key)
+                        result["implicit_conversions"].append({"issue": key[0], "expression": key[1]})
+                elif tag in _SPILL_TAGS:
+                    owner = relop_stack[-1][0] if relop_stack else {}
+                    result["spills"].append(
+                        {
+                            "node_id": owner.get("node_id"),
+                            "physical_op": owner.get("physical_op"),
+                            "kind": tag,
+                            "level": elem.get("SpillLevel"),
+                        }
+                    )
+                elif tag in ("NoJoinPredicate", "ColumnsWithNoStatistics", "UnmatchedIndexes"):
+                    result["other_warnings"].append(tag)
+                continue
+
+            # ---- end events ----
+            if tag == "RelOp" and relop_stack:
+                node, children_cost = relop_stack.pop()
+                subtree = node["subtree_cost"] or 0.0
+                own_costs.append((max(subtree - children_cost, 0.0), node, current_statement))
+                if relop_stack:
+                    relop_stack[-1][1] += subtree
+            elif tag == "MissingIndex" and missing is not None and "table" in missing:
+                result["missing_indexes"].append(missing)
+                missing = {"impact": missing["impact"]}
+            elif tag == "MissingIndexGroup":
+                missing = None
+            elif tag == "ColumnGroup":
+                column_usage = None
+
+            # Attributes were captured on "start"; drop the subtree to keep
+            # memory flat on multi-MB plans.
+            if tag in ("RelOp", "StmtSimple", "MissingIndexGroup"):
+                elem.clear()
+    except ET.ParseError:
+        return result
+
+    own_costs.sort(key=lambda x: x[0], reverse=True)
+    for own, node, stmt in own_costs[:TOP_OPERATORS]:
+        total = stmt["subtree_cost"] if stmt is not None else None
+        result["costliest"].append(
+            {
+                "node_id": node["node_id"],
+                "physical_op": node["physical_op"],
+                "logical_op": node["logical_op"],
+                "own_cost": own,
+                "cost_percent": (own / total * 100.0) if total else None,
+            }
+        )
+    if result["other_warnings"]:
+        result["other_warnings"] = sorted(set(result["other_warnings"]))
+    return result
+
+
+# ---------- RESOLVING PLANS ----------
+
+def _plan_keys(cursor, server_name: str, db_name: str, object_by_handle: dict):
+    """{plan_handle: PlanKey} from sys.dm_exec_query_stats (no plan XML read)."""
+    handles = list(object_by_handle)
+    hashes = {}
+    placeholders = ",".join("?" for _ in handles)
+    cursor.execute(
+        f"""
+        SELECT plan_handle, query_plan_hash
+        FROM sys.dm_exec_query_stats
+        WHERE plan_handle IN ({placeholders});
+        """,
+        list(handles),
+    )
+    for r in cursor.fetchall():
+        hashes.setdefault(bytes(r.plan_handle), set()).add(bytes(r.query_plan_hash or b""))
+
+    keys = {}
+    for h in handles:
+        scope = f"{server_name.lower()}\x00{db_name.lower()}\x00{object_by_handle[h]}\x00".encode("utf-8")
+        parts = sorted(hashes.get(h, ()))
+        material = b"".join(parts) if parts else b"handle:" + h
+        keys[h] = hashlib.sha1(scope + material).digest()
+    return keys
+
+
+def resolve_plans(cursor, server_name: str, db_name: str, handles_by_object: dict) -> dict:
+    """{object_id: plan_handle} -> {object_id: {"plan_xml", "analysis"}}.
+
+    `cursor` is on the target database. Plans already stored are never
+    re-read from the DMVs; new ones are fetched in one query, analysed once
+    and stored.
+    """
+    handles_by_object = {oid: bytes(h) for oid, h in handles_by_object.items() if h}
+    if not handles_by_object:
+        return {}
+    handles = list(dict.fromkeys(handles_by_object.values()))
+    object_by_handle = {}
+    for oid, h in handles_by_object.items():
+        object_by_handle.setdefault(h, oid)
+
+    inv = get_inventory_connection()
+    try:
+        _ensure_plan_store(inv)
+        inv_cur = inv.cursor()
+
+        # 1) handle -> key from what we stored before
+        placeholders = ",".join("?" for _ in handles)
+        inv_cur.execute(
+            f"SELECT PlanHandle, PlanKey FROM dbo.PlanHandles WHERE ServerName = ? AND PlanHandle IN ({placeholders});",
+            [server_name] + handles,
+        )
+        key_by_handle = {bytes(r.PlanHandle): bytes(r.PlanKey) for r in inv_cur.fetchall()}
+
+        # 2) unseen handles: derive the key from query_plan_hash values
+        unseen = [h for h in handles if h not in key_by_handle]
+        if unseen:
+            key_by_handle.update(
+                _plan_keys(cursor, server_name, db_name, {h: object_by_handle[h] for h in unseen})
+            )
+
+        # 3) load stored plans not in memory
+        entries = {}
+        to_load = []
+        for key in set(key_by_handle.values()):
+            entry = _recall(key)
+            if entry is not None:
+                entries[key] = entry
+            else:
+                to_load.append(key)
+        if to_load:
+            placeholders = ",".join("?" for _ in to_load)
+            inv_cur.execute(
+                f"SELECT PlanKey, PlanXml, Analysis FROM dbo.PlanStore WHERE PlanKey IN ({placeholders});",
+                to_load,
+            )
+            for r in inv_cur.fetchall():
+                entry = {
+                    "plan_xml": r.PlanXml,
+                    "analysis": json.loads(r.Analysis) if r.Analysis else analyze_plan_xml(r.PlanXml),
+                }
+                entries[bytes(r.PlanKey)] = entry
+                _remember(bytes(r.PlanKey), entry)
+
+        # 4) plans we have never stored: one DMV round-trip for all of them
+        missing_handles = [h for h in handles if key_by_handle[h] not in entries]
+        if missing_handles:
+            values = ",".join("(?)" for _ in missing_handles)
+            cursor.execute(
+                f"""
+                SELECT h.plan_handle, qp.query_plan
+                FROM (VALUES {values}) AS h(plan_handle)
+                CROSS APPLY sys.dm_exec_query_plan(h.plan_handle) AS qp
+                WHERE qp.query_plan IS NOT NULL;
+                """,
+                missing_handles,
+            )
+            for r in cursor.fetchall():
+                key = key_by_handle[bytes(r.plan_handle)]
+                if key in entries:
+                    continue
+                plan_xml = str(r.query_plan)
+                entry = {"plan_xml": plan_xml, "analysis": analyze_plan_xml(plan_xml)}
+                entries[key] = entry
+                _remember(key, entry)
+                inv_cur.execute(
+                    """
+                    IF NOT EXISTS (SELECT 1 FROM dbo.PlanStore WHERE PlanKey = ?)
+                        INSERT INTO dbo.PlanStore (PlanKey, ServerName, DatabaseName, ObjectID, PlanXml, Analysis)
+                        VALUES (?, ?, ?, ?, ?, ?);
+                    """,
+                    (key, key, server_name, db_name, object_by_handle[bytes(r.plan_handle)],
+                     plan_xml, json.dumps(entry["analysis"], default=str)),
+                )
+
+        # 5) remember which handle/object the plans belong to
+        for oid, h in handles_by_object.items():
+            key = key_by_handle.get(h)
+            if key not in entries:
+                continue
+            inv_cur.execute(
+                """
+                UPDATE dbo.PlanHandles SET LastSeenAt = SYSDATETIME(), PlanKey = ?
+                WHERE ServerName = ? AND PlanHandle = ?;
+                IF @@ROWCOUNT = 0
+                    INSERT INTO dbo.PlanHandles (ServerName, PlanHandle, DatabaseName, ObjectID, PlanKey)
+                    VALUES (?, ?, ?, ?, ?);
+                """,
+                (key, server_name, h, server_name, h, db_name, oid, key),
+            )
+        inv.commit()
+    finally:
+        inv.close()
+
+    return {
+        oid: entries[key_by_handle[h]]
+        for oid, h in handles_by_object.items()
+        if key_by_handle.get(h) in entries
+    }
+
+
+def get_object_plan(server_name: str, db_name: str, full_name: str):
+    """Plan entry for one procedure: its current cached plan, else the last stored one."""
+    conn = get_target_connection(server_name, db_name)
+    try:
+        cur = conn.cursor()
+        row = cur.execute(
+            """
+            SELECT TOP (1) OBJECT_ID(?) AS object_id, ps.plan_handle
+            FROM (SELECT 1 AS x) AS one
+            LEFT JOIN sys.dm_exec_procedure_stats AS ps
+                ON ps.object_id = OBJECT_ID(?)
+               AND ps.database_id = DB_ID()
+            ORDER BY ps.last_execution_time DESC;
+            """,
+            (full_name, full_name),
+        ).fetchone()
+        if not row or row.object_id is None:
+            return None
+        object_id = int(row.object_id)
+        if row.plan_handle is not None:
+            plans = resolve_plans(cur, server_name, db_name, {object_id: row.plan_handle})
+            if object_id in plans:
+                return plans[object_id]
+    finally:
+        conn.close()
+
+    # Procedure no longer in cache: fall back to the last plan we stored for it
+    inv = get_inventory_connection()
+    try:
+        _ensure_plan_store(inv)
+        r = inv.cursor().execute(
+            """
+            SELECT TOP (1) ps.PlanKey, ps.PlanXml, ps.Analysis
+            FROM dbo.PlanHandles AS ph
+            JOIN dbo.PlanStore AS ps ON ps.PlanKey = ph.PlanKey
+            WHERE ph.ServerName = ? AND ph.DatabaseName = ? AND ph.ObjectID = ?
+            ORDER BY ph.LastSeenAt DESC;
+            """,
+            (server_name, db_name, object_id),
+        ).fetchone()
+    finally:
+        inv.close()
+    if not r:
+        return None
+    return {
+        "plan_xml": r.PlanXml,
+        "analysis": json.loads(r.Analysis) if r.Analysis else analyze_plan_xml(r.PlanXml),
+    }
+
+
+def stored_plan_objects(server_name: str, db_name: str, object_ids) -> set:
+    """Object ids among `object_ids` with a stored plan (get_object_plan's fallback)."""
+    object_ids = list(dict.fromkeys(int(o) for o in object_ids if o is not None))
+    if not object_ids:
+        return set()
+    placeholders = ",".join("?" for _ in object_ids)
+    inv = get_inventory_connection()
+    try:
+        _ensure_plan_store(inv)
+        rows = inv.cursor().execute(
+            f"""
+            SELECT DISTINCT ph.ObjectID
+            FROM dbo.PlanHandles AS ph
+            JOIN dbo.PlanStore AS ps ON ps.PlanKey = ph.PlanKey
+            WHERE ph.ServerName = ? AND ph.DatabaseName = ? AND ph.ObjectID IN ({placeholders});
+            """,
+            [server_name, db_name] + object_ids,
+        ).fetchall()
+    finally:
+        inv.close()
+    return {int(r.ObjectID) for r in rows}
+
+
+def make_plan_resolver(server_name: str, db_name: str):
+    """Resolver for objects_detail.get_objects_metadata(plan_resolver=...)."""
+    def resolver(cursor, handles_by_object):
+        return resolve_plans(cursor, server_name, db_name, handles_by_object)
+    return resolver
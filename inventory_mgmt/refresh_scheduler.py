@@ -0,0 +1,179 @@
+# refresh_scheduler.py
+import os
+import threading
+from datetime import datetime
+
+from .fleet_scanner import get_inventory_connection, scan_fleet
+
+# Seconds between background fleet scans (0 disables the timer; /refresh still works)
+INV_REFRESH_INTERVAL = int(os.getenv("INV_REFRESH_INTERVAL", "300"))
+
+# Every worker process imports this module and starts its own schedulers.  With
+# INV_SCHEDULER_APPLOCK=1 the timed runs of each scheduler only happen in the
+# process holding its session applock on the inventory DB, so a multi-worker
+# deployment scans / harvests / collects once per interval, not once per worker.
+# Explicit trigger() / run_once() calls (e.g. /refresh) still run locally.
+INV_SCHEDULER_APPLOCK = os.getenv("INV_SCHEDULER_APPLOCK", "1") == "1"
+
+APPLOCK_SQL = """
+SET NOCOUNT ON;
+DECLARE @rc INT;
+EXEC @rc = sp_getapplock @Resource = ?, @LockMode = 'Exclusive',
+                         @LockOwner = 'Session', @LockTimeout = 0;
+SELECT @rc;
+"""
+
+
+class RefreshScheduler:
+    """Keeps dbo.ServerInfo warm in the background.
+
+    - one daemon thread rescans every `interval` seconds
+    - trigger() asks for a scan now (e.g. /refresh); ignored while one runs
+    - single-flight: callers arriving while a scan runs share it instead of
+      starting another one against the fleet
+    - timed runs only in the process owning the scheduler's applock
+      (INV_SCHEDULER_APPLOCK), since every worker process starts one
+    """
+
+    def __init__(self, refresh_fn=scan_fleet, interval: int = INV_REFRESH_INTERVAL, name: str = "inventory-refresh"):
+        self._refresh_fn = refresh_fn
+        self.interval = interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._done = threading.Event()
+        self._thread = None
+        self._applock_conn = None
+
+        self.running = False
+        self.last_started = None
+        self.last_finished = None
+        self.last_summary = None
+        self.last_error = None
+
+    # ------------------------
+    # Public
+    # ------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def trigger(self):
+        """Request a scan as soon as possible (no-op if one is already running)."""
+        if self.running:
+            return
+        if self._thread is None:
+            threading.Thread(target=self.run_once, name=f"{self.name}-once", daemon=True).start()
+        else:
+            self._wakeup.set()
+
+    def run_once(self, wait: bool = True, timeout: float | None = None):
+        """Run a scan, or join the one in flight. Returns the latest summary."""
+        with self._lock:
+            leader = not self.running
+            if leader:
+                self.running = True
+                self._done.clear()
+                # A trigger() that raced this start is served by this run
+                self._wakeup.clear()
+
+        if not leader:
+            if wait:
+                self._done.wait(timeout)
+            return self.last_summary
+
+        self.last_started = datetime.now()
+        try:
+            self.last_summary = self._refresh_fn()
+            self.last_error = None
+        except Exception as ex:
+            self.last_error = str(ex)
+            print(f"[{self.name.upper().replace('-', '_')}] scan failed: {ex}")
+        finally:
+            self.last_finished = datetime.now()
+            with self._lock:
+                self.running = False
+                self._done.set()
+        return self.last_summary
+
+    def status(self) -> dict:
+        summary = self.last_summary or {}
+        return {
+            "running": self.running,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_error": self.last_error,
+            "servers": summary.get("servers"),
+            "online": summary.get("online"),
+            "offline": summary.get("offline"),
+            "elapsed": summary.get("elapsed"),
+        }
+
+    # ------------------------
+    # Thread
+    # ------------------------
+
+    def _owns_schedule(self) -> bool:
+        """True when this process should do the timed runs (holds the applock)."""
+        if not INV_SCHEDULER_APPLOCK:
+            return True
+        try:
+            if self._applock_conn is not None:
+                self._applock_conn.cursor().execute("SELECT 1;").fetchone()
+                return True
+        except Exception:
+            # Session lost: the lock went with it, try to take it again
+            self._applock_conn = None
+
+        try:
+            conn = get_inventory_connection()
+            rc = conn.cursor().execute(APPLOCK_SQL, (f"datasolvex:{self.name}",)).fetchone()[0]
+            conn.commit()
+        except Exception as ex:
+            print(f"[{self.name.upper().replace('-', '_')}] applock check failed, running locally: {ex}")
+            return True
+
+        if rc is not None and rc >= 0:
+            self._applock_conn = conn   # keep the session open to keep the lock
+            return True
+        conn.close()
+        return False
+
+    def _loop(self):
+        requested = False
+        while True:
+            if requested or self._owns_schedule():
+                self.run_once()
+            if self.interval > 0:
+                requested = self._wakeup.wait(self.interval)
+            else:
+                requested = self._wakeup.wait()
+            self._wakeup.clear()
+
+
+scheduler = RefreshScheduler()
+
+
+def snapshot_age_seconds(servers) -> float | None:
+    """Age of the newest LastScan among the listed servers (None if never scanned)."""
+    scans = [s.get("last_scan") for s in servers if s.get("last_scan")]
+    if not scans:
+        return None
+    newest = max(scans)
+    return max(0.0, (datetime.now() - newest).total_seconds())
+
+
+def format_age(seconds: float | None) -> str:
+    if seconds is None:
+        return "never"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s ago"
+    if seconds < 3600:
+        return f"{seconds // 60}m ago"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {(seconds % 3600) // 60}m ago"
+    return f"{seconds // 86400}d ago"
@@ -0,0 +1,124 @@
+# server_cache.py
+import os
+import threading
+import time
+
+from . import fleet_scanner
+from .fleet_scanner import get_inventory_connection, load_stored_drives
+
+# ---------- INVENTORY SERVER METADATA CACHE ----------
+#
+# dbo.ServerList (+ the ServerInfo row of each server) loaded with one query
+# and shared by every inventory module, so page lookups of a server's name /
+# environment / status do not open an inventory connection each time.
+# ServerList only changes through /server/add and /server/bulk-add, which call
+# invalidate_server_cache(); the ServerInfo columns and the stored drives
+# (dbo.ServerDrives) are reloaded after each fleet scan
+# (fleet_scanner.scan_generation) or after INV_SERVER_CACHE_TTL.
+SERVER_CACHE_TTL = int(os.getenv("INV_SERVER_CACHE_TTL", "900"))   # seconds
+SERVER_CACHE_MISS_RELOAD = 5   # seconds: an unknown id triggers at most one reload per window
+
+SERVERS_SQL = """
+SELECT
+    sl.ID              AS id,
+    sl.ServerName      AS name,
+    {environment}      AS environment,
+    si.Status          AS status,
+    si.SQLVersion      AS sql_version,
+    si.SQLEdition      AS sql_edition,
+    si.OSVersion       AS os_version,
+    si.TotalDatabases  AS total_databases,
+    si.TotalSizeGB     AS total_size_gb,
+    si.LastScan        AS last_scan,
+    si.LastRestart     AS last_restart
+FROM dbo.ServerList AS sl
+LEFT JOIN dbo.ServerInfo AS si
+     ON si.ServerID = sl.ID;
+"""
+
+_cache_lock = threading.Lock()
+_cache = {"generation": None, "loaded_at": 0.0, "servers": None, "has_environment": None}
+
+
+def _load_servers(cur) -> dict:
+    if _cache["has_environment"] is None:
+        # Environment is optional on older inventories (see add_server).
+        _cache["has_environment"] = cur.execute(
+            "SELECT COL_LENGTH('dbo.ServerList', 'Environment');"
+        ).fetchone()[0] is not None
+    environment = "sl.Environment" if _cache["has_environment"] else "CAST(NULL AS NVARCHAR(20))"
+
+    servers = {}
+    for row in cur.execute(SERVERS_SQL.format(environment=environment)).fetchall():
+        servers[int(row.id)] = {
+            "id": row.id,
+            "name": row.name,
+            "environment": (row.environment or "").strip().lower() or None,
+            "status": row.status or "UNKNOWN",
+            "sql_version": row.sql_version,
+            "sql_edition": row.sql_edition,
+            "os_version": row.os_version,
+            "total_databases": row.total_databases or 0,
+            "total_size_gb": float(row.total_size_gb or 0),
+            "last_scan": row.last_scan,
+            "last_restart": row.last_restart,
+            "drives": [],
+        }
+
+    for server_id, drives in load_stored_drives(cur).items():
+        if server_id in servers:
+            servers[server_id]["drives"] = drives
+    return servers
+
+
+def _servers(reload_for_id: int | None = None) -> dict:
+    """{server_id: server dict}; reloaded when invalidated, stale, or missing reload_for_id."""
+    with _cache_lock:
+        age = time.monotonic() - _cache["loaded_at"]
+        fresh = (
+            _cache["servers"] is not None
+            and _cache["generation"] == fleet_scanner.scan_generation
+            and age < SERVER_CACHE_TTL
+        )
+        if fresh and reload_for_id is not None and reload_for_id not in _cache["servers"]:
+            fresh = age < SERVER_CACHE_MISS_RELOAD
+        if fresh:
+            return _cache["servers"]
+
+        generation = fleet_scanner.scan_generation
+        conn = get_inventory_connection()
+        try:
+            servers = _load_servers(conn.cursor())
+        finally:
+            conn.close()
+
+        _cache.update(generation=generation, loaded_at=time.monotonic(), servers=servers)
+        return servers
+
+
+def invalidate_server_cache():
+    """Drop the cached server list (call after inserting/updating dbo.ServerList)."""
+    with _cache_lock:
+        _cache["servers"] = None
+
+
+def get_server_by_id(server_id: int) -> dict | None:
+    """The ServerList + ServerInfo row for this ID (a copy), or None."""
+    server = _servers(reload_for_id=server_id).get(server_id)
+    return dict(server) if server else None
+
+
+def get_server_name_by_id(server_id: int) -> str | None:
+    """Lookup ServerName from dbo.ServerList (cached)."""
+    server = _servers(reload_for_id=server_id).get(server_id)
+    return server["name"] if server else None
+
+
+def get_all_servers() -> list[dict]:
+    """Every ServerList + ServerInfo row with its stored drives (copies), ordered by name."""
+    return sorted((dict(s) for s in _servers().values()), key=lambda s: (s["name"] or "").lower())
+
+
+def list_servers() -> list[tuple[int, str]]:
+    """(id, name) for every server in dbo.ServerList (cached), ordered by name."""
+    return sorted(((sid, s["name"]) for sid, s in _servers().items()), key=lambda s: s[1])
@@ -3,8 +3,9 @@ import os
 import pyodbc
 from datetime import datetime
 from dotenv import load_dotenv
-import subprocess
-import json
+
+from .server_cache import get_server_name_by_id
+from .volume_collector import get_stored_volumes
 
 # Load the same .env as app.py
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
@@ -15,81 +16,6 @@ INV_DB_USER = os.getenv("INV_DB_USER")
 INV_DB_PASSWORD = os.getenv("INV_DB_PASSWORD")
 INV_DB_TRUSTED = (os.getenv("INV_DB_TRUSTED", "YES").upper() == "YES")
 
-# ------------------------
-# PowerShell helpers
-# ------------------------
-
-def _run_powershell(ps_command: str) -> tuple[int, str, str]:
-    """Run a PowerShell command on the Flask host and return (rc, stdout, stderr)."""
-    p = subprocess.run(
-        ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", ps_command],
-        capture_output=True,
-        text=True,
-    )
-    return p.returncode, (p.stdout or "").strip(), (p.stderr or "").strip()
-
-
-def _normalize_ps_json(out: str):
-    """ConvertTo-Json may return an object for 1 row; normalize to a list."""
-    if not out:
-        return []
-    data = json.loads(out)
-    if isinstance(data, dict):
-        return [data]
-    return data
-
-
-def fetch_all_volumes_win32(server_name: str) -> list[dict]:
-    """
-    Fetch all non-system Windows volumes from the target server using PowerShell remoting.
-
-    - Excludes EFI/system partitions via SystemVolume
-    - Keeps C:\\
-    - Returns the same keys your template already expects: mount_point, name, total_gb, free_gb, free_pct
-    """
-
-    ps = rf"""
-Invoke-Command -ComputerName '{server_name}' -ScriptBlock {{
-Get-CimInstance Win32_Volume |
-Where-Object {{
-    $_.Capacity -ne $null -and $_.Capacity -gt 0 -and
-    $_.SystemVolume -ne $true -and
-    ($_.DriveLetter -ne $null -or ($_.Name -match '^[A-Z]:\\$'))
-}} |
-Select-Object `
-  @{{n="Mount";e={{$_.Name}}}},
-  @{{n="DriveLetter";e={{$_.DriveLetter}}}},
-  @{{n="Label";e={{$_.Label}}}},
-  @{{n="FileSystem";e={{$_.FileSystem}}}},
-  @{{n="CapacityGB";e={{[math]::Round($_.Capacity/1GB,2)}}}},
-  @{{n="FreeGB";e={{[math]::Round($_.FreeSpace/1GB,2)}}}},
-  @{{n="FreePct";e={{[math]::Round(($_.FreeSpace*100.0)/$_.Capacity,2)}}}} |
-Sort-Object Mount |
-ConvertTo-Json -Depth 3
-}}
-"""
-
-    rc, out, err = _run_powershell(ps)
-    if rc != 0:
-        return []
-
-    try:
-        rows = _normalize_ps_json(out)
-    except Exception:
-        return []
-
-    volumes: list[dict] = []
-    for r in rows:
-        volumes.append({
-            "mount_point": (r.get("Mount") or "").strip(),
-            "name": (r.get("Label") or r.get("FileSystem") or None),
-            "total_gb": float(r.get("CapacityGB") or 0),
-            "free_gb": float(r.get("FreeGB") or 0),
-            "free_pct": float(r.get("FreePct") or 0),
-        })
-
-    return volumes
-
 
 def get_target_connection(server_name: str, database: str = "master"):
     """Connect to a *target* SQL Server from ServerList (not necessarily the inventory host)."""
@@ -115,15 +41,6 @@ def get_target_connection(server_name: str, database: str = "master"):
     return pyodbc.connect(conn_str)
 
 
-def get_server_name_by_id(server_id: int) -> str | None:
-    """Lookup ServerName from dbo.ServerList in the inventory DB."""
-    conn = get_inventory_connection()
-    cur = conn.cursor()
-    row = cur.execute("SELECT ServerName FROM dbo.ServerList WHERE ID = ?;", (server_id,)).fetchone()
-    conn.close()
-    return row.ServerName if row else None
-
-
 def get_sql_instance_connection(database: str = "master"):
     """
     Connect to the actual SQL instance (not the inventory DB),
@@ -279,81 +196,7 @@ ORDER BY size_gb DESC;
     }
 
 
-def get_inventory_connection():
-    """
-    Same helper as in app.py – duplicated here to avoid circular imports.
-    """
-    if not INV_DB_SERVER or not INV_DB_NAME:
-        raise RuntimeError("INV_DB_SERVER or INV_DB_NAME is not set in .env")
-
-    if INV_DB_TRUSTED:
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            "Trusted_Connection=yes;"
-        )
-    else:
-        if not INV_DB_USER or not INV_DB_PASSWORD:
-            raise RuntimeError("Using SQL auth but INV_DB_USER / INV_DB_PASSWORD not set")
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={INV_DB_SERVER};"
-            f"DATABASE={INV_DB_NAME};"
-            f"UID={INV_DB_USER};"
-            f"PWD={INV_DB_PASSWORD};"
-        )
-
-    return pyodbc.connect(conn_str)
-
-
-# ---------- BASIC SERVER ROW + DB LIST ----------
-
-def get_server_by_id(server_id: int):
-    """
-    Get the ServerList + ServerInfo row for this ID.
-    """
-    conn = get_inventory_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            sl.ID              AS id,
-            sl.ServerName      AS name,
-            si.Status          AS status,
-            si.SQLVersion      AS sql_version,
-            si.SQLEdition      AS sql_edition,
-            si.OSVersion       AS os_version,
-            si.TotalDatabases  AS total_databases,
-            si.TotalSizeGB     AS total_size_gb,
-            si.LastScan        AS last_scan,
-            si.LastRestart     AS last_restart
-        FROM dbo.ServerList AS sl
-        LEFT JOIN dbo.ServerInfo AS si
-             ON si.ServerID = sl.ID
-        WHERE sl.ID = ?
-        """,
-        (server_id,),
-    )
-    row = cur.fetchone()
-    conn.close()
-
-    if not row:
-        return None
-
-    return {
-        "id": row.id,
-        "name": row.name,
-        "status": row.status or "UNKNOWN",
-        "sql_version": row.sql_version,
-        "sql_edition": row.sql_edition,
-        "os_version": row.os_version,
-        "total_databases": row.total_databases or 0,
-        "total_size_gb": float(row.total_size_gb or 0),
-        "last_scan": row.last_scan,
-        "last_restart": row.last_restart,
-    }
-
+# ---------- DB LIST ----------
 
 def get_databases_for_server(server_id: int):
     """List databases for the *selected* server (not always the inventory host)."""
@@ -499,19 +342,9 @@ def get_server_metrics(server_id: int):
     identity["numa_nodes"] = sysinfo.numa_node_count
     identity["virtual_machine_type"] = None  # could be derived later
 
-    # ---- SQL memory used (for reference) ----
+    # ---- SQL memory used: filled from the metrics collector's store by the
+    # page (metrics_collector.get_server_metric_series), not read live here.
     sql_memory_used_gb = None
-    try:
-        cur.execute(
-            """
-            SELECT physical_memory_in_use_kb
-            FROM sys.dm_os_process_memory;
-            """
-        )
-        pm = cur.fetchone()
-        sql_memory_used_gb = (pm.physical_memory_in_use_kb or 0) / 1024.0 / 1024.0
-    except Exception:
-        sql_memory_used_gb = None
 
     # ---- Hardware & Capacity ----
     hardware = {
@@ -525,9 +358,11 @@ def get_server_metrics(server_id: int):
     }
 
     # Drives (all volumes on Windows, excluding EFI/System partitions)
-    # Preferred source: Win32_Volume via PowerShell remoting (shows all drives).
-    # Fallback: dm_os_volume_stats (only volumes that contain SQL files).   
-    vols = fetch_all_volumes_win32(server_name)
+    # Preferred source: Win32_Volume as last collected by volume_collector
+    # (last known values when the host is unreachable).
+    # Fallback: dm_os_volume_stats (only volumes that contain SQL files).
+    vols, vol_status = get_stored_volumes(server_id)
+    hardware["drives_status"] = vol_status
     if vols:
         hardware["drives"] = vols
     else:
@@ -0,0 +1,253 @@
+# server_onboarding.py
+import csv
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .fleet_scanner import get_inventory_connection, get_probe_connection
+from .server_cache import invalidate_server_cache
+
+# ---------- BULK SERVER ONBOARDING ----------
+#
+# /server/bulk-add tests a whole list of servers side by side (bounded pool,
+# short login timeout), streams one result per server as it completes, and
+# then inserts every reachable server into dbo.ServerList with one TVP call.
+ONBOARD_WORKERS = int(os.getenv("INV_ONBOARD_WORKERS", "32"))
+ONBOARD_CONNECT_TIMEOUT = int(os.getenv("INV_ONBOARD_CONNECT_TIMEOUT", "3"))   # login timeout (s)
+ONBOARD_MAX_SERVERS = int(os.getenv("INV_ONBOARD_MAX_SERVERS", "2000"))
+
+ENVIRONMENTS = ("prod", "test", "dev")
+
+ONBOARD_TYPE_DDL = """
+IF TYPE_ID(N'dbo.ServerOnboardType') IS NULL
+BEGIN
+    CREATE TYPE dbo.ServerOnboardType AS TABLE (
+        ServerName   NVARCHAR(256)  NOT NULL PRIMARY KEY,
+        Environment  NVARCHAR(20)   NULL
+    );
+END
+"""
+
+
+def _onboard_proc_ddl(has_environment: bool) -> str:
+    # dbo.ServerList.Environment is optional (add_server falls back without it).
+    env_insert = ", Environment" if has_environment else ""
+    env_select = ", s.Environment" if has_environment else ""
+    env_update = (
+        """
+        UPDATE sl
+        SET sl.Environment = s.Environment
+        FROM dbo.ServerList AS sl
+        JOIN @Servers AS s ON s.ServerName = sl.ServerName
+        WHERE s.Environment IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM @Added AS a WHERE a.ServerName = s.ServerName);
+        """
+        if has_environment else ""
+    )
+    return f"""
+    CREATE OR ALTER PROCEDURE dbo.usp_OnboardServers
+        @Servers dbo.ServerOnboardType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Added TABLE (ServerName NVARCHAR(256) NOT NULL PRIMARY KEY);
+
+        BEGIN TRANSACTION;
+
+        INSERT INTO dbo.ServerList (ServerName{env_insert})
+        OUTPUT inserted.ServerName INTO @Added (ServerName)
+        SELECT s.ServerName{env_select}
+        FROM @Servers AS s
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.ServerList AS sl WITH (UPDLOCK, HOLDLOCK)
+                          WHERE sl.ServerName = s.ServerName);
+        {env_update}
+        COMMIT TRANSACTION;
+
+        SELECT s.ServerName, MIN(sl.ID) AS ID,
+               CASE WHEN a.ServerName IS NULL THEN 0 ELSE 1 END AS Added
+        FROM @Servers AS s
+        JOIN dbo.ServerList AS sl ON sl.ServerName = s.ServerName
+        LEFT JOIN @Added AS a ON a.ServerName = s.ServerName
+        GROUP BY s.ServerName, a.ServerName;
+    END
+    """
+
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_onboarding_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        cur = inv_conn.cursor()
+        cur.execute(ONBOARD_TYPE_DDL)
+        has_environment = cur.execute(
+            "SELECT COL_LENGTH('dbo.ServerList', 'Environment');"
+        ).fetchone()[0] is not None
+        cur.execute(_onboard_proc_ddl(has_environment))
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Input
+# ------------------------
+
+def _normalize_env(value) -> str | None:
+    env = (value or "").strip().lower()
+    return env if env in ENVIRONMENTS else None
+
+
+def parse_server_list(items, default_env: str | None = None) -> list[tuple[str, str | None]]:
+    """(server_name, environment) pairs from JSON items (names or {server_name, environment}).
+
+    Blank names are dropped and duplicates (case-insensitive) keep the first entry.
+    """
+    default_env = _normalize_env(default_env)
+    seen = set()
+    entries = []
+    for item in items or []:
+        if isinstance(item, dict):
+            name = (item.get("server_name") or item.get("ServerName") or "").strip()
+            env = _normalize_env(item.get("environment")) or default_env
+        else:
+            name = str(item or "").strip()
+            env = default_env
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            entries.append((name, env))
+    return entries
+
+
+def parse_server_csv(text: str, default_env: str | None = None) -> list[tuple[str, str | None]]:
+    """Server entries from CSV text or a plain one-name-per-line list.
+
+    With a header row, the server_name (or ServerName / server) and environment
+    columns are used; without one, column 1 is the name and column 2 the
+    optional environment.
+    """
+    rows = [r for r in csv.reader(io.StringIO(text or "")) if any(c.strip() for c in r)]
+    if not rows:
+        return []
+
+    header = [c.strip().lower() for c in rows[0]]
+    name_col, env_col = 0, 1
+    for key in ("server_name", "servername", "server"):
+        if key in header:
+            name_col = header.index(key)
+            env_col = header.index("environment") if "environment" in header else None
+            rows = rows[1:]
+            break
+
+    items = []
+    for r in rows:
+        item = {"server_name": r[name_col] if name_col < len(r) else ""}
+        if env_col is not None and env_col < len(r):
+            item["environment"] = r[env_col]
+        items.append(item)
+    return parse_server_list(items, default_env)
+
+
+# ------------------------
+# Test + insert
+# ------------------------
+
+PROBE_SQL = """
+SELECT
+    @@SERVERNAME AS server_name,
+    CAST(SERVERPROPERTY('ProductVersion') AS NVARCHAR(50)) AS product_version,
+    CAST(SERVERPROPERTY('ProductLevel')   AS NVARCHAR(50)) AS product_level,
+    CAST(SERVERPROPERTY('Edition')        AS NVARCHAR(128)) AS edition;
+"""
+
+
+def probe_new_server(server_name: str, connect_timeout: int = ONBOARD_CONNECT_TIMEOUT) -> tuple[bool, str | None, dict]:
+    """(ok, error_message, details) for one candidate; same details as test_target_sql_server."""
+    try:
+        conn = get_probe_connection(server_name, connect_timeout=connect_timeout)
+        try:
+            row = conn.cursor().execute(PROBE_SQL).fetchone()
+        finally:
+            conn.close()
+    except Exception as ex:
+        return False, str(ex), {}
+
+    return True, None, {
+        "resolved_server_name": row.server_name if row else None,
+        "product_version": row.product_version if row else None,
+        "product_level": row.product_level if row else None,
+        "edition": row.edition if row else None,
+    }
+
+
+def insert_servers(entries: list[tuple[str, str | None]]) -> list[dict]:
+    """Insert missing servers in one call; [{server_name, id, added}] for every entry."""
+    conn = get_inventory_connection()
+    try:
+        ensure_onboarding_objects(conn)
+        cur = conn.cursor()
+        cur.execute("{CALL dbo.usp_OnboardServers (?)}", (list(entries),))
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_server_cache()
+
+    return [{"server_name": r.ServerName, "id": int(r.ID), "added": bool(r.Added)} for r in rows]
+
+
+def iter_onboarding(entries: list[tuple[str, str | None]], max_workers: int = ONBOARD_WORKERS):
+    """Yield one result dict per server as its test finishes, then a summary after the batch insert."""
+    t0 = time.monotonic()
+    reachable = []
+
+    if entries:
+        workers = max(1, min(max_workers, len(entries)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onboard") as pool:
+            futures = {
+                pool.submit(lambda n: (time.monotonic(), *probe_new_server(n)), name): (name, env)
+                for name, env in entries
+            }
+            for fut in as_completed(futures):
+                name, env = futures[fut]
+                started, ok, err, details = fut.result()
+                if ok:
+                    reachable.append((name, env))
+                yield {
+                    "type": "server",
+                    "server_name": name,
+                    "environment": env,
+                    "ok": ok,
+                    "message": err,
+                    "details": details,
+                    "elapsed": round(time.monotonic() - started, 3),
+                }
+
+    inserted, error = [], None
+    if reachable:
+        try:
+            inserted = insert_servers(reachable)
+        except Exception as ex:
+            print(f"[ONBOARD] insert failed: {ex}")
+            error = f"Failed to insert servers: {ex}"
+
+    yield {
+        "type": "summary",
+        "status": "error" if error else "ok",
+        "message": error,
+        "tested": len(entries),
+        "reachable": len(reachable),
+        "failed": len(entries) - len(reachable),
+        "added": [s for s in inserted if s["added"]],
+        "existing": [s for s in inserted if not s["added"]],
+        "elapsed": round(time.monotonic() - t0, 3),
+    }
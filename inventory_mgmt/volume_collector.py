@@ -0,0 +1,359 @@
+# volume_collector.py
+import json
+import os
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from .fleet_scanner import ensure_fleet_scan_objects, get_inventory_connection
+from .refresh_scheduler import RefreshScheduler
+
+# ---------- WINDOWS VOLUMES (Win32_Volume, collected in the background) ----------
+#
+# One PowerShell process per batch of hosts: Invoke-Command fans out to the
+# whole batch over WinRM in parallel and returns every volume tagged with its
+# PSComputerName. Results land in dbo.ServerVolumes with their collection
+# time; a host that does not answer keeps its last known volumes and only its
+# dbo.ServerVolumeStatus row records the failure. Pages read the table.
+VOLUME_INTERVAL = int(os.getenv("INV_VOLUME_INTERVAL", "1800"))          # seconds (0 = collector off)
+VOLUME_BATCH_SIZE = int(os.getenv("INV_VOLUME_BATCH_SIZE", "25"))        # hosts per PowerShell session
+VOLUME_SESSIONS = int(os.getenv("INV_VOLUME_SESSIONS", "4"))             # PowerShell processes at once
+VOLUME_THROTTLE = int(os.getenv("INV_VOLUME_THROTTLE", "16"))            # Invoke-Command -ThrottleLimit
+VOLUME_PS_TIMEOUT = int(os.getenv("INV_VOLUME_PS_TIMEOUT", "180"))       # whole batch (s)
+VOLUME_OPEN_TIMEOUT_MS = int(os.getenv("INV_VOLUME_OPEN_TIMEOUT_MS", "10000"))
+VOLUME_STALE_AFTER = int(os.getenv("INV_VOLUME_STALE_AFTER", str(3 * 3600)))
+
+# "powershell" (WinRM) or "stub" (no Windows needed: INV_VOLUME_STUB_FILE JSON
+# of {host: [{"Mount", "Label", "FileSystem", "Capacity", "Free"}]}, or
+# generated volumes when unset).
+VOLUME_SOURCE = os.getenv("INV_VOLUME_SOURCE", "powershell").lower()
+VOLUME_STUB_FILE = os.getenv("INV_VOLUME_STUB_FILE")
+
+VOLUME_DDL = [
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'ServerVolumes' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.ServerVolumes (
+            ServerID        INT            NOT NULL,
+            MountPoint      NVARCHAR(260)  NOT NULL,
+            Label           NVARCHAR(260)  NULL,
+            FileSystem      NVARCHAR(32)   NULL,
+            TotalBytes      BIGINT         NULL,
+            FreeBytes       BIGINT         NULL,
+            CollectedAt     DATETIME2(0)   NOT NULL,
+            CONSTRAINT PK_ServerVolumes PRIMARY KEY (ServerID, MountPoint)
+        );
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.tables WHERE name = 'ServerVolumeStatus' AND schema_id = SCHEMA_ID('dbo'))
+    BEGIN
+        CREATE TABLE dbo.ServerVolumeStatus (
+            ServerID        INT             NOT NULL CONSTRAINT PK_ServerVolumeStatus PRIMARY KEY,
+            LastAttemptAt   DATETIME2(0)    NOT NULL,
+            LastSuccessAt   DATETIME2(0)    NULL,
+            LastError       NVARCHAR(1000)  NULL
+        );
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerVolumesSnapshotType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerVolumesSnapshotType AS TABLE (
+            ServerID        INT            NOT NULL,
+            MountPoint      NVARCHAR(260)  NOT NULL,
+            Label           NVARCHAR(260)  NULL,
+            FileSystem      NVARCHAR(32)   NULL,
+            TotalBytes      BIGINT         NULL,
+            FreeBytes       BIGINT         NULL,
+            PRIMARY KEY (ServerID, MountPoint)
+        );
+    END
+    """,
+    """
+    IF TYPE_ID(N'dbo.ServerVolumeStatusType') IS NULL
+    BEGIN
+        CREATE TYPE dbo.ServerVolumeStatusType AS TABLE (
+            ServerID        INT             NOT NULL PRIMARY KEY,
+            Succeeded       BIT             NOT NULL,
+            Error           NVARCHAR(1000)  NULL
+        );
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE dbo.usp_ReplaceServerVolumes
+        @Status  dbo.ServerVolumeStatusType READONLY,
+        @Volumes dbo.ServerVolumesSnapshotType READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Now DATETIME2(0) = SYSDATETIME();
+
+        -- Only hosts that answered are replaced; the rest keep their last known volumes.
+        BEGIN TRAN;
+            DELETE v
+            FROM dbo.ServerVolumes AS v
+            JOIN @Status AS s ON s.ServerID = v.ServerID AND s.Succeeded = 1;
+
+            INSERT INTO dbo.ServerVolumes (ServerID, MountPoint, Label, FileSystem, TotalBytes, FreeBytes, CollectedAt)
+            SELECT ServerID, MountPoint, Label, FileSystem, TotalBytes, FreeBytes, @Now
+            FROM @Volumes;
+
+            MERGE dbo.ServerVolumeStatus AS tgt
+            USING @Status AS src
+                  ON tgt.ServerID = src.ServerID
+            WHEN MATCHED THEN
+                UPDATE SET
+                    tgt.LastAttemptAt = @Now,
+                    tgt.LastSuccessAt = CASE WHEN src.Succeeded = 1 THEN @Now ELSE tgt.LastSuccessAt END,
+                    tgt.LastError     = CASE WHEN src.Succeeded = 1 THEN NULL ELSE src.Error END
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT (ServerID, LastAttemptAt, LastSuccessAt, LastError)
+                VALUES (src.ServerID, @Now, CASE WHEN src.Succeeded = 1 THEN @Now END,
+                        CASE WHEN src.Succeeded = 0 THEN src.Error END);
+        COMMIT;
+    END
+    """,
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+
+def ensure_volume_objects(inv_conn):
+    global _ddl_done
+    if _ddl_done:
+        return
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        ensure_fleet_scan_objects(inv_conn)
+        cur = inv_conn.cursor()
+        for ddl in VOLUME_DDL:
+            cur.execute(ddl)
+        inv_conn.commit()
+        _ddl_done = True
+
+
+# ------------------------
+# Sources: {host: [raw volume]} + {host: error}
+# ------------------------
+
+def host_of(server_name: str) -> str:
+    """Windows host behind a SQL Server name: drops \\INSTANCE, ,port and tcp: prefixes."""
+    name = (server_name or "").strip()
+    if name.lower().startswith("tcp:"):
+        name = name[4:]
+    return name.split("\\")[0].split(",")[0].strip()
+
+
+def _ps_quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _batch_script(hosts: list[str]) -> str:
+    return rf"""
+$errs = @()
+$opt = New-PSSessionOption -OpenTimeout {VOLUME_OPEN_TIMEOUT_MS} -OperationTimeout {VOLUME_PS_TIMEOUT * 1000}
+$rows = Invoke-Command -ComputerName @({", ".join(_ps_quote(h) for h in hosts)}) -ThrottleLimit {VOLUME_THROTTLE} `
+    -SessionOption $opt -ErrorAction SilentlyContinue -ErrorVariable +errs -ScriptBlock {{
+    Get-CimInstance Win32_Volume |
+    Where-Object {{
+        $_.Capacity -ne $null -and $_.Capacity -gt 0 -and
+        $_.SystemVolume -ne $true -and
+        ($_.DriveLetter -ne $null -or ($_.Name -match '^[A-Z]:\\$'))
+    }} |
+    Select-Object Name, Label, FileSystem, Capacity, FreeSpace
+}}
+[pscustomobject]@{{
+    Volumes = @($rows | ForEach-Object {{ [pscustomobject]@{{
+        Host = $_.PSComputerName; Mount = $_.Name; Label = $_.Label; FileSystem = $_.FileSystem;
+        Capacity = [int64]$_.Capacity; Free = [int64]$_.FreeSpace }} }})
+    Failed = @($errs | ForEach-Object {{ [pscustomobject]@{{
+        Host = $(if ($_.OriginInfo) {{ $_.OriginInfo.PSComputerName }} else {{ [string]$_.TargetObject }});
+        Error = $_.Exception.Message }} }})
+}} | ConvertTo-Json -Depth 4 -Compress
+"""
+
+
+def _powershell_source(hosts: list[str]) -> tuple[dict, dict]:
+    try:
+        p = subprocess.run(
+            ["powershell", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass", "-Command", _batch_script(hosts)],
+            capture_output=True,
+            text=True,
+            timeout=VOLUME_PS_TIMEOUT + 30,
+        )
+    except (OSError, subprocess.TimeoutExpired) as ex:
+        return {}, {h.lower(): str(ex) for h in hosts}
+
+    try:
+        data = json.loads((p.stdout or "").strip() or "{}")
+    except ValueError:
+        err = (p.stderr or "").strip()[:1000] or f"powershell exited with {p.returncode}"
+        return {}, {h.lower(): err for h in hosts}
+
+    volumes, errors = {}, {}
+    for v in data.get("Volumes") or []:
+        volumes.setdefault((v.get("Host") or "").lower(), []).append(v)
+    for f in data.get("Failed") or []:
+        errors[(f.get("Host") or "").lower()] = (f.get("Error") or "")[:1000]
+    return volumes, errors
+
+
+def _stub_source(hosts: list[str]) -> tuple[dict, dict]:
+    """Local stand-in for WinRM: a JSON file per INV_VOLUME_STUB_FILE, else made-up volumes."""
+    if VOLUME_STUB_FILE:
+        with open(VOLUME_STUB_FILE, encoding="utf-8") as fh:
+            known = {k.lower(): v for k, v in json.load(fh).items()}
+        volumes = {h.lower(): known[h.lower()] for h in hosts if h.lower() in known}
+        errors = {h.lower(): "host not in stub file" for h in hosts if h.lower() not in known}
+        return volumes, errors
+
+    volumes = {}
+    for h in hosts:
+        seed = zlib.crc32(h.lower().encode("utf-8"))
+        volumes[h.lower()] = [
+            {"Mount": "C:\\", "Label": "OS", "FileSystem": "NTFS",
+             "Capacity": 128 * 1024 ** 3, "Free": (20 + seed % 60) * 1024 ** 3},
+            {"Mount": "D:\\", "Label": "Data", "FileSystem": "NTFS",
+             "Capacity": 1024 * 1024 ** 3, "Free": (50 + seed % 700) * 1024 ** 3},
+        ]
+    return volumes, {}
+
+
+_SOURCES = {"powershell": _powershell_source, "stub": _stub_source}
+
+
+# ------------------------
+# Collection
+# ------------------------
+
+def collect_volumes(max_sessions: int = VOLUME_SESSIONS, batch_size: int = VOLUME_BATCH_SIZE) -> dict:
+    """Collect Win32 volumes for every server in dbo.ServerList, in batched sessions.
+
+    Instances sharing a host share one remote call. Returns a summary shaped
+    like scan_fleet's: {servers, online, offline, elapsed}.
+    """
+    t0 = time.monotonic()
+    source = _SOURCES.get(VOLUME_SOURCE, _powershell_source)
+
+    inv_conn = get_inventory_connection()
+    try:
+        ensure_volume_objects(inv_conn)
+        servers = inv_conn.cursor().execute(
+            "SELECT ID, ServerName FROM dbo.ServerList ORDER BY ServerName;"
+        ).fetchall()
+    finally:
+        inv_conn.close()
+
+    by_host = {}
+    for s in servers:
+        host = host_of(str(s.ServerName))
+        if host:
+            by_host.setdefault(host.lower(), (host, []))[1].append(int(s.ID))
+
+    hosts = [h for h, _ in by_host.values()]
+    batches = [hosts[i:i + batch_size] for i in range(0, len(hosts), max(1, batch_size))]
+    volumes, errors = {}, {}
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_sessions, len(batches))), thread_name_prefix="volumes") as pool:
+            for v, e in pool.map(source, batches):
+                volumes.update(v)
+                errors.update(e)
+
+    status_rows, volume_rows = [], []
+    for key, (host, server_ids) in by_host.items():
+        rows = volumes.get(key)
+        for sid in server_ids:
+            if rows:
+                status_rows.append((sid, True, None))
+                seen = set()
+                for v in rows:
+                    mount = (v.get("Mount") or "").strip()
+                    if not mount or mount.lower() in seen:
+                        continue
+                    seen.add(mount.lower())
+                    volume_rows.append(
+                        (sid, mount, v.get("Label"), v.get("FileSystem"),
+                         int(v.get("Capacity") or 0), int(v.get("Free") or 0))
+                    )
+            else:
+                status_rows.append((sid, False, errors.get(key) or "no response"))
+
+    if status_rows:
+        inv_conn = get_inventory_connection()
+        try:
+            inv_conn.cursor().execute("{CALL dbo.usp_ReplaceServerVolumes (?, ?)}", (status_rows, volume_rows))
+            inv_conn.commit()
+        finally:
+            inv_conn.close()
+
+    online = sum(1 for r in status_rows if r[1])
+    return {
+        "servers": len(status_rows),
+        "online": online,
+        "offline": len(status_rows) - online,
+        "elapsed": round(time.monotonic() - t0, 3),
+    }
+
+
+collector = RefreshScheduler(refresh_fn=collect_volumes, interval=VOLUME_INTERVAL, name="volume-collector")
+
+
+def get_stored_volumes(server_id: int) -> tuple[list[dict], dict]:
+    """(volumes in server_detail's drive shape, status) for one server from the last collections.
+
+    status: {collected_at, last_attempt_at, last_error, stale}; stale means the
+    values are older than INV_VOLUME_STALE_AFTER or the last attempt failed.
+    """
+    conn = get_inventory_connection()
+    try:
+        ensure_volume_objects(conn)
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT MountPoint, Label, FileSystem, TotalBytes, FreeBytes, CollectedAt
+            FROM dbo.ServerVolumes
+            WHERE ServerID = ?
+            ORDER BY MountPoint;
+
+            SELECT LastAttemptAt, LastSuccessAt, LastError,
+                   DATEDIFF(SECOND, LastSuccessAt, SYSDATETIME()) AS age_seconds
+            FROM dbo.ServerVolumeStatus
+            WHERE ServerID = ?;
+            """,
+            (server_id, server_id),
+        )
+        rows = cur.fetchall()
+        cur.nextset()
+        st = cur.fetchone()
+    finally:
+        conn.close()
+
+    volumes = []
+    for r in rows:
+        total_gb = (r.TotalBytes or 0) / 1024.0 ** 3
+        free_gb = (r.FreeBytes or 0) / 1024.0 ** 3
+        volumes.append({
+            "mount_point": r.MountPoint,
+            "name": r.Label or r.FileSystem or None,
+            "total_gb": round(total_gb, 2),
+            "free_gb": round(free_gb, 2),
+            "free_pct": round(free_gb * 100.0 / total_gb, 2) if total_gb > 0 else None,
+        })
+
+    status = {
+        "collected_at": rows[0].CollectedAt if rows else None,
+        "last_attempt_at": st.LastAttemptAt if st else None,
+        "last_error": st.LastError if st else None,
+        "stale": bool(
+            st is not None
+            and (st.LastError is not None or st.age_seconds is None or st.age_seconds > VOLUME_STALE_AFTER)
+        ),
+    }
+    return volumes, status
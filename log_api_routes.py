@@ -0,0 +1,316 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request
+
+from log_common import (
+    OVERALL_ALLOWED_MODULES,
+    get_connection,
+    log_value_index,
+    map_page_to_module,
+    module_page_patterns,
+)
+from log_search import contains_predicate
+
+
+# ---------------------------------------------------------
+# Usage Analytics drill-down API (Blueprint)
+# Mounted under: /loganalytics-api/*  (admin-only via protect_loganalytics)
+#
+# - /logs         : keyset-paginated raw rows (seek on enter_time, id)
+# - /logs/export  : streaming CSV / NDJSON for large ranges
+#
+# Filters mirror log_dash.load_filtered_data (start, end, module, login, ip).
+# Imports only log_common, so this blueprint does not load pandas/dash.
+# Rows are read with a plain cursor; nothing is materialized in pandas.
+# Reads dbo.page_access_logs_all (hot + archived history, see log_retention).
+# ---------------------------------------------------------
+
+log_api_bp = Blueprint("log_api", __name__)
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 5000
+OVERALL_MODULE = "DataSolveX (overall)"
+ANONYMOUS_LOGINS = ("anonymous", "anon")
+
+EXPORT_COLUMNS = [
+    "id",
+    "login_name",
+    "client_ip",
+    "page",
+    "module_name",
+    "enter_time",
+    "exit_time",
+    "duration_seconds",
+]
+
+
+# ---------------------------------------------------------
+# FILTERS + CURSOR
+# ---------------------------------------------------------
+def _parse_dt(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid datetime: {value!r} (expected ISO 8601)")
+
+
+def read_filters(args):
+    """Read the drill-down filters from the query string."""
+    return {
+        "start": _parse_dt(args.get("start")),
+        "end": _parse_dt(args.get("end")),
+        "module": (args.get("module") or "").strip() or None,
+        "login": (args.get("login") or "").strip() or None,
+        "ip": (args.get("ip") or "").strip() or None,
+    }
+
+
+def encode_cursor(enter_time, row_id):
+    raw = f"{enter_time.isoformat()}|{int(row_id)}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (enter_time, id) from an opaque cursor, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        enter_iso, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(enter_iso), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _like_prefix(value):
+    """LIKE pattern matching strings that start with `value`."""
+    return value.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]") + "%"
+
+
+def module_predicate(module_name):
+    """SQL pre-filter on page for a module filter (None = no filter).
+
+    Built from log_common's page -> module tables: exact pages (optionally with
+    a query string) and page prefixes. It is a superset; module_for_row still
+    applies the exact Python mapping to each row.
+    """
+    if not module_name:
+        return None, []
+    modules = OVERALL_ALLOWED_MODULES if module_name == OVERALL_MODULE else {module_name}
+    exact, prefixes = module_page_patterns(modules)
+    if not exact and not prefixes:
+        return "1 = 0", []
+
+    clauses, params = [], []
+    if exact:
+        clauses.append(f"page IN ({', '.join('?' for _ in exact)})")
+        params.extend(exact)
+    for pattern in [_like_prefix(p + "?") for p in exact] + [_like_prefix(p) for p in prefixes]:
+        clauses.append("page LIKE ?")
+        params.append(pattern)
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def build_where(filters, after=None):
+    """SQL predicate + params matching load_filtered_data, plus the keyset seek."""
+    # load_filtered_data keeps NULL logins (fillna("")) and drops anonymous ones.
+    conditions = ["(login_name IS NULL OR LTRIM(RTRIM(login_name)) NOT IN (?, ?))"]
+    params = list(ANONYMOUS_LOGINS)
+
+    if filters.get("start"):
+        conditions.append("enter_time >= ?")
+        params.append(filters["start"])
+    if filters.get("end"):
+        conditions.append("exit_time <= ?")
+        params.append(filters["end"])
+    for column, key in (("login_name", "login"), ("ip_address", "ip")):
+        if filters.get(key):
+            sql, values = contains_predicate(log_value_index, column, filters[key])
+            conditions.append(sql)
+            params.extend(values)
+
+    module_sql, module_params = module_predicate(filters.get("module"))
+    if module_sql:
+        conditions.append(module_sql)
+        params.extend(module_params)
+
+    if after:
+        # Newest first: continue strictly below the last (enter_time, id) seen.
+        after_enter, after_id = after
+        conditions.append("(enter_time < ? OR (enter_time = ? AND id < ?))")
+        params.extend([after_enter, after_enter, after_id])
+
+    return " AND ".join(conditions), params
+
+
+def module_for_row(page, module_name):
+    """Module name for a row, or None when the module filter rejects it.
+
+    Page -> module mapping lives in Python (log_common.map_page_to_module); SQL
+    only pre-filters on page (module_predicate), the exact check runs here.
+    """
+    module = map_page_to_module(page)
+    if not module:
+        return None
+    if module_name == OVERALL_MODULE:
+        return module if module in OVERALL_ALLOWED_MODULES else None
+    if module_name and module != module_name:
+        return None
+    return module
+
+
+def _row_dict(row, module):
+    return {
+        "id": int(row.id),
+        "login_name": row.login_name,
+        "client_ip": row.ip_address,
+        "page": row.page,
+        "module_name": module,
+        "enter_time": row.enter_time.isoformat() if row.enter_time else None,
+        "exit_time": row.exit_time.isoformat() if row.exit_time else None,
+        "duration_seconds": row.duration_seconds,
+    }
+
+
+def iter_log_rows(filters, after=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield (row, module) newest-first, seeking batch by batch on (enter_time, id).
+
+    Each batch is its own short TOP (n) seek, so no long-running cursor holds
+    the log table while a client is slowly reading an export.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        while True:
+            where_clause, params = build_where(filters, after)
+            cur.execute(
+                f"""
+                SELECT TOP ({int(batch_size)})
+                    id,
+                    login_name,
+                    ip_address,
+                    page,
+                    enter_time,
+                    exit_time,
+                    duration_seconds
+                FROM dbo.page_access_logs_all
+                WHERE {where_clause}
+                ORDER BY enter_time DESC, id DESC;
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return
+
+            for row in rows:
+                module = module_for_row(row.page, filters.get("module"))
+                if module:
+                    yield row, module
+
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            after = (last.enter_time, last.id)
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------
+# ROUTES
+# ---------------------------------------------------------
+@log_api_bp.route("/logs", methods=["GET"])
+def list_logs():
+    """
+    GET /loganalytics-api/logs?start=&end=&module=&login=&ip=&limit=&cursor=
+    Returns JSON:
+      { rows: [...], next_cursor: "..." | null, limit: n }
+    """
+    try:
+        filters = read_filters(request.args)
+        after = decode_cursor(request.args.get("cursor"))
+        limit = int(request.args.get("limit") or DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    rows = []
+    last_row = None
+    has_more = False
+    # Fetch one extra so we know whether another page exists.
+    it = iter_log_rows(filters, after, batch_size=limit + 1)
+    try:
+        for row, module in it:
+            if len(rows) == limit:
+                has_more = True
+                break
+            rows.append(_row_dict(row, module))
+            last_row = row
+    except Exception as e:
+        print(f"[LOG_API] list_logs failed: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        it.close()
+
+    next_cursor = encode_cursor(last_row.enter_time, last_row.id) if has_more else None
+    return jsonify({"rows": rows, "next_cursor": next_cursor, "limit": limit})
+
+
+@log_api_bp.route("/logs/export", methods=["GET"])
+def export_logs():
+    """
+    GET /loganalytics-api/logs/export?format=csv|ndjson&start=&end=&module=&login=&ip=
+    Streams every matching row; memory stays at one batch.
+    """
+    fmt = (request.args.get("format") or "csv").strip().lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"status": "error", "message": "format must be csv or ndjson"}), 400
+
+    try:
+        filters = read_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def generate_csv():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(EXPORT_COLUMNS)
+        for row, module in iter_log_rows(filters):
+            d = _row_dict(row, module)
+            w.writerow([d[c] for c in EXPORT_COLUMNS])
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        yield buf.getvalue()
+
+    def generate_ndjson():
+        lines = []
+        for row, module in iter_log_rows(filters):
+            lines.append(json.dumps(_row_dict(row, module)))
+            if len(lines) >= 500:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if fmt == "csv":
+        body, mimetype = generate_csv(), "text/csv; charset=utf-8"
+    else:
+        body, mimetype = generate_ndjson(), "application/x-ndjson"
+
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f"attachment; filename=page_access_logs_{stamp}.{fmt}"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
@@ -0,0 +1,226 @@
+import os
+import time
+
+import pyodbc
+from dotenv import load_dotenv
+
+import log_retention
+from log_search import LogValueIndex
+
+
+# --------------------------------------------------
+# Shared, lightweight pieces of the log analytics feature
+# (no pandas / plotly / dash here, so the drill-down API and the
+# portal can import them without loading the dashboard stack).
+# --------------------------------------------------
+
+
+# --------------------------------------------------
+# ENV
+# --------------------------------------------------
+load_dotenv()
+ 
+DB_SERVER = os.getenv("DB_SERVER")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_TRUSTED = os.getenv("DB_TRUSTED", "YES").upper() == "YES"
+ 
+ 
+def get_connection():
+    """Return a pyodbc connection to SQL Server."""
+    if DB_TRUSTED:
+        conn_str = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={DB_SERVER};"
+            f"DATABASE={DB_NAME};"
+            "Trusted_Connection=yes;"
+        )
+    else:
+        conn_str = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={DB_SERVER};"
+            f"DATABASE={DB_NAME};"
+            f"UID={DB_USER};PWD={DB_PASSWORD};"
+        )
+    return pyodbc.connect(conn_str)
+ 
+ 
+# --------------------------------------------------
+# PAGE -> MODULE MAPPING (DISPLAY-ONLY)
+#
+# IMPORTANT:
+# - We still INSERT *all* raw pages into dbo.page_access_logs.
+# - In Log Analytics (this Dash app), we *DISPLAY* only coarse module names
+#   so the UI isn't polluted by per-object URLs and Dash asset bundle hits.
+# --------------------------------------------------
+
+# Hard ignores: show nothing / skip from analytics.
+# (We don't want Dash component bundles to become "top pages".)
+IGNORE_PREFIXES = (
+    "/loganalytics/_dash-component-suites/",
+)
+
+IGNORE_EXTENSIONS = (
+    ".js",
+    ".css",
+    ".map",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".ico",
+)
+
+
+# Exact pages (simple static routes)
+PAGE_TO_MODULE = {
+    # --- Landing / Server list ---
+
+    "/index": "index",
+    "/index.html": "index",
+
+    # --- Login ---
+    "/login": "login",
+    "/login.html": "login",
+
+    # --- Log analytics page itself ---
+    "/loganalytics": "loganalytics",
+    "/loganalytics/": "loganalytics",
+
+    # --- SQL Server main tools hub ---
+    "/sqlserver_main": "sql_server_main",
+    "/sqlserver_main.html": "sql_server_main",
+
+    # --- DB Refresh (main + staging are inside this tool) ---
+    "/dbrefresh": "dbrefresh",
+    "/dbrefresh.html": "dbrefresh",
+    "/dbpage": "dbrefresh",
+    "/dbpage.html": "dbrefresh",
+    "/database_page": "dbrefresh",
+    "/database_page.html": "dbrefresh",
+
+    # --- Login Creation ---
+    "/form": "login creation",
+    "/form.html": "login creation",
+
+    # --- Replication dashboard (summary + detail) ---
+    "/replication_dashboard": "replication dashboard",
+    "/replication_dashboard/summary": "replication dashboard",
+    "/replication_dashboard.html": "replication dashboard",
+    "/replication_dashboard/summary.html": "replication dashboard",
+
+    # If you still have the older /dashboard routes:
+    "/dashboard": "replication dashboard",
+    "/dashboard/summary": "replication dashboard",
+    "/dashboard.html": "replication dashboard",
+    "/dashboard/summary.html": "replication dashboard",
+
+    # --- Inventory landing route (you have /inventory too) ---
+    "/inventory": "inventory dashboard",
+    "/": "inventory dashboard",
+    "/server/" : "inventory dashboard",
+    "/environments.html" : "inventory dashboard",
+
+    #---userclone --
+    "/userclone/logging_defaults":"user clone",
+
+    #--- replication reinit
+    "/replication.html" : "replication reinit",
+}
+
+
+# Prefix mapping for dynamic URLs, checked in order after PAGE_TO_MODULE.
+PAGE_PREFIX_TO_MODULE = [
+    # Replication Reinitialization tool (Blueprint under /replication/...)
+    ("/replication/", "replication reinit"),
+    ("/replication.", "replication reinit"),
+    # Inventory Dashboard (server/db/object drilldowns)
+    ("/server/", "inventory dashboard"),
+    # User Clone tool
+    ("/userclone", "user clone"),
+    # SSIS tool
+    ("/ssis", "ssis"),
+    # Log analytics (Dash app area)
+    ("/loganalytics", "loganalytics"),
+    # Inventory tool (dynamic pages)
+    ("/inventory", "inventory dashboard"),
+]
+
+
+OVERALL_ALLOWED_MODULES = {
+    "sql_server_main",
+    "dbrefresh",
+    "replication dashboard",
+    "login creation",
+    "login",
+    "replication reinit",
+    "inventory dashboard",
+    "user clone",
+    "ssis",
+    "index",
+}
+
+
+def map_page_to_module(page: str) -> str | None:
+    """Return a coarse module name for analytics UI.
+
+    Returns:
+      - None   -> ignore this row in the Dash analytics (e.g., JS bundles)
+      - string -> module name to show
+    """
+
+    p = str(page).split("?", 1)[0].strip().lower()
+
+    # Ignore Dash bundle noise (but keep it inserted in DB)
+    for pref in IGNORE_PREFIXES:
+        if p.startswith(pref):
+            return None
+
+    for ext in IGNORE_EXTENSIONS:
+        if p.endswith(ext):
+            return None
+
+    # 1) exact mapping first
+    if p in PAGE_TO_MODULE:
+        return PAGE_TO_MODULE[p]
+
+    # 2) pattern mapping (dynamic URLs), first match wins
+    for prefix, module in PAGE_PREFIX_TO_MODULE:
+        if p.startswith(prefix):
+            return module
+    return None
+
+
+def module_page_patterns(modules) -> tuple[list[str], list[str]]:
+    """(exact pages, page prefixes) that can map to any of `modules`.
+
+    A superset of what map_page_to_module accepts (ignore rules and
+    first-match order are not applied), for pre-filtering rows in SQL.
+    """
+    modules = set(modules)
+    exact = [page for page, module in PAGE_TO_MODULE.items() if module in modules]
+    prefixes = [prefix for prefix, module in PAGE_PREFIX_TO_MODULE if module in modules]
+    return exact, prefixes
+
+
+# --------------------------------------------------
+# RETENTION CUTOFF + LOGIN/IP SEARCH INDEX
+# --------------------------------------------------
+_archived_before_cache = {"value": None, "loaded_at": 0.0}
+ARCHIVED_BEFORE_TTL_SECONDS = 300
+
+
+def get_archived_before():
+    """Start of the hot range in page_access_logs (cached; None = nothing archived)."""
+    now = time.monotonic()
+    if now - _archived_before_cache["loaded_at"] > ARCHIVED_BEFORE_TTL_SECONDS:
+        with get_connection() as conn:
+            _archived_before_cache["value"] = log_retention.get_archived_before(conn)
+        _archived_before_cache["loaded_at"] = now
+    return _archived_before_cache["value"]
+
+
+# Substring login/IP filters -> exact IN-lists (see log_search)
+log_value_index = LogValueIndex(get_connection)
@@ -1,7 +1,10 @@
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import date, datetime, timedelta
  
-import pyodbc
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -10,139 +13,17 @@ import plotly.graph_objects as go
 from dash import Dash, html, dcc
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
-from dotenv import load_dotenv
- 
- 
-# --------------------------------------------------
-# ENV
-# --------------------------------------------------
-load_dotenv()
- 
-DB_SERVER = os.getenv("DB_SERVER")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_TRUSTED = os.getenv("DB_TRUSTED", "YES").upper() == "YES"
- 
- 
-def get_connection():
-    """Return a pyodbc connection to SQL Server."""
-    if DB_TRUSTED:
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={DB_SERVER};"
-            f"DATABASE={DB_NAME};"
-            "Trusted_Connection=yes;"
-        )
-    else:
-        conn_str = (
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            f"SERVER={DB_SERVER};"
-            f"DATABASE={DB_NAME};"
-            f"UID={DB_USER};PWD={DB_PASSWORD};"
-        )
-    return pyodbc.connect(conn_str)
- 
- 
-# --------------------------------------------------
-# PAGE -> MODULE MAPPING (DISPLAY-ONLY)
-#
-# IMPORTANT:
-# - We still INSERT *all* raw pages into dbo.page_access_logs.
-# - In Log Analytics (this Dash app), we *DISPLAY* only coarse module names
-#   so the UI isn't polluted by per-object URLs and Dash asset bundle hits.
-# --------------------------------------------------
 
-# Hard ignores: show nothing / skip from analytics.
-# (We don't want Dash component bundles to become "top pages".)
-IGNORE_PREFIXES = (
-    "/loganalytics/_dash-component-suites/",
+from log_common import (
+    OVERALL_ALLOWED_MODULES,
+    get_archived_before,
+    get_connection,
+    log_value_index,
+    map_page_to_module,
 )
-
-IGNORE_EXTENSIONS = (
-    ".js",
-    ".css",
-    ".map",
-    ".png",
-    ".jpg",
-    ".jpeg",
-    ".gif",
-    ".svg",
-    ".ico",
-)
-
-
-# Exact pages (simple static routes)
-PAGE_TO_MODULE = {
-    # --- Landing / Server list ---
-
-    "/index": "index",
-    "/index.html": "index",
-
-    # --- Login ---
-    "/login": "login",
-    "/login.html": "login",
-
-    # --- Log analytics page itself ---
-    "/loganalytics": "loganalytics",
-    "/loganalytics/": "loganalytics",
-
-    # --- SQL Server main tools hub ---
-    "/sqlserver_main": "sql_server_main",
-    "/sqlserver_main.html": "sql_server_main",
-
-    # --- DB Refresh (main + staging are inside this tool) ---
-    "/dbrefresh": "dbrefresh",
-    "/dbrefresh.html": "dbrefresh",
-    "/dbpage": "dbrefresh",
-    "/dbpage.html": "dbrefresh",
-    "/database_page": "dbrefresh",
-    "/database_page.html": "dbrefresh",
-
-    # --- Login Creation ---
-    "/form": "login creation",
-    "/form.html": "login creation",
-
-    # --- Replication dashboard (summary + detail) ---
-    "/replication_dashboard": "replication dashboard",
-    "/replication_dashboard/summary": "replication dashboard",
-    "/replication_dashboard.html": "replication dashboard",
-    "/replication_dashboard/summary.html": "replication dashboard",
-
-    # If you still have the older /dashboard routes:
-    "/dashboard": "replication dashboard",
-    "/dashboard/summary": "replication dashboard",
-    "/dashboard.html": "replication dashboard",
-    "/dashboard/summary.html": "replication dashboard",
-
-    # --- Inventory landing route (you have /inventory too) ---
-    "/inventory": "inventory dashboard",
-    "/": "inventory dashboard",
-    "/server/" : "inventory dashboard",
-    "/environments.html" : "inventory dashboard",
-
-    #---userclone --
-    "/userclone/logging_defaults":"user clone",
-
-    #--- replication reinit
-    "/replication.html" : "replication reinit",
-}
-
-
-OVERALL_ALLOWED_MODULES = {
-    "sql_server_main",
-    "dbrefresh",
-    "replication dashboard",
-    "login creation",
-    "login",
-    "replication reinit",
-    "inventory dashboard",
-    "user clone",
-    "ssis",
-    "index",
-}
-
-
+from log_search import contains_predicate
+ 
+ 
 PLOT_FONT = '"Inter", system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Arial, sans-serif'
 
 def apply_plot_font(fig):
@@ -150,62 +31,6 @@ def apply_plot_font(fig):
     return fig
 
 
-
-
-def map_page_to_module(page: str) -> str | None:
-    """Return a coarse module name for analytics UI.
-
-    Returns:
-      - None   -> ignore this row in the Dash analytics (e.g., JS bundles)
-      - string -> module name to show
-    """
-
-    p = str(page).split("?", 1)[0].strip().lower()
-
-    # Ignore Dash bundle noise (but keep it inserted in DB)
-    for pref in IGNORE_PREFIXES:
-        if p.startswith(pref):
-            return None
-
-    for ext in IGNORE_EXTENSIONS:
-        if p.endswith(ext):
-            return None
-
-    # 1) exact mapping first
-    if p in PAGE_TO_MODULE:
-        return PAGE_TO_MODULE[p]
-
-    # 2) pattern mapping (dynamic URLs)
-    # Replication Reinitialization tool (Blueprint under /replication/...)
-    if p.startswith("/replication/"):
-        return "replication reinit"
-    
-    if p.startswith("/replication."):
-        return "replication reinit"
-
-    # Inventory Dashboard (server/db/object drilldowns)
-    if p.startswith("/server/"):
-        return "inventory dashboard"
-
-    # User Clone tool
-    if p.startswith("/userclone"):
-        return "user clone"
-
-    # SSIS tool
-    if p.startswith("/ssis"):
-        return "ssis"
-    
-    # Log analytics (Dash app area)
-    if p.startswith("/loganalytics"):
-        return "loganalytics"
-
-    # Inventory tool (dynamic pages)
-    if p.startswith("/inventory"):
-        return "inventory dashboard"
-
-
- 
- 
 # --------------------------------------------------
 # FILTER METADATA
 # --------------------------------------------------
@@ -221,6 +46,18 @@ def load_filter_options():
             """,
             conn,
         )
+
+        # Archived months only survive in the rollup
+        if get_archived_before():
+            archived = pd.read_sql("SELECT DISTINCT page FROM dbo.page_access_logs_daily;", conn)
+            pages = pd.concat([pages, archived], ignore_index=True)
+            oldest = pd.read_sql("SELECT MIN(log_date) AS min_date FROM dbo.page_access_logs_daily;", conn)
+            oldest_date = oldest["min_date"].iloc[0]
+            if pd.notna(oldest_date):
+                oldest_dt = pd.to_datetime(oldest_date)
+                current = date_bounds["min_enter"].iloc[0]
+                if pd.isna(current) or oldest_dt < pd.to_datetime(current):
+                    date_bounds.loc[0, "min_enter"] = oldest_dt
  
     modules_set = set()
     for p in pages["page"].dropna():
@@ -246,10 +83,29 @@ def load_filter_options():
 # --------------------------------------------------
 # CORE DATA LOAD
 # --------------------------------------------------
-def load_filtered_data(start_dt, end_dt, module_name, login_contains, ip_contains):
+def _text_filters(login_contains, ip_contains):
     conditions = []
     params = []
+    for column, term in (("login_name", login_contains), ("ip_address", ip_contains)):
+        if term:
+            sql, values = contains_predicate(log_value_index, column, term)
+            conditions.append(sql)
+            params.extend(values)
+    return conditions, params
+
 
+def load_filtered_data(start_dt, end_dt, module_name, login_contains, ip_contains):
+    """One row per session (weight ``sessions``) for the filters.
+
+    Raw rows come from the hot table; the part of the range before the
+    retention cutoff is read from the hourly rollup instead, one row per
+    (date, hour, login, ip, page) with ``sessions`` > 1.  Charts sum the
+    weight rather than counting rows.
+    """
+    text_conditions, text_params = _text_filters(login_contains, ip_contains)
+
+    conditions = list(text_conditions)
+    params = list(text_params)
     if start_dt:
         conditions.append("enter_time >= ?")
         params.append(start_dt)
@@ -257,14 +113,6 @@ def load_filtered_data(start_dt, end_dt, module_name, login_contains, ip_contain
         conditions.append("exit_time <= ?")
         params.append(end_dt)
 
-    if login_contains:
-        conditions.append("login_name LIKE ?")
-        params.append(f"%{login_contains}%")
-
-    if ip_contains:
-        conditions.append("ip_address LIKE ?")
-        params.append(f"%{ip_contains}%")
-
     where_clause = " AND ".join(conditions) or "1=1"
 
     sql = f"""
@@ -275,14 +123,51 @@ def load_filtered_data(start_dt, end_dt, module_name, login_contains, ip_contain
             enter_time,
             exit_time,
             duration_seconds,
-            CAST(enter_time AS date) AS log_date
+            CAST(enter_time AS date) AS log_date,
+            1 AS sessions
         FROM dbo.page_access_logs
         WHERE {where_clause};
     """
 
+    archived_before = get_archived_before()
+
     with get_connection() as conn:
         df = pd.read_sql(sql, conn, params=params)
 
+        if archived_before and (start_dt is None or start_dt < archived_before):
+            # Archived part of the range: hour-level rollup (exit time is not kept,
+            # so the end bound applies to the hour bucket start).
+            rollup_conditions = list(text_conditions) + ["log_date < ?"]
+            rollup_params = list(text_params) + [archived_before.date()]
+            if start_dt:
+                rollup_conditions.append("log_date >= ?")
+                rollup_params.append(start_dt.date())
+            if end_dt:
+                rollup_conditions.append("log_date <= ?")
+                rollup_params.append(end_dt.date())
+
+            rollup = pd.read_sql(
+                f"""
+                SELECT
+                    login_name,
+                    ip_address AS client_ip,
+                    page,
+                    DATEADD(hour, hour_of_day, CAST(log_date AS datetime)) AS enter_time,
+                    CAST(NULL AS datetime) AS exit_time,
+                    total_duration_seconds AS duration_seconds,
+                    log_date,
+                    sessions
+                FROM dbo.page_access_logs_daily
+                WHERE {" AND ".join(rollup_conditions)};
+                """,
+                conn,
+                params=rollup_params,
+            )
+            if start_dt is not None and not rollup.empty:
+                rollup = rollup[pd.to_datetime(rollup["enter_time"]) >= start_dt.replace(minute=0, second=0, microsecond=0)]
+            if not rollup.empty:
+                df = pd.concat([rollup, df], ignore_index=True) if not df.empty else rollup
+
     if not df.empty:
         df["module_name"] = df["page"].apply(map_page_to_module)
         df = df[df["module_name"].notna()]
@@ -406,6 +291,467 @@ def empty_fig(h=360):
     return fig
  
  
+# --------------------------------------------------
+# SERVER-SIDE DATASET HANDLE + FIGURE CACHE
+#
+# One filter state -> one dataset, loaded once and held in this process under
+# a content key.  The browser only carries the small handle (dcc.Store
+# "dataset-key"); tiles and every chart have their own callback that renders
+# from the shared frame and caches the resulting figure per (key, chart).
+# If a reload yields the same key, the store is left untouched, so no chart
+# is recomputed or re-serialized.
+# --------------------------------------------------
+DATASET_TTL_SECONDS = int(os.getenv("LOG_DASH_DATASET_TTL", "60"))
+EMPTY_DATASET_KEY = "empty"
+
+
+class _LRUCache:
+    """Small thread-safe LRU (Dash callbacks run concurrently on Flask threads)."""
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+
+_filter_cache = _LRUCache(64)    # filter state -> (loaded_at, dataset key)
+_dataset_cache = _LRUCache(16)   # dataset key  -> DataFrame
+_figure_cache = _LRUCache(256)   # (dataset key, chart id) -> figure dict / tiles
+
+
+def resolve_time_window(time_range, custom_start, custom_end):
+    """Turn the time-range dropdown into (start_dt, end_dt); (None, None) if unusable."""
+    if time_range == "custom":
+        if not custom_start or not custom_end:
+            return None, None
+        start_d = date.fromisoformat(custom_start)
+        end_d = date.fromisoformat(custom_end)
+        start_dt_obj = datetime.combine(start_d, datetime.min.time())
+        end_dt_obj = datetime.combine(end_d, datetime.max.time())
+    else:
+        now = datetime.now()
+        if time_range == "1h":
+            start_dt_obj = now - timedelta(hours=1)
+        elif time_range == "12h":
+            start_dt_obj = now - timedelta(hours=12)
+        elif time_range == "1d":
+            start_dt_obj = now - timedelta(days=1)
+        elif time_range == "1w":
+            start_dt_obj = now - timedelta(days=7)
+        elif time_range == "1m":
+            start_dt_obj = now - timedelta(days=30)
+        else:
+            start_dt_obj = now - timedelta(days=30)
+        end_dt_obj = now
+
+    if start_dt_obj > end_dt_obj:
+        return None, None
+    return start_dt_obj, end_dt_obj
+
+
+def _load_frame(filters):
+    start_dt, end_dt = resolve_time_window(
+        filters.get("time_range"), filters.get("custom_start"), filters.get("custom_end")
+    )
+    if start_dt is None:
+        return pd.DataFrame()
+
+    df = load_filtered_data(
+        start_dt, end_dt, filters.get("module_name"), filters.get("login_contains"), filters.get("ip_contains")
+    )
+    if df.empty:
+        return df
+
+    # Shared, read-only from here on: derive everything the charts need once.
+    df = df.copy()
+    df["enter_time"] = pd.to_datetime(df["enter_time"])
+    df["hour_of_day"] = df["enter_time"].dt.hour
+    return df
+
+
+def _frame_key(df):
+    """Content key for a frame (row order independent)."""
+    if df.empty:
+        return EMPTY_DATASET_KEY
+    hashes = pd.util.hash_pandas_object(df, index=False).sort_values().values
+    return f"{len(df)}-{hashlib.sha1(hashes.tobytes()).hexdigest()[:16]}"
+
+
+def load_dataset(time_range, custom_start, custom_end, module_name, login_contains, ip_contains, refresh_clicks):
+    """Load (or reuse) the dataset for one filter state and return its handle.
+
+    The handle keeps the filters too, so a worker that has evicted the frame
+    can rebuild it without another round-trip through the browser.
+    """
+    filters = {
+        "time_range": time_range,
+        "custom_start": custom_start,
+        "custom_end": custom_end,
+        "module_name": module_name,
+        "login_contains": login_contains,
+        "ip_contains": ip_contains,
+    }
+    filter_key = (time_range, custom_start, custom_end, module_name, login_contains, ip_contains, refresh_clicks)
+
+    hit = _filter_cache.get(filter_key)
+    if hit and time.monotonic() - hit[0] < DATASET_TTL_SECONDS and _dataset_cache.get(hit[1]) is not None:
+        return {"key": hit[1], "filters": filters}
+
+    df = _load_frame(filters)
+    key = _frame_key(df)
+    _dataset_cache.put(key, df)
+    _filter_cache.put(filter_key, (time.monotonic(), key))
+    return {"key": key, "filters": filters}
+
+
+def get_dataset(handle):
+    """Return the DataFrame behind a dataset handle (reloading it if evicted)."""
+    if not handle or handle.get("key") == EMPTY_DATASET_KEY:
+        return pd.DataFrame()
+
+    df = _dataset_cache.get(handle["key"])
+    if df is None:
+        df = _load_frame(handle.get("filters") or {})
+        _dataset_cache.put(_frame_key(df), df)
+    return df
+
+
+# --------------------------------------------------
+# CHART BUILDERS (one per graph; df is shared -> never mutate it)
+# Counts sum df["sessions"]: rollup rows stand for many sessions.
+# --------------------------------------------------
+def build_tiles(df):
+    total_sessions = int(df["sessions"].sum())
+    unique_users = df["login_name"].nunique()
+    total_duration_sec = df["duration_seconds"].sum()
+    total_usage_hours = round(total_duration_sec / 3600.0, 1) if pd.notna(total_duration_sec) else 0.0
+    unique_pages = df["page"].nunique()
+    unique_modules = df["module_name"].nunique()
+
+    return (
+        f"{total_sessions:,}",
+        str(unique_users),
+        f"{total_usage_hours:.1f}",
+        str(unique_pages),
+        str(unique_modules),
+    )
+
+
+EMPTY_TILES = ("0", "0", "0.0", "0", "0")
+
+
+def build_user_activity_fig(df):
+    # User Activity Over Time
+    daily = df.groupby("log_date")["sessions"].sum().reset_index(name="sessions").sort_values("log_date")
+    fig_daily = px.line(daily, x="log_date", y="sessions", markers=True, color_discrete_sequence=[BLUE_1])
+    fig_daily.update_traces(line=dict(width=3), marker=dict(size=7))
+    fig_daily.update_layout(xaxis_title="Date", yaxis_title="Sessions")
+    return apply_theme(fig_daily, height=360, legend="none", colorway=[BLUE_1])
+
+
+def build_top_users_fig(df):
+    # Top Users (Visits)
+    users = (
+        df.groupby("login_name")
+        .agg(visit_count=("sessions", "sum"), total_seconds=("duration_seconds", "sum"))
+        .reset_index()
+    )
+    users["total_minutes"] = users["total_seconds"] / 60.0
+    users = users.sort_values("visit_count", ascending=False).head(10)
+
+    fig_users = px.bar(
+        users,
+        x="visit_count",
+        y="login_name",
+        orientation="h",
+        text="visit_count",
+        hover_data={"total_minutes": ":.1f"},
+        color_discrete_sequence=[SLATE_1],
+    )
+    fig_users.update_layout(xaxis_title="Visits", yaxis_title="User", bargap=0.16)
+    fig_users.update_traces(cliponaxis=False)
+    fig_users.update_yaxes(autorange="reversed")
+    return apply_theme(fig_users, height=420, legend="none", colorway=[SLATE_1])
+
+
+def build_most_used_modules_fig(df):
+    # Most Used Modules (stacked): top modules + TOP 5 USERS ONLY + SMART Y-AXIS
+    TOP_MODULES = 6
+    TOP_USERS = 5
+
+    #  Top modules by total visits
+    mod_totals = (
+        df.groupby("module_name")["sessions"]
+        .sum()
+        .reset_index(name="total_visits")
+        .sort_values("total_visits", ascending=False)
+        .head(TOP_MODULES)
+    )
+
+    top_modules = mod_totals["module_name"].tolist()
+
+    # Visits per (module, user)
+    mod_user = (
+        df[df["module_name"].isin(top_modules)]
+        .groupby(["module_name", "login_name"])["sessions"]
+        .sum()
+        .reset_index(name="visits")
+    )
+
+    # Global TOP 5 users only
+    top_users = (
+        mod_user.groupby("login_name")["visits"]
+                .sum()
+                .sort_values(ascending=False)
+                .head(TOP_USERS)
+                .index
+                .tolist()
+    )
+
+    mod_user_top = mod_user[mod_user["login_name"].isin(top_users)]
+
+    # Order stacks consistently (largest contributor at bottom)
+    mod_user_top = mod_user_top.sort_values(
+        ["module_name", "visits"], ascending=[True, False]
+    )
+
+    # Total per module (for clean labels)
+    module_totals = (
+        mod_user_top.groupby("module_name")["visits"]
+                    .sum()
+                    .reindex(top_modules)
+    )
+
+    fig_most_modules = px.bar(
+        mod_user_top,
+        x="module_name",
+        y="visits",
+        color="login_name",
+        barmode="stack",
+        color_discrete_sequence=CAT_SERIES,
+    )
+
+    fig_most_modules.update_traces(
+        texttemplate="%{y}",
+        textposition="auto",
+        insidetextanchor="middle",
+        cliponaxis=False,
+        textfont=dict(size=10)   # reduce if still crowded
+    )
+
+    # ----------------------------
+    # VISUAL TUNING (THIS IS THE FIX)
+    # ----------------------------
+    fig_most_modules.update_layout(
+        xaxis_title="Module",
+        yaxis_title="Visits",
+        xaxis_tickangle=-15,
+        bargap=0.18,          # more breathing room
+        bargroupgap=0.06,
+        margin=dict(l=10, r=10, t=40, b=70),
+    )
+
+    # ❌ Kill per-segment labels (this is what ruins it)
+    fig_most_modules.update_traces(
+        text=mod_user_top["visits"],
+        textposition="inside",
+        insidetextanchor="middle",
+        cliponaxis=False
+    )
+
+    # ✅ add totals OUTSIDE (top of stack) using scatter text
+    fig_most_modules.add_trace(
+        go.Scatter(
+            x=top_modules,
+            y=module_totals.values,
+            text=[int(v) for v in module_totals.values],
+            mode="text",
+            textposition="top center",
+            showlegend=False,
+            hoverinfo="skip",
+        )
+    )
+
+    # ✅ Smart Y-axis headroom
+    max_y = float(module_totals.max()) if not module_totals.empty else 0.0
+    fig_most_modules.update_yaxes(range=[0, max_y * 1.25 if max_y else 1])
+
+    # Stable module order
+    fig_most_modules.update_xaxes(categoryorder="array", categoryarray=top_modules)
+
+    return apply_theme(
+        fig_most_modules,
+        height=400,
+        legend="v",
+        colorway=CAT_SERIES
+    )
+
+
+def build_module_flow_fig(df):
+    # Module Flow (donut)
+    modules_flow = (
+        df.groupby("module_name")["sessions"].sum().reset_index(name="visit_count").sort_values("visit_count", ascending=False)
+    )
+    fig_module_flow = px.pie(
+        modules_flow,
+        names="module_name",
+        values="visit_count",
+        hole=0.5,
+        color_discrete_sequence=[PRIMARY, SLATE_1, BLUE_2, INDIGO_1, SLATE_2, INDIGO_2, BLUE_1, SLATE_3],
+    )
+    return apply_theme(
+        fig_module_flow,
+        height=340,
+        legend="h",
+        colorway=[PRIMARY, SLATE_1, BLUE_2, INDIGO_1, SLATE_2, INDIGO_2, BLUE_1, SLATE_3],
+    )
+
+
+def build_ip_activity_fig(df):
+    # IP-wise Activity
+    ip_agg = (
+        df.groupby("client_ip")["sessions"]
+        .sum()
+        .reset_index(name="visit_count")
+        .sort_values("visit_count", ascending=False)
+        .head(10)
+    )
+    fig_ip = px.bar(
+        ip_agg,
+        x="visit_count",
+        y="client_ip",
+        orientation="h",
+        text="visit_count",
+        color_discrete_sequence=[INDIGO_1],
+    )
+    fig_ip.update_layout(xaxis_title="Visits", yaxis_title="IP address", bargap=0.16)
+    fig_ip.update_traces(cliponaxis=False)
+    fig_ip.update_yaxes(autorange="reversed")
+    return apply_theme(fig_ip, height=420, legend="none", colorway=[INDIGO_1])
+
+
+def build_avg_duration_fig(df):
+    # Total Usage per User (hours)
+    total_user = df.groupby("login_name").agg(total_seconds=("duration_seconds", "sum")).reset_index()
+    total_user["total_hours"] = (total_user["total_seconds"] / 3600.0).round(1)
+    total_user = total_user.sort_values("total_hours", ascending=False).head(15)
+
+    fig_avg = px.bar(
+        total_user,
+        x="total_hours",
+        y="login_name",
+        orientation="h",
+        text="total_hours",
+        color_discrete_sequence=[PRIMARY],
+    )
+    fig_avg.update_layout(xaxis_title="Total usage (hrs)", yaxis_title="User", bargap=0.16)
+    fig_avg.update_traces(texttemplate="%{text:.1f}", textposition="outside", cliponaxis=False)
+    fig_avg.update_yaxes(autorange="reversed")
+    return apply_theme(fig_avg, height=420, legend="none", colorway=[PRIMARY])
+
+
+def build_active_time_fig(df):
+    # Most Active Time of Day (hour_of_day is derived once in _load_frame)
+    hourly_agg = df.groupby("hour_of_day")["sessions"].sum().reset_index(name="hits").sort_values("hour_of_day")
+
+    fig_active_time = px.bar(
+        hourly_agg,
+        x="hour_of_day",
+        y="hits",
+        text="hits",
+        color_discrete_sequence=[BLUE_2],
+    )
+    fig_active_time.update_layout(xaxis_title="Hour of Day (0–23)", yaxis_title="Sessions", bargap=0.18)
+    fig_active_time.update_xaxes(dtick=1)
+    fig_active_time.update_traces(textposition="outside", cliponaxis=False)
+    return apply_theme(fig_active_time, height=360, legend="none", colorway=[BLUE_2])
+
+
+def build_module_hours_fig(df):
+    # Module Usage Hours
+    module_hours = df.groupby("module_name")["duration_seconds"].sum().reset_index(name="total_seconds")
+    module_hours["total_hours"] = module_hours["total_seconds"] / 3600.0
+    module_hours = module_hours.sort_values("total_hours", ascending=False).head(10)
+
+    fig_module_hours = px.bar(
+        module_hours,
+        x="module_name",
+        y="total_hours",
+        text=module_hours["total_hours"].round(1),
+        color_discrete_sequence=[SLATE_2],
+    )
+    fig_module_hours.update_layout(
+        xaxis_title="Module",
+        yaxis_title="Usage (hours)",
+        xaxis_tickangle=-20,
+        bargap=0.16,
+    )
+    fig_module_hours.update_traces(textposition="outside", cliponaxis=False)
+    fig_module_hours.update_xaxes(categoryorder="array", categoryarray=module_hours["module_name"].tolist())
+    return apply_theme(fig_module_hours, height=400, legend="none", colorway=[SLATE_2])
+
+
+# graph id -> (modal title, title element id, builder)
+CHARTS = {
+    "user-activity-chart": ("User Activity Over Time", "title-user-activity", build_user_activity_fig),
+    "most-used-modules-chart": ("Most Used Modules (Visits)", "title-most-used-modules", build_most_used_modules_fig),
+    "active-time-chart": ("Most Active Time of Day", "title-active-time", build_active_time_fig),
+    "module-flow-chart": ("Module Flow (Hits by Module)", "title-module-flow", build_module_flow_fig),
+    "module-hours-chart": ("Module Usage (Hours) in Selected Period", "title-module-hours", build_module_hours_fig),
+    "top-users-chart": ("Top Users (by Visits)", "title-top-users", build_top_users_fig),
+    "avg-duration-chart": ("Total Usage per User (hours)", "title-avg-duration", build_avg_duration_fig),
+    "ip-activity-chart": ("IP-wise Activity", "title-ip-activity", build_ip_activity_fig),
+}
+
+
+def get_tiles(handle):
+    key = (handle or {}).get("key") or EMPTY_DATASET_KEY
+    if key == EMPTY_DATASET_KEY:
+        return EMPTY_TILES
+
+    cached = _figure_cache.get((key, "tiles"))
+    if cached is not None:
+        return cached
+
+    df = get_dataset(handle)
+    if df.empty:
+        return EMPTY_TILES
+    return _figure_cache.put((key, "tiles"), build_tiles(df))
+
+
+def get_chart_figure(handle, graph_id):
+    """Figure dict for one chart, built at most once per dataset key."""
+    key = (handle or {}).get("key") or EMPTY_DATASET_KEY
+    if key == EMPTY_DATASET_KEY or graph_id not in CHARTS:
+        return empty_fig(340).to_dict()
+
+    cached = _figure_cache.get((key, graph_id))
+    if cached is not None:
+        return cached
+
+    df = get_dataset(handle)
+    if df.empty:
+        return empty_fig(340).to_dict()
+
+    _title, _title_id, builder = CHARTS[graph_id]
+    return _figure_cache.put((key, graph_id), builder(df).to_dict())
+ 
+ 
 # --------------------------------------------------
 # UI HELPERS
 # --------------------------------------------------
@@ -868,6 +1214,9 @@ def create_log_dash(flask_app):
             # store which chart is currently opened in modal
             dcc.Store(id="modal-chart-key", data=""),
  
+            # handle of the server-side dataset for the current filters
+            dcc.Store(id="dataset-key", data=None),
+ 
             # --------------------------------------------------
             # STICKY HEADER + BREADCRUMB
             # --------------------------------------------------
@@ -1124,21 +1473,7 @@ def create_log_dash(flask_app):
         return {"display": "block", "marginTop": "10px"} if range_value == "custom" else {"display": "none"}
  
     @dash_app.callback(
-        [
-            Output("tile-sessions", "children"),
-            Output("tile-users", "children"),
-            Output("tile-avg-duration", "children"),
-            Output("tile-pages", "children"),
-            Output("tile-modules", "children"),
-            Output("user-activity-chart", "figure"),
-            Output("top-users-chart", "figure"),
-            Output("most-used-modules-chart", "figure"),
-            Output("module-flow-chart", "figure"),
-            Output("ip-activity-chart", "figure"),
-            Output("avg-duration-chart", "figure"),
-            Output("active-time-chart", "figure"),
-            Output("module-hours-chart", "figure"),
-        ],
+        Output("dataset-key", "data"),
         [
             Input("filter-time-range", "value"),
             Input("filter-custom-range", "start_date"),
@@ -1148,303 +1483,35 @@ def create_log_dash(flask_app):
             Input("filter-ip", "value"),
             Input("btn-refresh", "n_clicks"),
         ],
+        State("dataset-key", "data"),
     )
-    def update_dashboard(time_range, custom_start, custom_end, module_name, login_contains, ip_contains, _refresh):
-        # Time window
-        if time_range == "custom":
-            if not custom_start or not custom_end:
-                e = empty_fig(340)
-                return ("0", "0", "0.0", "0", "0", e, e, e, e, e, e, e, e)
- 
-            start_d = date.fromisoformat(custom_start)
-            end_d = date.fromisoformat(custom_end)
-            start_dt_obj = datetime.combine(start_d, datetime.min.time())
-            end_dt_obj = datetime.combine(end_d, datetime.max.time())
-        else:
-            now = datetime.now()
-            if time_range == "1h":
-                start_dt_obj = now - timedelta(hours=1)
-            elif time_range == "12h":
-                start_dt_obj = now - timedelta(hours=12)
-            elif time_range == "1d":
-                start_dt_obj = now - timedelta(days=1)
-            elif time_range == "1w":
-                start_dt_obj = now - timedelta(days=7)
-            elif time_range == "1m":
-                start_dt_obj = now - timedelta(days=30)
-            else:
-                start_dt_obj = now - timedelta(days=30)
-            end_dt_obj = now
- 
-        if start_dt_obj > end_dt_obj:
-            e = empty_fig(340)
-            return ("0", "0", "0.0", "0", "0", e, e, e, e, e, e, e, e)
- 
-        df = load_filtered_data(start_dt_obj, end_dt_obj, module_name, login_contains, ip_contains)
-        if df.empty:
-            e = empty_fig(340)
-            return ("0", "0", "0.0", "0", "0", e, e, e, e, e, e, e, e)
- 
-        total_sessions = len(df)
-        unique_users = df["login_name"].nunique()
-        total_duration_sec = df["duration_seconds"].sum()
-        total_usage_hours = round(total_duration_sec / 3600.0, 1) if pd.notna(total_duration_sec) else 0.0
-        unique_pages = df["page"].nunique()
-        unique_modules = df["module_name"].nunique()
- 
-        # User Activity Over Time
-        daily = df.groupby("log_date").size().reset_index(name="sessions").sort_values("log_date")
-        fig_daily = px.line(daily, x="log_date", y="sessions", markers=True, color_discrete_sequence=[BLUE_1])
-        fig_daily.update_traces(line=dict(width=3), marker=dict(size=7))
-        fig_daily.update_layout(xaxis_title="Date", yaxis_title="Sessions")
-        fig_daily = apply_theme(fig_daily, height=360, legend="none", colorway=[BLUE_1])
- 
-        # Top Users (Visits)
-        users = (
-            df.groupby("login_name")
-            .agg(visit_count=("login_name", "size"), total_seconds=("duration_seconds", "sum"))
-            .reset_index()
-        )
-        users["total_minutes"] = users["total_seconds"] / 60.0
-        users = users.sort_values("visit_count", ascending=False).head(10)
- 
-        fig_users = px.bar(
-            users,
-            x="visit_count",
-            y="login_name",
-            orientation="h",
-            text="visit_count",
-            hover_data={"total_minutes": ":.1f"},
-            color_discrete_sequence=[SLATE_1],
-        )
-        fig_users.update_layout(xaxis_title="Visits", yaxis_title="User", bargap=0.16)
-        fig_users.update_traces(cliponaxis=False)
-        fig_users.update_yaxes(autorange="reversed")
-        fig_users = apply_theme(fig_users, height=420, legend="none", colorway=[SLATE_1])
- 
-        # Most Used Modules (stacked): top modules + TOP 5 USERS ONLY + SMART Y-AXIS
-        TOP_MODULES = 6
-        TOP_USERS = 5
- 
-        #  Top modules by total visits
-        mod_totals = (
-            df.groupby("module_name")
-            .size()
-            .reset_index(name="total_visits")
-            .sort_values("total_visits", ascending=False)
-            .head(TOP_MODULES)
-        )
- 
-        top_modules = mod_totals["module_name"].tolist()
- 
-        # Visits per (module, user)
-        mod_user = (
-            df[df["module_name"].isin(top_modules)]
-            .groupby(["module_name", "login_name"])
-            .size()
-            .reset_index(name="visits")
-        )
- 
-        # Global TOP 5 users only
-        top_users = (
-            mod_user.groupby("login_name")["visits"]
-                    .sum()
-                    .sort_values(ascending=False)
-                    .head(TOP_USERS)
-                    .index
-                    .tolist()
-        )
- 
-        mod_user_top = mod_user[mod_user["login_name"].isin(top_users)]
- 
-        # Order stacks consistently (largest contributor at bottom)
-        mod_user_top = mod_user_top.sort_values(
-            ["module_name", "visits"], ascending=[True, False]
-        )
- 
-        # Total per module (for clean labels)
-        module_totals = (
-            mod_user_top.groupby("module_name")["visits"]
-                        .sum()
-                        .reindex(top_modules)
-        )
- 
-        fig_most_modules = px.bar(
-            mod_user_top,
-            x="module_name",
-            y="visits",
-            color="login_name",
-            barmode="stack",
-            color_discrete_sequence=CAT_SERIES,
-        )
- 
-        fig_most_modules.update_traces(
-            texttemplate="%{y}",
-            textposition="auto",
-            insidetextanchor="middle",
-            cliponaxis=False,
-            textfont=dict(size=10)   # reduce if still crowded
-        )
- 
-        # ----------------------------
-        # VISUAL TUNING (THIS IS THE FIX)
-        # ----------------------------
-        fig_most_modules.update_layout(
-            xaxis_title="Module",
-            yaxis_title="Visits",
-            xaxis_tickangle=-15,
-            bargap=0.18,          # more breathing room
-            bargroupgap=0.06,
-            margin=dict(l=10, r=10, t=40, b=70),
-        )
- 
-        # ❌ Kill per-segment labels (this is what ruins it)
-        fig_most_modules.update_traces(
-            text=mod_user_top["visits"],
-            textposition="inside",
-            insidetextanchor="middle",
-            cliponaxis=False
-        )
- 
-        # ✅ add totals OUTSIDE (top of stack) using scatter text
-        fig_most_modules.add_trace(
-            go.Scatter(
-                x=top_modules,
-                y=module_totals.values,
-                text=[int(v) for v in module_totals.values],
-                mode="text",
-                textposition="top center",
-                showlegend=False,
-                hoverinfo="skip",
-            )
-)
+    def select_dataset(time_range, custom_start, custom_end, module_name, login_contains, ip_contains, refresh, current):
+        handle = load_dataset(time_range, custom_start, custom_end, module_name, login_contains, ip_contains, refresh)
+        # Same data as what is on screen -> leave every chart alone
+        if current and current.get("key") == handle["key"]:
+            raise PreventUpdate
+        return handle
  
-        # ✅ Smart Y-axis headroom
-        max_y = float(module_totals.max()) if not module_totals.empty else 0.0
-        fig_most_modules.update_yaxes(range=[0, max_y * 1.25 if max_y else 1])
+    @dash_app.callback(
+        [
+            Output("tile-sessions", "children"),
+            Output("tile-users", "children"),
+            Output("tile-avg-duration", "children"),
+            Output("tile-pages", "children"),
+            Output("tile-modules", "children"),
+        ],
+        Input("dataset-key", "data"),
+    )
+    def update_tiles(handle):
+        return get_tiles(handle)
  
-        # Stable module order
-        fig_most_modules.update_xaxes(categoryorder="array", categoryarray=top_modules)
+    def _register_chart_callback(graph_id):
+        @dash_app.callback(Output(graph_id, "figure"), Input("dataset-key", "data"))
+        def update_chart(handle):
+            return get_chart_figure(handle, graph_id)
  
-        fig_most_modules = apply_theme(
-            fig_most_modules,
-            height=400,
-            legend="v",
-            colorway=CAT_SERIES
-        )
- 
-        # Module Flow (donut)
-        modules_flow = (
-            df.groupby("module_name").size().reset_index(name="visit_count").sort_values("visit_count", ascending=False)
-        )
-        fig_module_flow = px.pie(
-            modules_flow,
-            names="module_name",
-            values="visit_count",
-            hole=0.5,
-            color_discrete_sequence=[PRIMARY, SLATE_1, BLUE_2, INDIGO_1, SLATE_2, INDIGO_2, BLUE_1, SLATE_3],
-        )
-        fig_module_flow = apply_theme(
-            fig_module_flow,
-            height=340,
-            legend="h",
-            colorway=[PRIMARY, SLATE_1, BLUE_2, INDIGO_1, SLATE_2, INDIGO_2, BLUE_1, SLATE_3],
-        )
- 
-        # IP-wise Activity
-        ip_agg = (
-            df.groupby("client_ip")
-            .size()
-            .reset_index(name="visit_count")
-            .sort_values("visit_count", ascending=False)
-            .head(10)
-        )
-        fig_ip = px.bar(
-            ip_agg,
-            x="visit_count",
-            y="client_ip",
-            orientation="h",
-            text="visit_count",
-            color_discrete_sequence=[INDIGO_1],
-        )
-        fig_ip.update_layout(xaxis_title="Visits", yaxis_title="IP address", bargap=0.16)
-        fig_ip.update_traces(cliponaxis=False)
-        fig_ip.update_yaxes(autorange="reversed")
-        fig_ip = apply_theme(fig_ip, height=420, legend="none", colorway=[INDIGO_1])
- 
-        # Total Usage per User (hours)
-        total_user = df.groupby("login_name").agg(total_seconds=("duration_seconds", "sum")).reset_index()
-        total_user["total_hours"] = (total_user["total_seconds"] / 3600.0).round(1)
-        total_user = total_user.sort_values("total_hours", ascending=False).head(15)
- 
-        fig_avg = px.bar(
-            total_user,
-            x="total_hours",
-            y="login_name",
-            orientation="h",
-            text="total_hours",
-            color_discrete_sequence=[PRIMARY],
-        )
-        fig_avg.update_layout(xaxis_title="Total usage (hrs)", yaxis_title="User", bargap=0.16)
-        fig_avg.update_traces(texttemplate="%{text:.1f}", textposition="outside", cliponaxis=False)
-        fig_avg.update_yaxes(autorange="reversed")
-        fig_avg = apply_theme(fig_avg, height=420, legend="none", colorway=[PRIMARY])
- 
-        # Most Active Time of Day
-        df["enter_time"] = pd.to_datetime(df["enter_time"])
-        hourly = df.copy()
-        hourly["hour_of_day"] = hourly["enter_time"].dt.hour
-        hourly_agg = hourly.groupby("hour_of_day").size().reset_index(name="hits").sort_values("hour_of_day")
- 
-        fig_active_time = px.bar(
-            hourly_agg,
-            x="hour_of_day",
-            y="hits",
-            text="hits",
-            color_discrete_sequence=[BLUE_2],
-        )
-        fig_active_time.update_layout(xaxis_title="Hour of Day (0–23)", yaxis_title="Sessions", bargap=0.18)
-        fig_active_time.update_xaxes(dtick=1)
-        fig_active_time.update_traces(textposition="outside", cliponaxis=False)
-        fig_active_time = apply_theme(fig_active_time, height=360, legend="none", colorway=[BLUE_2])
- 
-        # Module Usage Hours
-        module_hours = df.groupby("module_name")["duration_seconds"].sum().reset_index(name="total_seconds")
-        module_hours["total_hours"] = module_hours["total_seconds"] / 3600.0
-        module_hours = module_hours.sort_values("total_hours", ascending=False).head(10)
- 
-        fig_module_hours = px.bar(
-            module_hours,
-            x="module_name",
-            y="total_hours",
-            text=module_hours["total_hours"].round(1),
-            color_discrete_sequence=[SLATE_2],
-        )
-        fig_module_hours.update_layout(
-            xaxis_title="Module",
-            yaxis_title="Usage (hours)",
-            xaxis_tickangle=-20,
-            bargap=0.16,
-        )
-        fig_module_hours.update_traces(textposition="outside", cliponaxis=False)
-        fig_module_hours.update_xaxes(categoryorder="array", categoryarray=module_hours["module_name"].tolist())
-        fig_module_hours = apply_theme(fig_module_hours, height=400, legend="none", colorway=[SLATE_2])
- 
-        return (
-            f"{total_sessions:,}",
-            str(unique_users),
-            f"{total_usage_hours:.1f}",
-            str(unique_pages),
-            str(unique_modules),
-            fig_daily,
-            fig_users,
-            fig_most_modules,
-            fig_module_flow,
-            fig_ip,
-            fig_avg,
-            fig_active_time,
-            fig_module_hours,
-        )
+    for graph_id in CHARTS:
+        _register_chart_callback(graph_id)
  
     # --------------------------------------------------
     # MODAL OPEN/CLOSE + FIGURE POPULATION
@@ -1476,16 +1543,7 @@ def create_log_dash(flask_app):
             Input("graph-modal-close", "n_clicks"),
             Input("graph-modal-backdrop", "n_clicks"),
         ],
-        [
-            State("user-activity-chart", "figure"),
-            State("most-used-modules-chart", "figure"),
-            State("active-time-chart", "figure"),
-            State("module-flow-chart", "figure"),
-            State("module-hours-chart", "figure"),
-            State("top-users-chart", "figure"),
-            State("avg-duration-chart", "figure"),
-            State("ip-activity-chart", "figure"),
-        ],
+        State("dataset-key", "data"),
         prevent_initial_call=True,
     )
     def handle_modal(
@@ -1498,7 +1556,7 @@ def create_log_dash(flask_app):
         c7, c7fs,
         c8, c8fs,
         c_close, c_backdrop,
-        fig1, fig2, fig3, fig4, fig5, fig6, fig7, fig8,
+        handle,
     ):
         from dash import callback_context
  
@@ -1513,25 +1571,18 @@ def create_log_dash(flask_app):
  
         key = trig.replace("-fs", "")
  
-        mapping = {
-            "title-user-activity": ("User Activity Over Time", fig1),
-            "title-most-used-modules": ("Most Used Modules (Visits)", fig2),
-            "title-active-time": ("Most Active Time of Day", fig3),
-            "title-module-flow": ("Module Flow (Hits by Module)", fig4),
-            "title-module-hours": ("Module Usage (Hours) in Selected Period", fig5),
-            "title-top-users": ("Top Users (by Visits)", fig6),
-            "title-avg-duration": ("Total Usage per User (hours)", fig7),
-            "title-ip-activity": ("IP-wise Activity", fig8),
-        }
- 
-        title, fig = mapping.get(key, ("", {}))
+        title, fig = "", {}
+        for graph_id, (chart_title, title_id, _builder) in CHARTS.items():
+            if title_id == key:
+                title, fig = chart_title, get_chart_figure(handle, graph_id)
+                break
         if not fig:
-            fig = empty_fig(520)
+            fig = empty_fig(520).to_dict()
  
         # Modal sizing (bigger)
         try:
             fig = dict(fig)
-            fig.setdefault("layout", {})
+            fig["layout"] = dict(fig.get("layout") or {})  # cached dict is shared
             fig["layout"]["height"] = 820
             fig["layout"]["margin"] = dict(l=30, r=30, t=70, b=30)
         except Exception:
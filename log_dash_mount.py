@@ -0,0 +1,41 @@
+import threading
+
+
+# --------------------------------------------------
+# Lazy mount for the Usage Analytics Dash app
+#
+# Dash + pandas + plotly are only imported, and the layout/callbacks only
+# built, when the first request under /loganalytics/ arrives.  Until then
+# the portal starts and serves without them.
+#
+# Dash cannot register routes on the main Flask app after it has started
+# serving, so the dashboard gets its own small Flask server (same secret key
+# -> same session cookie).  Paths are passed through untouched, so Dash keeps
+# url_base_pathname="/loganalytics/".
+# --------------------------------------------------
+
+
+class LazyDashMount:
+    def __init__(self, app, prefix, build):
+        self.app = app
+        self.prefix = prefix
+        self._build = build
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _get_server(self):
+        if self._server is None:
+            with self._lock:
+                if self._server is None:
+                    self._server = self._build()
+        return self._server
+
+    @property
+    def loaded(self):
+        return self._server is not None
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "") or ""
+        if path.startswith(self.prefix):
+            return self._get_server()(environ, start_response)
+        return self.app(environ, start_response)
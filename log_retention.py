@@ -0,0 +1,182 @@
+import os
+from datetime import date, datetime, timedelta
+
+
+# --------------------------------------------------
+# page_access_logs RETENTION
+#
+#   dbo.page_access_logs               hot: recent months only, row store, indexed
+#   dbo.page_access_logs_history       raw rows of archived months (columnstore)
+#   dbo.page_access_logs_daily         rollup per (date, hour, login, ip, page)
+#   dbo.page_access_logs_all           view = hot UNION ALL history (raw drill-down)
+#   dbo.page_access_logs_retention_state   one row: archived_before
+#
+# Whole months older than LOG_HOT_DAYS are rolled up and moved out of the hot
+# table, one month per transaction.  Analytics read the rollup for anything
+# before archived_before, so query cost tracks the hot window, not history.
+# --------------------------------------------------
+
+LOG_HOT_DAYS = int(os.getenv("LOG_HOT_DAYS", "90"))
+
+
+RETENTION_SCHEMA_SQL = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'page_access_logs_history') AND type = 'U')
+    BEGIN
+        CREATE TABLE page_access_logs_history (
+            id INT NOT NULL,
+            login_name NVARCHAR(100) NOT NULL,
+            page NVARCHAR(255) NOT NULL,
+            ip_address NVARCHAR(50) NOT NULL,
+            enter_time DATETIME NOT NULL,
+            exit_time DATETIME NULL,
+            duration_seconds FLOAT NULL
+        );
+
+        CREATE CLUSTERED COLUMNSTORE INDEX cci_page_access_logs_history
+        ON page_access_logs_history;
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'page_access_logs_daily') AND type = 'U')
+    BEGIN
+        CREATE TABLE page_access_logs_daily (
+            log_date DATE NOT NULL,
+            hour_of_day TINYINT NOT NULL,
+            login_name NVARCHAR(100) NOT NULL,
+            ip_address NVARCHAR(50) NOT NULL,
+            page NVARCHAR(255) NOT NULL,
+            sessions INT NOT NULL,
+            total_duration_seconds FLOAT NULL,
+            CONSTRAINT PK_page_access_logs_daily
+                PRIMARY KEY (log_date, hour_of_day, login_name, ip_address, page)
+        ) WITH (DATA_COMPRESSION = PAGE);
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'page_access_logs_retention_state') AND type = 'U')
+    BEGIN
+        CREATE TABLE page_access_logs_retention_state (
+            id TINYINT NOT NULL CONSTRAINT PK_page_access_logs_retention_state PRIMARY KEY DEFAULT (1),
+            archived_before DATETIME NULL,
+            last_run DATETIME NULL,
+            CONSTRAINT CK_page_access_logs_retention_state_one_row CHECK (id = 1)
+        );
+        INSERT INTO page_access_logs_retention_state (id) VALUES (1);
+    END
+    """,
+    """
+    CREATE OR ALTER VIEW page_access_logs_all AS
+        SELECT id, login_name, page, ip_address, enter_time, exit_time, duration_seconds
+        FROM page_access_logs
+        UNION ALL
+        SELECT id, login_name, page, ip_address, enter_time, exit_time, duration_seconds
+        FROM page_access_logs_history;
+    """,
+]
+
+
+ARCHIVE_MONTH_SQL = """
+MERGE page_access_logs_daily AS tgt
+USING (
+    SELECT
+        CAST(enter_time AS date)    AS log_date,
+        DATEPART(hour, enter_time)  AS hour_of_day,
+        login_name,
+        ip_address,
+        page,
+        COUNT(*)                    AS sessions,
+        SUM(duration_seconds)       AS total_duration_seconds
+    FROM page_access_logs
+    WHERE enter_time >= ? AND enter_time < ?
+    GROUP BY CAST(enter_time AS date), DATEPART(hour, enter_time), login_name, ip_address, page
+) AS src
+   ON tgt.log_date = src.log_date
+  AND tgt.hour_of_day = src.hour_of_day
+  AND tgt.login_name = src.login_name
+  AND tgt.ip_address = src.ip_address
+  AND tgt.page = src.page
+WHEN MATCHED THEN
+    UPDATE SET
+        tgt.sessions = tgt.sessions + src.sessions,
+        tgt.total_duration_seconds = ISNULL(tgt.total_duration_seconds, 0) + ISNULL(src.total_duration_seconds, 0)
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT (log_date, hour_of_day, login_name, ip_address, page, sessions, total_duration_seconds)
+    VALUES (src.log_date, src.hour_of_day, src.login_name, src.ip_address, src.page, src.sessions, src.total_duration_seconds);
+
+DELETE FROM page_access_logs
+OUTPUT DELETED.id, DELETED.login_name, DELETED.page, DELETED.ip_address,
+       DELETED.enter_time, DELETED.exit_time, DELETED.duration_seconds
+INTO page_access_logs_history (id, login_name, page, ip_address, enter_time, exit_time, duration_seconds)
+WHERE enter_time >= ? AND enter_time < ?;
+"""
+
+
+def ensure_retention_schema(cursor):
+    """Create history/rollup/state tables and the union view.
+
+    The hot table's range index (idx_page_access_logs_enter_id) is created by init_db.
+    """
+    for ddl in RETENTION_SCHEMA_SQL:
+        cursor.execute(ddl)
+
+
+def hot_cutoff(today=None, hot_days=LOG_HOT_DAYS):
+    """First day of the month that contains (today - hot_days): everything before it is archived."""
+    today = today or date.today()
+    edge = today - timedelta(days=hot_days)
+    return datetime(edge.year, edge.month, 1)
+
+
+def _next_month(d):
+    return datetime(d.year + (d.month // 12), (d.month % 12) + 1, 1)
+
+
+def archive_page_access_logs(conn, hot_days=LOG_HOT_DAYS):
+    """Move whole months older than the hot window into rollup + history.
+
+    One month per transaction keeps the log and lock footprint bounded.
+    Returns the list of archived month starts.
+    """
+    cutoff = hot_cutoff(hot_days=hot_days)
+    cursor = conn.cursor()
+    archived = []
+
+    while True:
+        row = cursor.execute(
+            "SELECT MIN(enter_time) FROM page_access_logs WHERE enter_time < ?;", cutoff
+        ).fetchone()
+        oldest = row[0] if row else None
+        if oldest is None:
+            break
+
+        month_start = datetime(oldest.year, oldest.month, 1)
+        month_end = min(_next_month(month_start), cutoff)
+
+        cursor.execute(ARCHIVE_MONTH_SQL, month_start, month_end, month_start, month_end)
+        conn.commit()
+        archived.append(month_start)
+
+    cursor.execute(
+        """
+        UPDATE page_access_logs_retention_state
+        SET archived_before = CASE WHEN archived_before IS NULL OR archived_before < ? THEN ? ELSE archived_before END,
+            last_run = GETDATE()
+        WHERE id = 1;
+        """,
+        cutoff, cutoff,
+    )
+    conn.commit()
+    return archived
+
+
+def get_archived_before(conn):
+    """Start of the hot range (None when nothing has been archived yet)."""
+    try:
+        row = conn.cursor().execute(
+            "SELECT archived_before FROM page_access_logs_retention_state WHERE id = 1;"
+        ).fetchone()
+        return row[0] if row else None
+    except Exception:
+        # Retention schema not created yet (init_db not run)
+        return None
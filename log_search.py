@@ -0,0 +1,132 @@
+import threading
+import time
+
+
+# --------------------------------------------------
+# SUBSTRING SEARCH OVER DISTINCT login_name / ip_address
+#
+# The login/IP filter boxes are "contains" filters.  Instead of sending
+# LIKE '%term%' (full scan) to SQL Server, the term is matched here against
+# the distinct values via a trigram index and turned into an exact IN-list,
+# which seeks on idx_page_access_logs_user_page_time / _ip_time.
+#
+# The value set is small (users, client IPs) and refreshed incrementally by
+# id watermark; archived months only add values already seen in the hot table.
+# --------------------------------------------------
+
+REFRESH_SECONDS = 30
+MISS_REFRESH_SECONDS = 2   # a term with no match refreshes early, at most this often
+MAX_IN_LIST = 500   # broader matches fall back to LIKE (and stay under the 2100-param limit)
+
+COLUMNS = ("login_name", "ip_address")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _ColumnIndex:
+    def __init__(self):
+        self.values = []        # original values
+        self.lowered = []       # lowercase, for case-insensitive match (like the default collation)
+        self.seen = set()
+        self.postings = {}      # trigram -> set(value position)
+
+    def add(self, value):
+        if value is None or value in self.seen:
+            return
+        self.seen.add(value)
+        pos = len(self.values)
+        low = value.lower()
+        self.values.append(value)
+        self.lowered.append(low)
+        for gram in _trigrams(low):
+            self.postings.setdefault(gram, set()).add(pos)
+
+    def search(self, term):
+        term = term.lower()
+        grams = _trigrams(term)
+        if not grams:
+            candidates = range(len(self.values))
+        else:
+            sets = sorted((self.postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*sets) if sets[0] else set()
+        return [self.values[p] for p in candidates if term in self.lowered[p]]
+
+
+class LogValueIndex:
+    """Trigram index over distinct login_name / ip_address in page_access_logs."""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._columns = {c: _ColumnIndex() for c in COLUMNS}
+        self._watermark = 0
+        self._loaded_at = 0.0
+        self._seeded = False
+
+    def _refresh(self):
+        with self._connect() as conn:
+            cur = conn.cursor()
+
+            if not self._seeded:
+                # Values that now only exist in the rollup (archived months)
+                try:
+                    cur.execute("SELECT DISTINCT login_name, ip_address FROM dbo.page_access_logs_daily;")
+                    for login, ip in cur.fetchall():
+                        self._columns["login_name"].add(login)
+                        self._columns["ip_address"].add(ip)
+                except Exception:
+                    pass  # retention schema not created yet
+
+            cur.execute(
+                """
+                SELECT login_name, ip_address, MAX(id) AS max_id
+                FROM dbo.page_access_logs
+                WHERE id > ?
+                GROUP BY login_name, ip_address;
+                """,
+                self._watermark,
+            )
+            for login, ip, max_id in cur.fetchall():
+                self._columns["login_name"].add(login)
+                self._columns["ip_address"].add(ip)
+                if max_id and max_id > self._watermark:
+                    self._watermark = max_id
+
+        self._seeded = True
+        self._loaded_at = time.monotonic()
+
+    def match(self, column, term):
+        """Exact values of ``column`` containing ``term``.
+
+        Returns None when the match is too broad for an IN-list; the caller
+        then keeps the LIKE predicate.  A term with no match refreshes the
+        index first (rate limited), so a login/IP first seen since the last
+        refresh is not filtered out as "1=0".
+        """
+        with self._lock:
+            if time.monotonic() - self._loaded_at > REFRESH_SECONDS:
+                self._refresh()
+            values = self._columns[column].search(term)
+            if not values and time.monotonic() - self._loaded_at > MISS_REFRESH_SECONDS:
+                self._refresh()
+                values = self._columns[column].search(term)
+        if len(values) > MAX_IN_LIST:
+            return None
+        return sorted(values)
+
+
+def contains_predicate(index, column, term):
+    """(sql, params) for "column contains term", as an IN-list where possible."""
+    try:
+        values = index.match(column, term)
+    except Exception as e:
+        print(f"[LOG_SEARCH] index lookup failed, using LIKE: {e}")
+        values = None
+
+    if values is None:
+        return f"{column} LIKE ?", [f"%{term}%"]
+    if not values:
+        return "1=0", []
+    return f"{column} IN ({', '.join('?' for _ in values)})", list(values)